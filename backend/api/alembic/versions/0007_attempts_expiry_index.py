@@ -0,0 +1,22 @@
+# alembic/versions/0007_attempts_expiry_index.py
+"""índice parcial para el barrido de attempts vencidos"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_attempts_expiry_index"
+down_revision = "0006_add_audit_logs"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Solo indexa los 'en_progreso': el barrido y las lecturas de "vigente" no tocan el histórico
+    op.create_index(
+        "ix_attempts_expires_en_progreso",
+        "attempts",
+        ["expires_at"],
+        unique=False,
+        postgresql_where=sa.text("estado = 'en_progreso'"),
+    )
+
+def downgrade():
+    op.drop_index("ix_attempts_expires_en_progreso", table_name="attempts")
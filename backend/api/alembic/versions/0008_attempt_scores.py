@@ -0,0 +1,76 @@
+# alembic/versions/0008_attempt_scores.py
+"""puntajes persistidos por attempt (attempt_scores / attempt_section_scores) + backfill"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0008_attempt_scores"
+down_revision = "0007_attempts_expiry_index"
+branch_labels = None
+depends_on = None
+
+# Mismo cálculo que app/services/attempt_scores.recompute_attempt_scores
+_W = "COALESCE(NULLIF(q.peso, 0), 1)"
+_IS_LIKERT = "lower(q.tipo) = 'likert'"
+
+
+def upgrade():
+    op.create_table(
+        "attempt_scores",
+        sa.Column("attempt_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("survey_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("teacher_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("total", sa.Numeric(6, 3), nullable=True),
+        sa.Column("likert_sum", sa.Integer(), nullable=False),
+        sa.Column("likert_n", sa.SmallInteger(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("attempt_id"),
+        sa.ForeignKeyConstraint(["attempt_id"], ["attempts.id"], ondelete="CASCADE"),
+    )
+    op.create_index("ix_attempt_scores_survey_teacher", "attempt_scores", ["survey_id", "teacher_id"])
+
+    op.create_table(
+        "attempt_section_scores",
+        sa.Column("attempt_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("section_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("score", sa.Numeric(6, 3), nullable=True),
+        sa.Column("likert_sum", sa.Integer(), nullable=False),
+        sa.Column("likert_n", sa.SmallInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("attempt_id", "section_id"),
+        sa.ForeignKeyConstraint(["attempt_id"], ["attempts.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["section_id"], ["survey_sections.id"]),
+    )
+
+    # Backfill de attempts ya enviados
+    op.execute(f"""
+        INSERT INTO public.attempt_scores
+          (attempt_id, survey_id, teacher_id, total, likert_sum, likert_n)
+        SELECT a.id, a.survey_id, a.teacher_id,
+               ROUND(SUM(r.valor_likert * {_W}) FILTER (WHERE {_IS_LIKERT})
+                     / NULLIF(SUM({_W}) FILTER (WHERE {_IS_LIKERT}), 0), 3),
+               SUM(r.valor_likert), COUNT(*)
+        FROM public.attempts a
+        JOIN public.responses r ON r.attempt_id = a.id
+        JOIN public.questions q ON q.id = r.question_id
+        WHERE a.estado = 'enviado' AND r.valor_likert IS NOT NULL
+        GROUP BY a.id, a.survey_id, a.teacher_id
+    """)
+    op.execute(f"""
+        INSERT INTO public.attempt_section_scores
+          (attempt_id, section_id, score, likert_sum, likert_n)
+        SELECT a.id, q.section_id,
+               ROUND(SUM(r.valor_likert * {_W}) FILTER (WHERE {_IS_LIKERT})
+                     / NULLIF(SUM({_W}) FILTER (WHERE {_IS_LIKERT}), 0), 3),
+               SUM(r.valor_likert), COUNT(*)
+        FROM public.attempts a
+        JOIN public.responses r ON r.attempt_id = a.id
+        JOIN public.questions q ON q.id = r.question_id
+        WHERE a.estado = 'enviado' AND r.valor_likert IS NOT NULL AND q.section_id IS NOT NULL
+        GROUP BY a.id, q.section_id
+    """)
+
+
+def downgrade():
+    op.drop_table("attempt_section_scores")
+    op.drop_index("ix_attempt_scores_survey_teacher", table_name="attempt_scores")
+    op.drop_table("attempt_scores")
@@ -0,0 +1,50 @@
+# alembic/versions/0009_attempt_likert_compact.py
+"""likert compacto por attempt (smallint[]) + vista de compatibilidad responses_all"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
+
+revision = "0009_attempt_likert_compact"
+down_revision = "0008_attempt_scores"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "attempt_likert",
+        sa.Column("attempt_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("survey_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("valores", ARRAY(sa.SmallInteger()), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("attempt_id"),
+        sa.ForeignKeyConstraint(["attempt_id"], ["attempts.id"], ondelete="CASCADE"),
+    )
+
+    # Posición (1..n) de cada pregunta likert dentro de su encuesta: índice en attempt_likert.valores
+    op.execute("""
+        CREATE VIEW public.survey_likert_order AS
+        SELECT q.survey_id, q.id AS question_id,
+               ROW_NUMBER() OVER (PARTITION BY q.survey_id ORDER BY q.orden, q.id) AS pos
+        FROM public.questions q
+        WHERE lower(q.tipo) = 'likert'
+    """)
+
+    # Mismas columnas que responses: los reportes leen de aquí sin importar el formato
+    op.execute("""
+        CREATE VIEW public.responses_all AS
+        SELECT r.id, r.attempt_id, r.question_id, r.valor_likert, r.texto, r.created_at
+        FROM public.responses r
+        UNION ALL
+        SELECT md5(al.attempt_id::text || o.question_id::text)::uuid,
+               al.attempt_id, o.question_id, v.valor::integer, NULL::jsonb, al.created_at
+        FROM public.attempt_likert al
+        CROSS JOIN LATERAL unnest(al.valores) WITH ORDINALITY AS v(valor, pos)
+        JOIN public.survey_likert_order o ON o.survey_id = al.survey_id AND o.pos = v.pos
+    """)
+
+
+def downgrade():
+    op.execute("DROP VIEW IF EXISTS public.responses_all")
+    op.execute("DROP VIEW IF EXISTS public.survey_likert_order")
+    op.drop_table("attempt_likert")
@@ -0,0 +1,25 @@
+# alembic/versions/0010_survey_versions.py
+"""versión de asignaciones por encuesta (ETag de /queue)"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0010_survey_versions"
+down_revision = "0009_attempt_likert_compact"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "survey_versions",
+        sa.Column("survey_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("assignments_version", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("survey_id"),
+        sa.ForeignKeyConstraint(["survey_id"], ["surveys.id"], ondelete="CASCADE"),
+    )
+
+
+def downgrade():
+    op.drop_table("survey_versions")
@@ -0,0 +1,22 @@
+# alembic/versions/0011_teachers_queue_indexes.py
+"""índices para la cola paginada: keyset (nombre, id) y búsqueda por prefijo"""
+from alembic import op
+
+revision = "0011_teachers_queue_indexes"
+down_revision = "0010_survey_versions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_teachers_nombre_id", "teachers", ["nombre", "id"])
+    # lower(nombre) LIKE 'pre%' (text_pattern_ops sirve para LIKE con cualquier collation)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_teachers_nombre_lower_prefix "
+        "ON public.teachers (lower(nombre) text_pattern_ops)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_teachers_nombre_lower_prefix")
+    op.drop_index("ix_teachers_nombre_id", table_name="teachers")
@@ -0,0 +1,26 @@
+# alembic/versions/0012_turnos_state_index.py
+"""índice para la foto de turnos por usuario (services/turno_state), index-only"""
+from alembic import op
+
+revision = "0012_turnos_state_index"
+down_revision = "0011_teachers_queue_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # COUNT/FILTER por status y el último 'open' por opened_at salen del índice
+    # sin visitar la tabla. turnos no la crea ninguna migración: se omite si no existe.
+    op.execute("""
+        DO $$
+        BEGIN
+          IF to_regclass('public.turnos') IS NOT NULL THEN
+            CREATE INDEX IF NOT EXISTS ix_turnos_user_status_opened
+              ON public.turnos (user_id, status, opened_at DESC) INCLUDE (id);
+          END IF;
+        END $$;
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_turnos_user_status_opened")
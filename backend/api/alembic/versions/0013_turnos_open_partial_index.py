@@ -0,0 +1,26 @@
+# alembic/versions/0013_turnos_open_partial_index.py
+"""índice parcial de turnos abiertos por usuario (cierre automático de ociosos)"""
+from alembic import op
+
+revision = "0013_turnos_open_partial_index"
+down_revision = "0012_turnos_state_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Solo los turnos 'open': pocas filas aunque la tabla crezca. turnos no la
+    # crea ninguna migración: se omite si no existe.
+    op.execute("""
+        DO $$
+        BEGIN
+          IF to_regclass('public.turnos') IS NOT NULL THEN
+            CREATE INDEX IF NOT EXISTS ix_turnos_user_open
+              ON public.turnos (user_id) WHERE status = 'open';
+          END IF;
+        END $$;
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_turnos_user_open")
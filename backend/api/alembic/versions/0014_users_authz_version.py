@@ -0,0 +1,20 @@
+# alembic/versions/0014_users_authz_version.py
+"""versión de autorización por usuario (claim authz_version del JWT)"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014_users_authz_version"
+down_revision = "0013_turnos_open_partial_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "users",
+        sa.Column("authz_version", sa.Integer(), nullable=False, server_default=sa.text("0")),
+    )
+
+
+def downgrade():
+    op.drop_column("users", "authz_version")
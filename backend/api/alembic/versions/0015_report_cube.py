@@ -0,0 +1,56 @@
+# alembic/versions/0015_report_cube.py
+"""cubo de reportes por (encuesta, docente, pregunta): n, suma, suma de cuadrados, c1..c5 + backfill"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0015_report_cube"
+down_revision = "0014_users_authz_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "report_cube",
+        sa.Column("survey_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("teacher_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("question_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("n", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("likert_sum", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("likert_sumsq", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("c1", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("c2", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("c3", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("c4", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("c5", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("survey_id", "teacher_id", "question_id"),
+        sa.ForeignKeyConstraint(["survey_id"], ["surveys.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["teacher_id"], ["teachers.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["question_id"], ["questions.id"], ondelete="CASCADE"),
+    )
+
+    # Backfill: mismo cálculo que app/services/report_cube.rebuild_report_cube
+    op.execute("""
+        INSERT INTO public.report_cube
+          (survey_id, teacher_id, question_id, n, likert_sum, likert_sumsq, c1, c2, c3, c4, c5)
+        SELECT a.survey_id, a.teacher_id, r.question_id,
+               COUNT(*),
+               SUM(r.valor_likert),
+               SUM(r.valor_likert * r.valor_likert),
+               COUNT(*) FILTER (WHERE r.valor_likert = 1),
+               COUNT(*) FILTER (WHERE r.valor_likert = 2),
+               COUNT(*) FILTER (WHERE r.valor_likert = 3),
+               COUNT(*) FILTER (WHERE r.valor_likert = 4),
+               COUNT(*) FILTER (WHERE r.valor_likert = 5)
+        FROM public.attempts a
+        JOIN public.responses_all r ON r.attempt_id = a.id
+        WHERE a.estado = 'enviado'
+          AND r.valor_likert IS NOT NULL
+        GROUP BY a.survey_id, a.teacher_id, r.question_id
+    """)
+
+
+def downgrade():
+    op.drop_table("report_cube")
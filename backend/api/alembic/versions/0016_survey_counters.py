@@ -0,0 +1,89 @@
+# alembic/versions/0016_survey_counters.py
+"""contadores por encuesta (enviados / en_progreso / expirados / docentes y usuarios que respondieron) y globales + backfill"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0016_survey_counters"
+down_revision = "0015_report_cube"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "survey_counters",
+        sa.Column("survey_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("enviados", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("en_progreso", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("expirados", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("responded_teachers", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("responding_users", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("survey_id"),
+        sa.ForeignKeyConstraint(["survey_id"], ["surveys.id"], ondelete="CASCADE"),
+    )
+
+    # Pertenencia para los conteos distintos: el INSERT ... ON CONFLICT DO NOTHING
+    # del submit dice si el docente/usuario es nuevo en la encuesta
+    op.create_table(
+        "survey_counter_teachers",
+        sa.Column("survey_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("teacher_id", UUID(as_uuid=True), nullable=False),
+        sa.PrimaryKeyConstraint("survey_id", "teacher_id"),
+        sa.ForeignKeyConstraint(["survey_id"], ["surveys.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["teacher_id"], ["teachers.id"], ondelete="CASCADE"),
+    )
+    op.create_table(
+        "survey_counter_users",
+        sa.Column("survey_id", UUID(as_uuid=True), nullable=False),
+        sa.Column("user_id", UUID(as_uuid=True), nullable=False),
+        sa.PrimaryKeyConstraint("survey_id", "user_id"),
+        sa.ForeignKeyConstraint(["survey_id"], ["surveys.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+    )
+    op.create_index("ix_survey_counter_users_user", "survey_counter_users", ["user_id"])
+
+    op.create_table(
+        "global_counters",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("value", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+    # Backfill: mismo cálculo que app/services/survey_counters.reconcile_survey_counters
+    op.execute("""
+        INSERT INTO public.survey_counter_teachers (survey_id, teacher_id)
+        SELECT DISTINCT a.survey_id, a.teacher_id FROM public.attempts a WHERE a.estado = 'enviado'
+    """)
+    op.execute("""
+        INSERT INTO public.survey_counter_users (survey_id, user_id)
+        SELECT DISTINCT a.survey_id, a.user_id FROM public.attempts a WHERE a.estado = 'enviado'
+    """)
+    op.execute("""
+        INSERT INTO public.survey_counters
+          (survey_id, enviados, en_progreso, expirados, responded_teachers, responding_users)
+        SELECT s.id,
+               (SELECT COUNT(*) FROM public.attempts a WHERE a.survey_id = s.id AND a.estado = 'enviado'),
+               (SELECT COUNT(*) FROM public.attempts a WHERE a.survey_id = s.id AND a.estado = 'en_progreso'),
+               (SELECT COUNT(*) FROM public.attempts a WHERE a.survey_id = s.id AND a.estado = 'expirado'),
+               (SELECT COUNT(*) FROM public.survey_counter_teachers t WHERE t.survey_id = s.id),
+               (SELECT COUNT(*) FROM public.survey_counter_users u WHERE u.survey_id = s.id)
+        FROM public.surveys s
+    """)
+    op.execute("""
+        INSERT INTO public.global_counters (name, value) VALUES
+          ('usuarios_activos',      (SELECT COUNT(*) FROM public.users WHERE estado = 'activo')),
+          ('encuestas',             (SELECT COUNT(*) FROM public.surveys)),
+          ('encuestas_activas',     (SELECT COUNT(*) FROM public.surveys WHERE estado = 'activa')),
+          ('usuarios_respondieron', (SELECT COUNT(DISTINCT user_id) FROM public.survey_counter_users))
+    """)
+
+
+def downgrade():
+    op.drop_table("global_counters")
+    op.drop_index("ix_survey_counter_users_user", table_name="survey_counter_users")
+    op.drop_table("survey_counter_users")
+    op.drop_table("survey_counter_teachers")
+    op.drop_table("survey_counters")
@@ -0,0 +1,20 @@
+# alembic/versions/0017_survey_data_version.py
+"""versión de datos por encuesta (clave de la caché de reportes)"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0017_survey_data_version"
+down_revision = "0016_survey_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "survey_versions",
+        sa.Column("data_version", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+    )
+
+
+def downgrade():
+    op.drop_column("survey_versions", "data_version")
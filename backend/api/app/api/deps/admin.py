@@ -1,20 +1,12 @@
 # api/app/api/deps/admin.py
 from fastapi import Depends, HTTPException
-from app.core.security import get_current_user
+from app.core.security import get_current_user, user_is_admin
 
 def require_admin(user = Depends(get_current_user)):
     """
-    Acepta user como objeto o dict. Requiere 'admin' o 'superadmin' en roles.
+    Requiere un rol admin (misma lista que get_admin_user: ADMIN_ROLE_NAMES).
+    Con un token vigente los roles salen de los claims, sin consultar usuario ni roles.
     """
-    roles = set()
-    if hasattr(user, "roles"):
-        roles = {getattr(r, "nombre", r) for r in (getattr(user, "roles", []) or [])}
-    else:
-        try:
-            roles = set((user or {}).get("roles") or [])
-        except Exception:
-            roles = set()
-
-    if not ({"admin", "superadmin"} & roles):
+    if not user_is_admin(user):
         raise HTTPException(status_code=403, detail="Solo administradores")
     return user
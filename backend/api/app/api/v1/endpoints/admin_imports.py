@@ -5,13 +5,19 @@ from typing import List, Tuple, Dict, Set
 
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
+from app.core.principal import bump_authz_version, invalidate_principal
 from app.core.security import get_admin_user
 from app.db.session import get_db
-from app.models.docente import Teacher
-from app.schemas.imports import TeachersImportOut, ImportSummary, RowError
+from app.models.docente import Teacher, SurveyTeacherAssignment, UserTeacherPermission
+from app.models.encuesta import Survey
+from app.schemas.imports import TeachersImportOut, TeacherPermissionsImportOut, ImportSummary, RowError
 from app.models.user import User, Role, UserRole
+from app.services.survey_counters import refresh_global_counters
+from app.services.survey_versions import bump_assignments_version
+from app.services.teacher_permissions import invalidate_teacher_permissions
 
 
 router = APIRouter(tags=["admin/imports"])
@@ -141,6 +147,8 @@ async def import_teachers_csv(
                     estado=r["estado"],
                 ))
                 inserted += 1
+        # nombre/estado de docentes aparecen en la cola de todas las encuestas
+        bump_assignments_version(db)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -151,6 +159,121 @@ async def import_teachers_csv(
         errors=errors
     )
 
+@router.post("/imports/teacher-permissions", response_model=TeacherPermissionsImportOut)
+async def import_teacher_permissions_csv(
+    file: UploadFile = File(..., description="CSV con encabezado: survey_codigo,email,identificador"),
+    replace: bool = Query(True, description="Si true, cada (encuesta, usuario) del CSV queda EXACTAMENTE con los docentes listados"),
+    dry_run: bool = Query(False, description="Si true, valida y calcula pero NO escribe en BD"),
+    db: Session = Depends(get_db),
+    current_admin=Depends(get_admin_user),
+):
+    """
+    Carga masiva de la matriz usuario -> docentes permitidos por encuesta.
+    Resuelve encuestas, usuarios, docentes, asignaciones y permisos existentes
+    con una consulta cada uno; escribe con un DELETE y un INSERT ... ON CONFLICT.
+    """
+    try:
+        raw = await file.read()
+    finally:
+        await file.close()
+    try:
+        content = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        content = raw.decode("latin-1")
+
+    reader = csv.DictReader(io.StringIO(content))
+    required = {"survey_codigo", "email", "identificador"}
+    headers = {_norm_lower(h) for h in (reader.fieldnames or [])}
+    missing = required - headers
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Faltan columnas requeridas: {sorted(list(missing))}")
+
+    parsed: List[Tuple[int, str, str, str]] = []
+    for idx, row in enumerate(reader, start=2):
+        row = {_norm_lower(k): v for k, v in row.items() if k}
+        parsed.append((idx, _norm(row.get("survey_codigo")), _norm_lower(row.get("email")), _norm(row.get("identificador"))))
+
+    # Prefetch: una consulta por entidad
+    surveys = {
+        codigo: sid
+        for sid, codigo in db.query(Survey.id, Survey.codigo)
+        .filter(Survey.codigo.in_({p[1] for p in parsed})).all()
+    }
+    users = {
+        email.lower(): uid
+        for uid, email in db.query(User.id, User.email)
+        .filter(func.lower(User.email).in_({p[2] for p in parsed})).all()
+    }
+    teachers = {
+        ident: tid
+        for tid, ident in db.query(Teacher.id, Teacher.identificador)
+        .filter(Teacher.identificador.in_({p[3] for p in parsed})).all()
+    }
+    assigned = set(
+        db.query(SurveyTeacherAssignment.survey_id, SurveyTeacherAssignment.teacher_id)
+        .filter(SurveyTeacherAssignment.survey_id.in_(list(surveys.values()))).all()
+    ) if surveys else set()
+
+    errors: List[RowError] = []
+    wanted: Set[Tuple] = set()
+    for idx, codigo, email, ident in parsed:
+        sid, uid, tid = surveys.get(codigo), users.get(email), teachers.get(ident)
+        if sid is None:
+            errors.append(RowError(row=idx, message=f"encuesta no existe: {codigo!r}"))
+        elif uid is None:
+            errors.append(RowError(row=idx, message=f"usuario no existe: {email!r}"))
+        elif tid is None:
+            errors.append(RowError(row=idx, message=f"docente no existe: {ident!r}"))
+        elif (sid, tid) not in assigned:
+            errors.append(RowError(row=idx, message=f"docente {ident} no está asignado a la encuesta {codigo}"))
+        elif (sid, uid, tid) in wanted:
+            errors.append(RowError(row=idx, message="fila duplicada en CSV"))
+        else:
+            wanted.add((sid, uid, tid))
+
+    pairs = {(sid, uid) for sid, uid, _ in wanted}
+    existing: Dict[Tuple, object] = {}
+    if pairs:
+        existing = {
+            (p.survey_id, p.user_id, p.teacher_id): p.id
+            for p in db.query(UserTeacherPermission)
+            .filter(tuple_(UserTeacherPermission.survey_id, UserTeacherPermission.user_id).in_(list(pairs)))
+            .all()
+        }
+    to_insert = wanted - existing.keys()
+    to_delete = [pid for key, pid in existing.items() if key not in wanted] if replace else []
+
+    out = TeacherPermissionsImportOut(
+        summary=ImportSummary(inserted=len(to_insert), updated=0, skipped=len(errors)),
+        deleted=len(to_delete),
+        errors=errors,
+    )
+    if dry_run or not (to_insert or to_delete):
+        return out
+
+    try:
+        if to_delete:
+            db.query(UserTeacherPermission).filter(
+                UserTeacherPermission.id.in_(to_delete)
+            ).delete(synchronize_session=False)
+        if to_insert:
+            db.execute(
+                pg_insert(UserTeacherPermission)
+                .values([{"survey_id": s, "user_id": u, "teacher_id": t} for s, u, t in to_insert])
+                .on_conflict_do_nothing(index_elements=["survey_id", "user_id", "teacher_id"])
+            )
+        # El conjunto visible en la cola cambia => nuevo ETag de /queue
+        for sid in {s for s, _ in pairs}:
+            bump_assignments_version(db, sid)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al escribir en BD: {e}")
+
+    invalidate_teacher_permissions({s for s, _ in pairs})
+    return out
+
+
 def _norm_estado(v: str | None) -> str:
     v = (v or "").strip().lower()
     if v in ("", "activo", "activa"): return "activo"
@@ -186,6 +309,7 @@ async def import_users(
     summary = {"inserted": 0, "updated": 0, "skipped": 0}
     errors: List[Dict[str, str]] = []
 
+    touched: List = []
     for i, row in enumerate(reader, start=2):
         email = (row.get("email") or "").strip().lower()
         nombre = (row.get("nombre") or "").strip()
@@ -218,10 +342,18 @@ async def import_users(
         # 1 rol exacto
         db.query(UserRole).filter(UserRole.user_id == user.id).delete(synchronize_session=False)
         db.add(UserRole(user_id=user.id, role_id=roles[rol].id))
+        touched.append(user.id)
 
     if dry_run:
         db.rollback()
     else:
+        # estado y rol pueden haber cambiado: tokens emitidos antes dejan de valer como fuente de roles
+        bump_authz_version(db, touched)
+        # altas y cambios de estado mueven usuarios_activos del dashboard
+        db.flush()
+        refresh_global_counters(db)
         db.commit()
+        # el import toca muchos usuarios, se vacía la caché
+        invalidate_principal()
 
     return {"summary": summary, "errors": errors}
@@ -1,4 +1,5 @@
 # api/app/api/v1/endpoints/admin_reports.py
+from functools import wraps
 from uuid import UUID
 from io import BytesIO
 from openpyxl import Workbook
@@ -12,6 +13,13 @@ from sqlalchemy import text
 from app.db.session import get_db
 from app.api.deps.admin import require_admin
 from app.models.encuesta import Survey
+from app.services.survey_cache import get_survey_definition
+from app.services.csv_export import (
+    copy_csv_chunks, csv_chunks, csv_response, py_timestamp_sql, stream_rows, supports_copy,
+)
+from app.services.report_cache import report_cache
+from app.services.report_cube import CUBE_SUMS, likert_stats
+from app.services.survey_counters import get_global_counters, get_survey_counters
 
 from app.schemas.admin_reports import (
     StatsOverviewOut, SectionScore, SummaryOut, QuestionRowOut,
@@ -25,7 +33,6 @@ from app.schemas.admin_reports import (
     TeacherSectionsOut, TeacherSectionScore, StudentHeatmapOut, StudentHeatmapRow
 )
 
-import csv, io, json
 router = APIRouter(prefix="/reports", tags=["admin-reports"])
 
 
@@ -44,42 +51,19 @@ def get_stats_overview(
         - tasa_completitud: Porcentaje de usuarios que completaron encuestas vs total usuarios activos
         - encuestas_activas: Número de encuestas actualmente activas
     """
-    from app.models.user import User
-    from app.models.attempt import Attempt
-    from app.models.attempt import Response as AttemptResponse
-    
-    # 1. Total usuarios activos
-    total_usuarios = (
-        db.query(User)
-        .filter(User.estado == "activo")
-        .count()
-    )
-    
-    # 2. Total encuestas
-    total_encuestas = db.query(Survey).count()
-    
-    # 3. Total respuestas = usuarios únicos que han completado al menos 1 encuesta
-    from sqlalchemy import distinct
-    total_respuestas = (
-        db.query(distinct(Attempt.user_id))
-        .filter(Attempt.estado == "enviado")
-        .count()
-    )
-    
-    # 4. Tasa de completitud = (usuarios que completaron / total usuarios activos) * 100
-    usuarios_que_completaron = total_respuestas  # Ya calculado arriba
-    
+    # Contadores globales mantenidos por transiciones + reconciliación (services/survey_counters)
+    counters = get_global_counters(db)
+    total_usuarios = counters["usuarios_activos"]
+    total_encuestas = counters["encuestas"]
+    # Total respuestas = usuarios únicos que han completado al menos 1 encuesta
+    total_respuestas = counters["usuarios_respondieron"]
+    encuestas_activas = counters["encuestas_activas"]
+
+    # Tasa de completitud = (usuarios que completaron / total usuarios activos) * 100
     tasa_completitud = (
-        (usuarios_que_completaron / total_usuarios * 100) if total_usuarios > 0 else 0.0
-    )
-    
-    # 5. Encuestas activas
-    encuestas_activas = (
-        db.query(Survey)
-        .filter(Survey.estado == "activa")
-        .count()
+        (total_respuestas / total_usuarios * 100) if total_usuarios > 0 else 0.0
     )
-    
+
     return StatsOverviewOut(
         total_usuarios=total_usuarios,
         total_encuestas=total_encuestas,
@@ -94,87 +78,92 @@ def _ensure_survey(db: Session, survey_id: UUID):
         raise HTTPException(404, "Encuesta no encontrada")
     return s
 
+def _cached_report(endpoint: str):
+    """
+    Cachea la respuesta del endpoint por (encuesta, data_version, parámetros)
+    en services/report_cache. Va debajo de @router.get; si la encuesta no
+    existe llama al endpoint sin cachear (responde el 404 de _ensure_survey).
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(**kwargs):
+            db, survey_id = kwargs["db"], kwargs["survey_id"]
+            version = report_cache.data_version(db, survey_id)
+            if version is None:
+                return fn(**kwargs)
+            params = tuple(sorted(
+                (k, v) for k, v in kwargs.items() if k not in ("db", "_admin", "survey_id")
+            ))
+            return report_cache.get_or_compute(
+                survey_id, version, endpoint, params, lambda: fn(**kwargs)
+            )
+        return wrapper
+    return decorator
+
 # 1) SUMMARY
-@router.get("/summary", response_model=SummaryOut)
-def summary(
-    survey_id: UUID = Query(..., description="ID de encuesta"),
-    db: Session = Depends(get_db),
-    _admin = Depends(require_admin),
-):
+@_cached_report("summary")
+def _summary_scores(survey_id: UUID, db: Session) -> dict:
+    """Parte de summary que solo cambia con envíos (cacheada por data_version)."""
     _ensure_survey(db, survey_id)
 
-    totals = db.execute(text("""
-        SELECT
-          SUM(CASE WHEN a.estado = 'enviado'     THEN 1 ELSE 0 END) AS enviados,
-          SUM(CASE WHEN a.estado = 'en_progreso' THEN 1 ELSE 0 END) AS en_progreso
-        FROM public.attempts a
-        WHERE a.survey_id = :sid
-    """), {"sid": str(survey_id)}).mappings().first() or {}
-
-    enviados = int(totals.get("enviados") or 0)
-    en_progreso = int(totals.get("en_progreso") or 0)
-
-    pend_row = db.execute(text("""
-        WITH assigned AS (
-          SELECT COUNT(*) AS n FROM public.survey_teacher_assignments WHERE survey_id = :sid
-        ),
-        responded AS (
-          SELECT COUNT(DISTINCT a.teacher_id) AS n
-          FROM public.attempts a
-          WHERE a.survey_id = :sid AND a.estado = 'enviado'
-        )
-        SELECT
-          (SELECT n FROM assigned) AS total_docentes,
-          (SELECT n FROM responded) AS responded_docentes,
-          GREATEST((SELECT n FROM assigned) - (SELECT n FROM responded), 0) AS pendientes
-    """), {"sid": str(survey_id)}).mappings().first() or {}
-
-    total_docentes = int(pend_row.get("total_docentes") or 0)
-    responded_docentes = int(pend_row.get("responded_docentes") or 0)
-    pendientes = int(pend_row.get("pendientes") or 0)
+    total_docentes = int(db.execute(text("""
+        SELECT COUNT(*) FROM public.survey_teacher_assignments WHERE survey_id = :sid
+    """), {"sid": str(survey_id)}).scalar() or 0)
 
+    # Puntajes persistidos por attempt (attempt_scores): SUM/SUM == AVG sobre responses
     global_row = db.execute(text("""
-        SELECT AVG(r.valor_likert::numeric) AS score
-        FROM public.responses r
-        JOIN public.attempts a ON a.id = r.attempt_id
-        WHERE a.survey_id = :sid
-          AND a.estado = 'enviado'
-          AND r.valor_likert IS NOT NULL
+        SELECT SUM(sc.likert_sum)::numeric / NULLIF(SUM(sc.likert_n), 0) AS score
+        FROM public.attempt_scores sc
+        WHERE sc.survey_id = :sid
     """), {"sid": str(survey_id)}).mappings().first() or {}
 
-    score_global = float(global_row.get("score")) if global_row.get("score") is not None else None
-    completion_rate = float(responded_docentes) / max(total_docentes, 1)
-
     sec_rows = db.execute(text("""
-        SELECT s.id AS section_id, s.titulo, AVG(r.valor_likert::numeric) AS score
-        FROM public.responses r
-        JOIN public.attempts a   ON a.id = r.attempt_id
-        JOIN public.questions q  ON q.id = r.question_id
-        JOIN public.survey_sections s ON s.id = q.section_id
-        WHERE a.survey_id = :sid
-          AND a.estado = 'enviado'
-          AND r.valor_likert IS NOT NULL
+        SELECT s.id AS section_id, s.titulo,
+               SUM(ss.likert_sum)::numeric / NULLIF(SUM(ss.likert_n), 0) AS score
+        FROM public.attempt_section_scores ss
+        JOIN public.attempt_scores sc    ON sc.attempt_id = ss.attempt_id
+        JOIN public.survey_sections s    ON s.id = ss.section_id
+        WHERE sc.survey_id = :sid
         GROUP BY s.id, s.titulo
         ORDER BY s.titulo
     """), {"sid": str(survey_id)}).mappings().all()
 
-    secciones = [
-        SectionScore(section_id=r["section_id"], titulo=r["titulo"],
-                     score=float(r["score"]) if r["score"] is not None else None)
-        for r in sec_rows
-    ]
+    return {
+        "total_docentes": total_docentes,
+        "score_global": float(global_row.get("score")) if global_row.get("score") is not None else None,
+        "secciones": [
+            SectionScore(section_id=r["section_id"], titulo=r["titulo"],
+                         score=float(r["score"]) if r["score"] is not None else None)
+            for r in sec_rows
+        ],
+    }
+
+@router.get("/summary", response_model=SummaryOut)
+def summary(
+    survey_id: UUID = Query(..., description="ID de encuesta"),
+    db: Session = Depends(get_db),
+    _admin = Depends(require_admin),
+):
+    cached = _summary_scores(survey_id=survey_id, db=db)
+
+    # Contadores por encuesta (survey_counters) en vivo: una lectura por PK.
+    # en_progreso cambia con cada attempt creado o vencido y no sube data_version.
+    counters = get_survey_counters(db, survey_id)
+    total_docentes = cached["total_docentes"]
+    responded_docentes = counters.responded_teachers
 
     return SummaryOut(
-        enviados=enviados,
-        en_progreso=en_progreso,
-        pendientes=pendientes,
-        completion_rate=completion_rate,
-        score_global=score_global,
-        secciones=secciones,
+        enviados=counters.enviados,
+        en_progreso=counters.en_progreso,
+        pendientes=max(total_docentes - responded_docentes, 0),
+        completion_rate=float(responded_docentes) / max(total_docentes, 1),
+        score_global=cached["score_global"],
+        secciones=cached["secciones"],
     )
 
 # 2) PREGUNTAS (distribución 1..5)
 @router.get("/questions", response_model=List[QuestionRowOut])
+@_cached_report("questions")
 def questions_summary(
     survey_id: UUID = Query(..., description="ID de encuesta"),
     db: Session = Depends(get_db),
@@ -182,38 +171,35 @@ def questions_summary(
 ):
     _ensure_survey(db, survey_id)
 
-    rows = db.execute(text("""
+    # Cubo (report_cube): media/desviación/mediana salen de n, sumas y c1..c5
+    rows = db.execute(text(f"""
         SELECT
           q.id AS question_id,
           q.codigo,
           q.enunciado,
           q.orden,
           s.titulo AS section,
-          COUNT(r.valor_likert) AS n,
-          AVG(r.valor_likert::numeric) AS mean,
-          PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY r.valor_likert) AS median,
-          STDDEV_POP(r.valor_likert::numeric) AS stddev,
-          MIN(r.valor_likert) AS min,
-          MAX(r.valor_likert) AS max,
-          SUM(CASE WHEN r.valor_likert = 1 THEN 1 ELSE 0 END) AS c1,
-          SUM(CASE WHEN r.valor_likert = 2 THEN 1 ELSE 0 END) AS c2,
-          SUM(CASE WHEN r.valor_likert = 3 THEN 1 ELSE 0 END) AS c3,
-          SUM(CASE WHEN r.valor_likert = 4 THEN 1 ELSE 0 END) AS c4,
-          SUM(CASE WHEN r.valor_likert = 5 THEN 1 ELSE 0 END) AS c5
-        FROM public.responses r
-        JOIN public.attempts a   ON a.id = r.attempt_id
-        JOIN public.questions q  ON q.id = r.question_id
+          {CUBE_SUMS}
+        FROM public.report_cube c
+        JOIN public.questions q  ON q.id = c.question_id
         JOIN public.survey_sections s ON s.id = q.section_id
-        WHERE a.survey_id = :sid
-          AND a.estado = 'enviado'
-          AND r.valor_likert IS NOT NULL
+        WHERE c.survey_id = :sid
         GROUP BY q.id, q.codigo, q.enunciado, q.orden, s.titulo
         ORDER BY q.orden
     """), {"sid": str(survey_id)}).mappings().all()
 
-    return [QuestionRowOut(**dict(r)) for r in rows]
+    return [
+        QuestionRowOut(
+            question_id=r["question_id"], codigo=r["codigo"], enunciado=r["enunciado"],
+            orden=r["orden"], section=r["section"], n=int(r["n"] or 0),
+            **likert_stats(r),
+            **{f"c{i}": int(r[f"c{i}"] or 0) for i in range(1, 6)},
+        )
+        for r in rows
+    ]
 
 @router.get("/questions/top-bottom", response_model=TopBottomQuestionsOut)
+@_cached_report("questions/top-bottom")
 def questions_top_bottom(
     survey_id: UUID = Query(..., description="ID de encuesta"),
     limit: int = Query(5, ge=1, le=50, description="Tamaño de los listados top y bottom"),
@@ -234,15 +220,12 @@ def questions_top_bottom(
             q.codigo,
             q.enunciado,
             s.titulo AS section,
-            COUNT(r.valor_likert)              AS n,
-            AVG(r.valor_likert::numeric)       AS avg
-          FROM public.attempts a
-          JOIN public.responses r ON r.attempt_id = a.id
-          JOIN public.questions q ON q.id = r.question_id
+            SUM(c.n)                                            AS n,
+            SUM(c.likert_sum)::numeric / NULLIF(SUM(c.n), 0)    AS avg
+          FROM public.report_cube c
+          JOIN public.questions q ON q.id = c.question_id
           JOIN public.survey_sections s ON s.id = q.section_id
-          WHERE a.survey_id = :sid
-            AND a.estado = 'enviado'
-            AND r.valor_likert IS NOT NULL
+          WHERE c.survey_id = :sid
             AND q.tipo = 'likert'
           GROUP BY q.id, q.codigo, q.enunciado, s.titulo
         )
@@ -295,19 +278,12 @@ def question_detail(
 
     g = db.execute(text("""
         SELECT
-          COUNT(r.valor_likert) AS n,
-          AVG(r.valor_likert::numeric) AS avg,
-          SUM(CASE WHEN r.valor_likert = 1 THEN 1 ELSE 0 END) AS c1,
-          SUM(CASE WHEN r.valor_likert = 2 THEN 1 ELSE 0 END) AS c2,
-          SUM(CASE WHEN r.valor_likert = 3 THEN 1 ELSE 0 END) AS c3,
-          SUM(CASE WHEN r.valor_likert = 4 THEN 1 ELSE 0 END) AS c4,
-          SUM(CASE WHEN r.valor_likert = 5 THEN 1 ELSE 0 END) AS c5
-        FROM public.responses r
-        JOIN public.attempts a ON a.id = r.attempt_id
-        WHERE a.survey_id = :sid
-          AND a.estado = 'enviado'
-          AND r.question_id = :qid
-          AND r.valor_likert IS NOT NULL
+          SUM(c.n) AS n,
+          SUM(c.likert_sum)::numeric / NULLIF(SUM(c.n), 0) AS avg,
+          SUM(c.c1) AS c1, SUM(c.c2) AS c2, SUM(c.c3) AS c3, SUM(c.c4) AS c4, SUM(c.c5) AS c5
+        FROM public.report_cube c
+        WHERE c.survey_id = :sid
+          AND c.question_id = :qid
     """), {"sid": str(survey_id), "qid": str(question_id)}).mappings().first() or {}
 
     global_out = QuestionGlobalOut(
@@ -323,17 +299,14 @@ def question_detail(
     )
 
     rows = db.execute(text("""
-        SELECT a.teacher_id, t.nombre AS teacher_nombre,
-               COUNT(r.valor_likert) AS n,
-               AVG(r.valor_likert::float) AS avg
-        FROM public.responses r
-        JOIN public.attempts a ON a.id = r.attempt_id
-        JOIN public.teachers t ON t.id = a.teacher_id
-        WHERE a.survey_id = :sid
-          AND a.estado = 'enviado'
-          AND r.question_id = :qid
-          AND r.valor_likert IS NOT NULL
-        GROUP BY a.teacher_id, t.nombre
+        SELECT c.teacher_id, t.nombre AS teacher_nombre,
+               c.n,
+               c.likert_sum::float / NULLIF(c.n, 0) AS avg
+        FROM public.report_cube c
+        JOIN public.teachers t ON t.id = c.teacher_id
+        WHERE c.survey_id = :sid
+          AND c.question_id = :qid
+          AND c.n > 0
         ORDER BY avg DESC NULLS LAST, t.nombre
     """), {"sid": str(survey_id), "qid": str(question_id)}).mappings().all()
 
@@ -385,20 +358,13 @@ def question_by_teacher(
 
     agg = db.execute(text("""
         SELECT
-          COUNT(r.valor_likert) AS n,
-          AVG(r.valor_likert::numeric) AS avg,
-          SUM(CASE WHEN r.valor_likert = 1 THEN 1 ELSE 0 END) AS c1,
-          SUM(CASE WHEN r.valor_likert = 2 THEN 1 ELSE 0 END) AS c2,
-          SUM(CASE WHEN r.valor_likert = 3 THEN 1 ELSE 0 END) AS c3,
-          SUM(CASE WHEN r.valor_likert = 4 THEN 1 ELSE 0 END) AS c4,
-          SUM(CASE WHEN r.valor_likert = 5 THEN 1 ELSE 0 END) AS c5
-        FROM public.responses r
-        JOIN public.attempts a ON a.id = r.attempt_id
-        WHERE a.survey_id = :sid
-          AND a.estado   = 'enviado'
-          AND a.teacher_id = :tid
-          AND r.question_id = :qid
-          AND r.valor_likert IS NOT NULL
+          c.n,
+          c.likert_sum::numeric / NULLIF(c.n, 0) AS avg,
+          c.c1, c.c2, c.c3, c.c4, c.c5
+        FROM public.report_cube c
+        WHERE c.survey_id = :sid
+          AND c.teacher_id = :tid
+          AND c.question_id = :qid
     """), {"sid": str(survey_id), "tid": str(teacher_id), "qid": str(question_id)}).mappings().first() or {}
 
     n  = int(agg.get("n") or 0)
@@ -416,7 +382,7 @@ def question_by_teacher(
           a.id AS attempt_id,
           to_char(COALESCE(r.created_at, a.actualizado_en, a.creado_en), 'YYYY-MM-DD HH24:MI:SS') AS created_at,
           r.valor_likert AS valor
-        FROM public.responses r
+        FROM public.responses_all r
         JOIN public.attempts a ON a.id = r.attempt_id
         WHERE a.survey_id = :sid
           AND a.estado = 'enviado'
@@ -442,6 +408,7 @@ def question_by_teacher(
 # 4) DOCENTES (ranking + peor pregunta) + alias /teachers/summary
 @router.get("/teachers", response_model=List[TeacherRowOut])
 @router.get("/teachers/summary", response_model=List[TeacherRowOut])
+@_cached_report("teachers")
 def teachers_summary(
     survey_id: UUID = Query(..., description="ID de encuesta"),
     q: Optional[str] = Query(None, description="Filtro ILIKE por nombre/identificador/programa"),
@@ -455,24 +422,18 @@ def teachers_summary(
 
     rows = db.execute(text("""
         WITH base AS (
-          SELECT a.teacher_id,
-                 COUNT(DISTINCT a.id) AS n_respuestas,
-                 AVG(r.valor_likert::numeric) AS promedio
-          FROM public.attempts a
-          JOIN public.responses r ON r.attempt_id = a.id
-          WHERE a.survey_id = :sid
-            AND a.estado = 'enviado'
-            AND r.valor_likert IS NOT NULL
-          GROUP BY a.teacher_id
+          SELECT sc.teacher_id,
+                 COUNT(*) AS n_respuestas,
+                 SUM(sc.likert_sum)::numeric / NULLIF(SUM(sc.likert_n), 0) AS promedio
+          FROM public.attempt_scores sc
+          WHERE sc.survey_id = :sid
+          GROUP BY sc.teacher_id
         ),
         perq AS (
-          SELECT a.teacher_id, r.question_id, AVG(r.valor_likert::numeric) AS avg_q
-          FROM public.attempts a
-          JOIN public.responses r ON r.attempt_id = a.id
-          WHERE a.survey_id = :sid
-            AND a.estado = 'enviado'
-            AND r.valor_likert IS NOT NULL
-          GROUP BY a.teacher_id, r.question_id
+          SELECT c.teacher_id, c.question_id, c.likert_sum::numeric / NULLIF(c.n, 0) AS avg_q
+          FROM public.report_cube c
+          WHERE c.survey_id = :sid
+            AND c.n > 0
         ),
         peor AS (
           SELECT teacher_id, question_id, avg_q,
@@ -511,6 +472,7 @@ def teachers_summary(
 
 # 5) MATRIZ DE CALOR 
 @router.get("/teachers/matrix", response_model=TeacherMatrixOut)
+@_cached_report("teachers/matrix")
 def teachers_matrix(
     survey_id: UUID = Query(..., description="ID de encuesta"),
     programa: Optional[str] = Query(None, description="Filtro por programa (ILIKE)"),
@@ -526,13 +488,7 @@ def teachers_matrix(
     _ensure_survey(db, survey_id)
 
     # 1) Columnas = códigos de pregunta (sólo tipo LIKERT; excluye 'texto'), orden por q.orden
-    codes = db.execute(text("""
-        SELECT q.codigo
-        FROM public.questions q
-        WHERE q.survey_id = :sid
-          AND q.tipo <> 'texto'
-        ORDER BY q.orden
-    """), {"sid": str(survey_id)}).scalars().all()
+    codes = get_survey_definition(db, survey_id).codes
 
     if not codes:
         return TeacherMatrixOut(columns=[], rows=[])
@@ -560,25 +516,22 @@ def teachers_matrix(
     # 3) Celdas: promedio y conteo por (docente, código de pregunta)
     cells = db.execute(text("""
         SELECT
-          a.teacher_id,
+          c.teacher_id,
           q.codigo,
-          AVG(r.valor_likert::numeric) AS avg,
-          COUNT(r.valor_likert)        AS n
-        FROM public.responses r
-        JOIN public.attempts a ON a.id = r.attempt_id
-        JOIN public.questions q ON q.id = r.question_id
-        WHERE a.survey_id = :sid
-          AND a.estado   = 'enviado'
-          AND r.valor_likert IS NOT NULL
+          SUM(c.likert_sum)::numeric / NULLIF(SUM(c.n), 0) AS avg,
+          SUM(c.n)                                         AS n
+        FROM public.report_cube c
+        JOIN public.questions q ON q.id = c.question_id
+        WHERE c.survey_id = :sid
           AND q.tipo <> 'texto'
           AND (
             :programa IS NULL OR EXISTS (
               SELECT 1 FROM public.teachers tt
-              WHERE tt.id = a.teacher_id
+              WHERE tt.id = c.teacher_id
                 AND tt.programa ILIKE '%' || :programa || '%'
             )
           )
-        GROUP BY a.teacher_id, q.codigo
+        GROUP BY c.teacher_id, q.codigo
     """), {"sid": str(survey_id), "programa": programa}).mappings().all()
 
     # 4) Pivot en Python: (teacher_id, codigo) -> (avg, n)
@@ -612,6 +565,7 @@ def teachers_matrix(
     return TeacherMatrixOut(columns=codes, rows=rows_out)
 
 @router.get("/teachers/filters", response_model=FiltersOut)
+@_cached_report("teachers/filters")
 def teachers_filters(
     survey_id: UUID = Query(..., description="ID de encuesta"),
     tz: str = Query("America/Bogota", description="Zona horaria para rango de fechas"),
@@ -709,62 +663,43 @@ def export_questions_stats_csv(
 ):
     _ensure_survey(db, survey_id)
 
-    rows = db.execute(text("""
+    sql = f"""
         SELECT
           q.id             AS question_id,
           q.codigo,
           q.enunciado,
           s.titulo         AS section,
-          COUNT(r.valor_likert) AS n,
-          AVG(r.valor_likert::numeric)                                        AS mean,
-          PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY r.valor_likert)         AS median,
-          STDDEV_POP(r.valor_likert::numeric)                                 AS stddev,
-          MIN(r.valor_likert)                                                 AS min,
-          MAX(r.valor_likert)                                                 AS max,
-          SUM(CASE WHEN r.valor_likert = 1 THEN 1 ELSE 0 END)                 AS c1,
-          SUM(CASE WHEN r.valor_likert = 2 THEN 1 ELSE 0 END)                 AS c2,
-          SUM(CASE WHEN r.valor_likert = 3 THEN 1 ELSE 0 END)                 AS c3,
-          SUM(CASE WHEN r.valor_likert = 4 THEN 1 ELSE 0 END)                 AS c4,
-          SUM(CASE WHEN r.valor_likert = 5 THEN 1 ELSE 0 END)                 AS c5
-        FROM public.responses r
-        JOIN public.attempts a   ON a.id = r.attempt_id
-        JOIN public.questions q  ON q.id = r.question_id
+          {CUBE_SUMS}
+        FROM public.report_cube c
+        JOIN public.questions q  ON q.id = c.question_id
         JOIN public.survey_sections s ON s.id = q.section_id
-        WHERE a.survey_id = :sid
-          AND a.estado = 'enviado'
-          AND r.valor_likert IS NOT NULL
+        WHERE c.survey_id = :sid
         GROUP BY q.id, q.codigo, q.enunciado, s.titulo
-        HAVING COUNT(r.valor_likert) >= :min_n
+        HAVING SUM(c.n) >= :min_n
         ORDER BY q.orden
-    """), {"sid": str(survey_id), "min_n": min_n}).mappings().all()
+    """
+    headers = (["question_id"] if include_ids else []) + [
+        "codigo","enunciado","section","n","mean","median","stddev","min","max","c1","c2","c3","c4","c5"
+    ]
 
-    def stream():
-        output = io.StringIO()
-        writer = csv.writer(output)
-        headers = (["question_id"] if include_ids else []) + [
-            "codigo","enunciado","section","n","mean","median","stddev","min","max","c1","c2","c3","c4","c5"
+    def to_row(r):
+        st = likert_stats(r)
+        row = [str(r["question_id"])] if include_ids else []
+        row += [
+            r["codigo"], r["enunciado"], r["section"],
+            int(r["n"] or 0),
+            float(st["mean"]) if st["mean"] is not None else None,
+            float(st["median"]) if st["median"] is not None else None,
+            float(st["stddev"]) if st["stddev"] is not None else None,
+            int(st["min"]) if st["min"] is not None else None,
+            int(st["max"]) if st["max"] is not None else None,
+            int(r["c1"] or 0), int(r["c2"] or 0), int(r["c3"] or 0),
+            int(r["c4"] or 0), int(r["c5"] or 0)
         ]
-        writer.writerow(headers); yield output.getvalue(); output.seek(0); output.truncate(0)
+        return row
 
-        for r in rows:
-            row = []
-            if include_ids: row.append(str(r["question_id"]))
-            row += [
-                r["codigo"], r["enunciado"], r["section"],
-                int(r["n"] or 0),
-                float(r["mean"]) if r["mean"] is not None else None,
-                float(r["median"]) if r["median"] is not None else None,
-                float(r["stddev"]) if r["stddev"] is not None else None,
-                int(r["min"]) if r["min"] is not None else None,
-                int(r["max"]) if r["max"] is not None else None,
-                int(r["c1"] or 0), int(r["c2"] or 0), int(r["c3"] or 0),
-                int(r["c4"] or 0), int(r["c5"] or 0)
-            ]
-            writer.writerow(row); yield output.getvalue(); output.seek(0); output.truncate(0)
-
-    filename = f"questions-stats_{survey_id}.csv"
-    return StreamingResponse(stream(), media_type="text/csv",
-                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    rows = stream_rows(db, sql, {"sid": str(survey_id), "min_n": min_n})
+    return csv_response(f"questions-stats_{survey_id}.csv", csv_chunks(headers, map(to_row, rows)))
 
 # 2) DOCENTES – ranking + peor pregunta
 @router.get("/exports/teachers-stats.csv")
@@ -777,26 +712,20 @@ def export_teachers_stats_csv(
 ):
     _ensure_survey(db, survey_id)
 
-    rows = db.execute(text("""
+    sql = """
         WITH base AS (
-          SELECT a.teacher_id,
-                 COUNT(DISTINCT a.id)                    AS n_respuestas,
-                 AVG(r.valor_likert::numeric)            AS promedio
-          FROM public.attempts a
-          JOIN public.responses r ON r.attempt_id = a.id
-          WHERE a.survey_id = :sid
-            AND a.estado = 'enviado'
-            AND r.valor_likert IS NOT NULL
-          GROUP BY a.teacher_id
+          SELECT sc.teacher_id,
+                 COUNT(*) AS n_respuestas,
+                 SUM(sc.likert_sum)::numeric / NULLIF(SUM(sc.likert_n), 0) AS promedio
+          FROM public.attempt_scores sc
+          WHERE sc.survey_id = :sid
+          GROUP BY sc.teacher_id
         ),
         perq AS (
-          SELECT a.teacher_id, r.question_id, AVG(r.valor_likert::numeric) AS avg_q
-          FROM public.attempts a
-          JOIN public.responses r ON r.attempt_id = a.id
-          WHERE a.survey_id = :sid
-            AND a.estado = 'enviado'
-            AND r.valor_likert IS NOT NULL
-          GROUP BY a.teacher_id, r.question_id
+          SELECT c.teacher_id, c.question_id, c.likert_sum::numeric / NULLIF(c.n, 0) AS avg_q
+          FROM public.report_cube c
+          WHERE c.survey_id = :sid
+            AND c.n > 0
         ),
         peor AS (
           SELECT teacher_id, question_id, avg_q,
@@ -827,32 +756,25 @@ def export_teachers_stats_csv(
             COALESCE(t.programa,'') ILIKE '%' || :q || '%'
           )
         ORDER BY b.promedio DESC NULLS LAST, t.nombre
-    """), {"sid": str(survey_id), "q": q}).mappings().all()
-
-    def stream():
-        output = io.StringIO()
-        writer = csv.writer(output)
-        headers = (["teacher_id"] if include_ids else []) + [
-            "docente_identificador","teacher_nombre","programa",
-            "n_respuestas","promedio","peor_codigo","peor_enunciado","peor_promedio"
-        ]
-        writer.writerow(headers); yield output.getvalue(); output.seek(0); output.truncate(0)
+    """
+    headers = (["teacher_id"] if include_ids else []) + [
+        "docente_identificador","teacher_nombre","programa",
+        "n_respuestas","promedio","peor_codigo","peor_enunciado","peor_promedio"
+    ]
 
-        for r in rows:
-            row = []
-            if include_ids: row.append(str(r["teacher_id"]))
-            row += [
-                r["docente_identificador"], r["teacher_nombre"], r.get("programa"),
-                int(r["n_respuestas"] or 0),
-                float(r["promedio"]) if r.get("promedio") is not None else None,
-                r.get("peor_codigo"), r.get("peor_enunciado"),
-                float(r["peor_promedio"]) if r.get("peor_promedio") is not None else None
-            ]
-            writer.writerow(row); yield output.getvalue(); output.seek(0); output.truncate(0)
+    def to_row(r):
+        row = [str(r["teacher_id"])] if include_ids else []
+        row += [
+            r["docente_identificador"], r["teacher_nombre"], r.get("programa"),
+            int(r["n_respuestas"] or 0),
+            float(r["promedio"]) if r.get("promedio") is not None else None,
+            r.get("peor_codigo"), r.get("peor_enunciado"),
+            float(r["peor_promedio"]) if r.get("peor_promedio") is not None else None
+        ]
+        return row
 
-    filename = f"teachers-stats_{survey_id}.csv"
-    return StreamingResponse(stream(), media_type="text/csv",
-                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    rows = stream_rows(db, sql, {"sid": str(survey_id), "q": q})
+    return csv_response(f"teachers-stats_{survey_id}.csv", csv_chunks(headers, map(to_row, rows)))
 
 # 3) MATRIZ – heatmap ready (filtrable por programa)
 @router.get("/exports/matrix.csv")
@@ -867,12 +789,7 @@ def export_matrix_csv(
     _ensure_survey(db, survey_id)
 
     # 1) Columnas Q* (no texto) en orden
-    qcodes = db.execute(text("""
-        SELECT codigo
-        FROM public.questions
-        WHERE survey_id = :sid AND tipo <> 'texto'
-        ORDER BY orden
-    """), {"sid": str(survey_id)}).scalars().all()
+    qcodes = get_survey_definition(db, survey_id).codes
 
     # 2) SELECT dinámico pivotado desde la CTE perq (pq)
     cols_sql = []
@@ -893,14 +810,12 @@ def export_matrix_csv(
           GROUP BY a.teacher_id
         ),
         perq AS (
-          SELECT a.teacher_id, q.codigo, AVG(r.valor_likert::numeric) AS avg_q
-          FROM public.responses r
-          JOIN public.attempts a ON a.id = r.attempt_id
-          JOIN public.questions q ON q.id = r.question_id
-          WHERE a.survey_id = :sid
-            AND a.estado = 'enviado'
-            AND r.valor_likert IS NOT NULL
-          GROUP BY a.teacher_id, q.codigo
+          SELECT c.teacher_id, q.codigo,
+                 SUM(c.likert_sum)::numeric / NULLIF(SUM(c.n), 0) AS avg_q
+          FROM public.report_cube c
+          JOIN public.questions q ON q.id = c.question_id
+          WHERE c.survey_id = :sid
+          GROUP BY c.teacher_id, q.codigo
         )
         SELECT
           t.id AS teacher_id,
@@ -923,27 +838,18 @@ def export_matrix_csv(
     if programa:
         params["programa"] = programa
 
-    rows = db.execute(text(sql), params).mappings().all()
-
-    def stream():
-        import io, csv
-        output = io.StringIO()
-        writer = csv.writer(output)
-        headers = (["teacher_id"] if include_ids else []) + ["teacher_nombre","programa","n_respuestas"] + qcodes
-        writer.writerow(headers); yield output.getvalue(); output.seek(0); output.truncate(0)
+    headers = (["teacher_id"] if include_ids else []) + ["teacher_nombre","programa","n_respuestas"] + qcodes
 
-        for r in rows:
-            row = []
-            if include_ids: row.append(str(r["teacher_id"]))
-            row += [r["teacher_nombre"], r.get("programa"), int(r["n_respuestas"] or 0)]
-            for code in qcodes:
-                val = r.get(code)
-                row.append(float(val) if val is not None else None)
-            writer.writerow(row); yield output.getvalue(); output.seek(0); output.truncate(0)
+    def to_row(r):
+        row = [str(r["teacher_id"])] if include_ids else []
+        row += [r["teacher_nombre"], r.get("programa"), int(r["n_respuestas"] or 0)]
+        for code in qcodes:
+            val = r.get(code)
+            row.append(float(val) if val is not None else None)
+        return row
 
-    filename = f"matrix_{survey_id}.csv"
-    return StreamingResponse(stream(), media_type="text/csv",
-                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    rows = stream_rows(db, sql, params)
+    return csv_response(f"matrix_{survey_id}.csv", csv_chunks(headers, map(to_row, rows)))
 
 @router.get("/exports/survey/{survey_id}/teachers.csv")
 def export_survey_teachers_csv(
@@ -958,29 +864,22 @@ def export_survey_teachers_csv(
 
     sql = """
     WITH base AS (
-      SELECT a.teacher_id,
-             COUNT(DISTINCT a.id) AS n_respuestas,
-             AVG(r.valor_likert::numeric) AS promedio_global
-      FROM public.attempts a
-      JOIN public.responses r ON r.attempt_id = a.id
-      JOIN public.questions q ON q.id = r.question_id
-      WHERE a.survey_id = :sid
-        AND a.estado = 'enviado'
-        AND r.valor_likert IS NOT NULL
-        AND q.tipo <> 'texto'
-      GROUP BY a.teacher_id
+      SELECT sc.teacher_id,
+             COUNT(*) AS n_respuestas,
+             SUM(sc.likert_sum)::numeric / NULLIF(SUM(sc.likert_n), 0) AS promedio_global
+      FROM public.attempt_scores sc
+      WHERE sc.survey_id = :sid
+        AND sc.likert_n > 0
+      GROUP BY sc.teacher_id
     ),
     perq AS (
-      SELECT a.teacher_id, q.id AS question_id, q.codigo, q.enunciado,
-             AVG(r.valor_likert::numeric) AS avg_q
-      FROM public.attempts a
-      JOIN public.responses r ON r.attempt_id = a.id
-      JOIN public.questions q ON q.id = r.question_id
-      WHERE a.survey_id = :sid
-        AND a.estado = 'enviado'
-        AND r.valor_likert IS NOT NULL
+      SELECT c.teacher_id, q.id AS question_id, q.codigo, q.enunciado,
+             c.likert_sum::numeric / NULLIF(c.n, 0) AS avg_q
+      FROM public.report_cube c
+      JOIN public.questions q ON q.id = c.question_id
+      WHERE c.survey_id = :sid
+        AND c.n > 0
         AND q.tipo <> 'texto'
-      GROUP BY a.teacher_id, q.id, q.codigo, q.enunciado
     ),
     worst AS (
       SELECT DISTINCT ON (teacher_id)
@@ -1014,39 +913,29 @@ def export_survey_teachers_csv(
     if programa:
         params["programa"] = programa
 
-    rows = db.execute(text(sql), params).mappings().all()
+    headers = (["teacher_id"] if include_ids else []) + [
+        "ranking","docente_identificador","docente_nombre","docente_programa",
+        "n_respuestas","promedio_global",
+        "peor_codigo","peor_enunciado","peor_promedio"
+    ]
 
-    import csv, io
-    def stream():
-        out = io.StringIO()
-        w = csv.writer(out)
-        headers = (["teacher_id"] if include_ids else []) + [
-            "ranking","docente_identificador","docente_nombre","docente_programa",
-            "n_respuestas","promedio_global",
-            "peor_codigo","peor_enunciado","peor_promedio"
+    def to_row(r):
+        row = [str(r["teacher_id"])] if include_ids else []
+        row += [
+            int(r["ranking"]),
+            r["docente_identificador"],
+            r["docente_nombre"],
+            r["docente_programa"],
+            int(r["n_respuestas"] or 0),
+            (float(r["promedio_global"]) if r["promedio_global"] is not None else None),
+            r.get("peor_codigo"),
+            r.get("peor_enunciado"),
+            (float(r["peor_promedio"]) if r.get("peor_promedio") is not None else None),
         ]
-        w.writeheader if hasattr(w, "writeheader") else None
-        w.writerow(headers); yield out.getvalue(); out.seek(0); out.truncate(0)
-
-        for r in rows:
-            row = []
-            if include_ids: row.append(str(r["teacher_id"]))
-            row += [
-                int(r["ranking"]),
-                r["docente_identificador"],
-                r["docente_nombre"],
-                r["docente_programa"],
-                int(r["n_respuestas"] or 0),
-                (float(r["promedio_global"]) if r["promedio_global"] is not None else None),
-                r.get("peor_codigo"),
-                r.get("peor_enunciado"),
-                (float(r["peor_promedio"]) if r.get("peor_promedio") is not None else None),
-            ]
-            w.writerow(row); yield out.getvalue(); out.seek(0); out.truncate(0)
+        return row
 
-    filename = f"survey_{survey_id}_teachers.csv"
-    return StreamingResponse(stream(), media_type="text/csv",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    rows = stream_rows(db, sql, params)
+    return csv_response(f"survey_{survey_id}_teachers.csv", csv_chunks(headers, map(to_row, rows)))
 
 @router.get("/exports/survey/{survey_id}/comments.csv")
 def export_survey_comments_csv(
@@ -1072,7 +961,7 @@ def export_survey_comments_csv(
       r.texto->>'mejorar'     AS mejorar,
       r.texto->>'comentarios' AS comentarios
     FROM public.attempts a
-      JOIN public.responses r ON r.attempt_id = a.id
+      JOIN public.responses_all r ON r.attempt_id = a.id
       JOIN public.questions q ON q.id = r.question_id
       LEFT JOIN public.users u ON u.id = a.user_id
       JOIN public.teachers t ON t.id = a.teacher_id
@@ -1082,32 +971,23 @@ def export_survey_comments_csv(
     ORDER BY enviado_local DESC, docente_nombre
     """
 
-    rows = db.execute(text(sql), {"sid": str(survey_id), "tz": tz}).mappings().all()
+    headers = (["attempt_id"] if include_ids else []) + [
+        "docente_identificador","docente_nombre","docente_programa",
+        "usuario_email","usuario_nombre","enviado_local",
+        "positivos","mejorar","comentarios"
+    ]
 
-    import csv, io
-    def stream():
-        out = io.StringIO()
-        w = csv.writer(out)
-        headers = (["attempt_id"] if include_ids else []) + [
-            "docente_identificador","docente_nombre","docente_programa",
-            "usuario_email","usuario_nombre","enviado_local",
-            "positivos","mejorar","comentarios"
+    def to_row(r):
+        row = [str(r["attempt_id"])] if include_ids else []
+        row += [
+            r["docente_identificador"], r["docente_nombre"], r["docente_programa"],
+            r["usuario_email"], r["usuario_nombre"], r["enviado_local"],
+            r.get("positivos"), r.get("mejorar"), r.get("comentarios")
         ]
-        w.writerow(headers); yield out.getvalue(); out.seek(0); out.truncate(0)
+        return row
 
-        for r in rows:
-            row = []
-            if include_ids: row.append(str(r["attempt_id"]))
-            row += [
-                r["docente_identificador"], r["docente_nombre"], r["docente_programa"],
-                r["usuario_email"], r["usuario_nombre"], r["enviado_local"],
-                r.get("positivos"), r.get("mejorar"), r.get("comentarios")
-            ]
-            w.writerow(row); yield out.getvalue(); out.seek(0); out.truncate(0)
-
-    filename = f"survey_{survey_id}_comments.csv"
-    return StreamingResponse(stream(), media_type="text/csv",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    rows = stream_rows(db, sql, {"sid": str(survey_id), "tz": tz})
+    return csv_response(f"survey_{survey_id}_comments.csv", csv_chunks(headers, map(to_row, rows)))
 
 @router.get("/exports/survey/{survey_id}.xlsx")
 def export_survey_xlsx(
@@ -1122,95 +1002,63 @@ def export_survey_xlsx(
 
     # ---------- Queries ----------
 
-    # Global y por secciones (para 'Resumen' y 'Secciones')
+    # Global (hoja 'Resumen'): puntajes persistidos por attempt; secciones y preguntas salen del cubo
     q_resumen = text("""
-      WITH global AS (
-        SELECT
-          COUNT(DISTINCT a.id) AS n_intentos,
-          AVG(r.valor_likert::numeric) AS promedio_global
-        FROM public.attempts a
-        JOIN public.responses r ON r.attempt_id = a.id
-        JOIN public.questions q ON q.id = r.question_id
-        WHERE a.survey_id = :sid AND a.estado = 'enviado'
-          AND r.valor_likert IS NOT NULL AND q.tipo <> 'texto'
-      ),
-      secciones AS (
-        SELECT s.id, s.titulo,
-               COUNT(r.*) AS n_respuestas,
-               AVG(r.valor_likert::numeric) AS promedio
-        FROM public.survey_sections s
-        JOIN public.questions q ON q.section_id = s.id AND q.survey_id = :sid AND q.tipo <> 'texto'
-        JOIN public.responses r ON r.question_id = q.id
-        JOIN public.attempts a ON a.id = r.attempt_id AND a.estado = 'enviado' AND a.survey_id = :sid
-        GROUP BY s.id, s.titulo
-        ORDER BY s.titulo
-      )
-      SELECT * FROM global;
+      SELECT
+        COUNT(*) AS n_intentos,
+        SUM(sc.likert_sum)::numeric / NULLIF(SUM(sc.likert_n), 0) AS promedio_global
+      FROM public.attempt_scores sc
+      WHERE sc.survey_id = :sid AND sc.likert_n > 0
     """)
     resumen = db.execute(q_resumen, {"sid": str(survey_id)}).mappings().first()
 
     q_secciones = text("""
-      SELECT s.titulo, COUNT(r.*) AS n_respuestas, AVG(r.valor_likert::numeric) AS promedio
+      SELECT s.titulo, SUM(c.n) AS n_respuestas,
+             SUM(c.likert_sum)::numeric / NULLIF(SUM(c.n), 0) AS promedio
       FROM public.survey_sections s
       JOIN public.questions q ON q.section_id = s.id AND q.survey_id = :sid AND q.tipo <> 'texto'
-      JOIN public.responses r ON r.question_id = q.id
-      JOIN public.attempts a ON a.id = r.attempt_id AND a.estado = 'enviado' AND a.survey_id = :sid
+      JOIN public.report_cube c ON c.question_id = q.id AND c.survey_id = :sid
       GROUP BY s.titulo
       ORDER BY s.titulo
     """)
     secciones = db.execute(q_secciones, {"sid": str(survey_id)}).mappings().all()
 
     # Preguntas: n, mean, median, stddev, c1..c5
-    q_preg = text("""
+    q_preg = text(f"""
       SELECT
         q.codigo, q.enunciado,
-        COUNT(r.*) AS n,
-        AVG(r.valor_likert::numeric) AS mean,
-        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY r.valor_likert) AS median,
-        STDDEV_SAMP(r.valor_likert::numeric) AS stddev,
-        SUM(CASE WHEN r.valor_likert=1 THEN 1 ELSE 0 END) AS c1,
-        SUM(CASE WHEN r.valor_likert=2 THEN 1 ELSE 0 END) AS c2,
-        SUM(CASE WHEN r.valor_likert=3 THEN 1 ELSE 0 END) AS c3,
-        SUM(CASE WHEN r.valor_likert=4 THEN 1 ELSE 0 END) AS c4,
-        SUM(CASE WHEN r.valor_likert=5 THEN 1 ELSE 0 END) AS c5
+        {CUBE_SUMS}
       FROM public.questions q
-      JOIN public.responses r ON r.question_id = q.id
-      JOIN public.attempts a ON a.id = r.attempt_id
+      JOIN public.report_cube c ON c.question_id = q.id AND c.survey_id = :sid
       WHERE q.survey_id = :sid
         AND q.tipo <> 'texto'
-        AND a.estado = 'enviado'
-        AND r.valor_likert IS NOT NULL
       GROUP BY q.codigo, q.enunciado
       ORDER BY q.codigo
     """)
-    preguntas = db.execute(q_preg, {"sid": str(survey_id)}).mappings().all()
+    preguntas = [
+        {**r, **likert_stats(r, sample=True)}
+        for r in db.execute(q_preg, {"sid": str(survey_id)}).mappings().all()
+    ]
 
     # Docentes (ranking + peor pregunta)
     q_doc = text("""
       WITH base AS (
-        SELECT a.teacher_id,
-               COUNT(DISTINCT a.id) AS n_respuestas,
-               AVG(r.valor_likert::numeric) AS promedio_global
-        FROM public.attempts a
-        JOIN public.responses r ON r.attempt_id = a.id
-        JOIN public.questions q ON q.id = r.question_id
-        WHERE a.survey_id = :sid
-          AND a.estado = 'enviado'
-          AND r.valor_likert IS NOT NULL
-          AND q.tipo <> 'texto'
-        GROUP BY a.teacher_id
+        SELECT sc.teacher_id,
+               COUNT(*) AS n_respuestas,
+               SUM(sc.likert_sum)::numeric / NULLIF(SUM(sc.likert_n), 0) AS promedio_global
+        FROM public.attempt_scores sc
+        WHERE sc.survey_id = :sid
+          AND sc.likert_n > 0
+        GROUP BY sc.teacher_id
       ),
       perq AS (
-        SELECT a.teacher_id, q.id AS question_id, q.codigo, q.enunciado,
-               AVG(r.valor_likert::numeric) AS avg_q
-        FROM public.attempts a
-        JOIN public.responses r ON r.attempt_id = a.id
-        JOIN public.questions q ON q.id = r.question_id
-        WHERE a.survey_id = :sid
-          AND a.estado = 'enviado'
-          AND r.valor_likert IS NOT NULL
+        SELECT c.teacher_id, q.id AS question_id, q.codigo, q.enunciado,
+               c.likert_sum::numeric / NULLIF(c.n, 0) AS avg_q
+        FROM public.report_cube c
+        JOIN public.questions q ON q.id = c.question_id
+        WHERE c.survey_id = :sid
+          AND c.n > 0
           AND q.tipo <> 'texto'
-        GROUP BY a.teacher_id, q.id, q.codigo, q.enunciado
       ),
       worst AS (
         SELECT DISTINCT ON (teacher_id)
@@ -1255,7 +1103,7 @@ def export_survey_xlsx(
         r.texto->>'mejorar'     AS mejorar,
         r.texto->>'comentarios' AS comentarios
       FROM public.attempts a
-      JOIN public.responses r ON r.attempt_id = a.id
+      JOIN public.responses_all r ON r.attempt_id = a.id
       JOIN public.questions q ON q.id = r.question_id
       LEFT JOIN public.users u ON u.id = a.user_id
       JOIN public.teachers t ON t.id = a.teacher_id
@@ -1359,12 +1207,11 @@ def teacher_detail(
 
     head = db.execute(text("""
         SELECT t.id AS teacher_id, t.nombre AS teacher_nombre, t.programa,
-               COUNT(DISTINCT a.id) AS n_respuestas,
-               AVG(r.valor_likert::numeric) AS promedio
+               COUNT(*) AS n_respuestas,
+               SUM(sc.likert_sum)::numeric / NULLIF(SUM(sc.likert_n), 0) AS promedio
         FROM public.teachers t
-        JOIN public.attempts a ON a.teacher_id = t.id
-        LEFT JOIN public.responses r ON r.attempt_id = a.id AND r.valor_likert IS NOT NULL
-        WHERE a.survey_id = :sid AND a.estado = 'enviado' AND t.id = :tid
+        JOIN public.attempt_scores sc ON sc.teacher_id = t.id
+        WHERE sc.survey_id = :sid AND t.id = :tid
         GROUP BY t.id, t.nombre, t.programa
     """), {"sid": str(survey_id), "tid": str(teacher_id)}).mappings().first()
 
@@ -1392,7 +1239,7 @@ def teacher_detail(
                SUM(CASE WHEN r.valor_likert = 3 THEN 1 ELSE 0 END) AS c3,
                SUM(CASE WHEN r.valor_likert = 4 THEN 1 ELSE 0 END) AS c4,
                SUM(CASE WHEN r.valor_likert = 5 THEN 1 ELSE 0 END) AS c5
-        FROM public.responses r
+        FROM public.responses_all r
         JOIN public.attempts a   ON a.id = r.attempt_id
         JOIN public.questions q  ON q.id = r.question_id
         JOIN public.survey_sections s ON s.id = q.section_id
@@ -1413,7 +1260,7 @@ def teacher_detail(
                r.texto->>'mejorar'     AS mejorar,
                r.texto->>'comentarios' AS comentarios
         FROM public.attempts a
-        JOIN public.responses r ON r.attempt_id = a.id
+        JOIN public.responses_all r ON r.attempt_id = a.id
         JOIN public.questions q ON q.id = r.question_id
         WHERE a.survey_id = :sid
           AND a.teacher_id = :tid
@@ -1463,17 +1310,13 @@ def teacher_sections(
         SELECT 
             s.id AS section_id,
             s.titulo,
-            COUNT(r.valor_likert) AS n_respuestas,
-            AVG(r.valor_likert::numeric) AS promedio
-        FROM public.survey_sections s
-        JOIN public.questions q ON q.section_id = s.id
-        JOIN public.responses r ON r.question_id = q.id
-        JOIN public.attempts a ON a.id = r.attempt_id
-        WHERE a.survey_id = :sid
-          AND a.teacher_id = :tid
-          AND a.estado = 'enviado'
-          AND r.valor_likert IS NOT NULL
-          AND q.tipo = 'likert'
+            SUM(ss.likert_n) AS n_respuestas,
+            SUM(ss.likert_sum)::numeric / NULLIF(SUM(ss.likert_n), 0) AS promedio
+        FROM public.attempt_section_scores ss
+        JOIN public.attempt_scores sc ON sc.attempt_id = ss.attempt_id
+        JOIN public.survey_sections s ON s.id = ss.section_id
+        WHERE sc.survey_id = :sid
+          AND sc.teacher_id = :tid
         GROUP BY s.id, s.titulo
         ORDER BY s.titulo
     """), {"sid": str(survey_id), "tid": str(teacher_id)}).mappings().all()
@@ -1521,13 +1364,7 @@ def teacher_students_heatmap(
         raise HTTPException(404, "Docente no encontrado en esta encuesta")
     
     # 1) Obtener columnas (códigos de preguntas ordenadas)
-    codes = db.execute(text("""
-        SELECT q.codigo
-        FROM public.questions q
-        WHERE q.survey_id = :sid
-          AND q.tipo <> 'texto'
-        ORDER BY q.orden
-    """), {"sid": str(survey_id)}).scalars().all()
+    codes = get_survey_definition(db, survey_id).codes
     
     if not codes:
         return StudentHeatmapOut(
@@ -1547,7 +1384,7 @@ def teacher_students_heatmap(
             AVG(r.valor_likert::numeric) AS promedio
         FROM public.attempts a
         LEFT JOIN public.users u ON u.id = a.user_id
-        LEFT JOIN public.responses r ON r.attempt_id = a.id AND r.valor_likert IS NOT NULL
+        LEFT JOIN public.responses_all r ON r.attempt_id = a.id AND r.valor_likert IS NOT NULL
         LEFT JOIN public.questions q ON q.id = r.question_id AND q.tipo <> 'texto'
         WHERE a.survey_id = :sid
           AND a.teacher_id = :tid
@@ -1579,7 +1416,7 @@ def teacher_students_heatmap(
                 r.attempt_id,
                 q.codigo,
                 r.valor_likert::numeric AS valor
-            FROM public.responses r
+            FROM public.responses_all r
             JOIN public.questions q ON q.id = r.question_id
             WHERE r.attempt_id IN ({placeholders})
               AND r.valor_likert IS NOT NULL
@@ -1633,7 +1470,7 @@ def list_comments(
 
     total_row = db.execute(text("""
         SELECT COUNT(*) AS total
-        FROM public.responses r
+        FROM public.responses_all r
         JOIN public.attempts a ON a.id = r.attempt_id
         JOIN public.questions qn ON qn.id = r.question_id
         WHERE a.survey_id = :sid
@@ -1658,7 +1495,7 @@ def list_comments(
                r.texto->>'positivos'   AS positivos,
                r.texto->>'mejorar'     AS mejorar,
                r.texto->>'comentarios' AS comentarios
-        FROM public.responses r
+        FROM public.responses_all r
         JOIN public.attempts a ON a.id = r.attempt_id
         JOIN public.teachers t ON t.id = a.teacher_id
         JOIN public.questions qn ON qn.id = r.question_id
@@ -1683,6 +1520,7 @@ def list_comments(
 # 7) PROGRESO DIARIO (serie temporal)
 # =============================
 @router.get("/progress/daily", response_model=ProgressDailyOut)
+@_cached_report("progress/daily")
 def progress_daily(
     survey_id: UUID = Query(..., description="ID de encuesta"),
     date_from: Optional[str] = Query(None, alias="from", description="YYYY-MM-DD (opcional)"),
@@ -1729,6 +1567,7 @@ def progress_daily(
     )
 
 @router.get("/sections/summary", response_model=list[SectionSummaryRow])
+@_cached_report("sections/summary")
 def sections_summary(
     survey_id: UUID = Query(..., description="ID de encuesta"),
     db: Session = Depends(get_db),
@@ -1744,25 +1583,17 @@ def sections_summary(
     _ensure_survey(db, survey_id)
 
     rows = db.execute(text("""
-        WITH likert AS (
-          SELECT q.section_id,
-                 q.id  AS question_id,
-                 q.codigo,
-                 q.enunciado,
-                 r.valor_likert::numeric AS val
-          FROM public.responses r
-          JOIN public.attempts  a ON a.id = r.attempt_id
-          JOIN public.questions q ON q.id = r.question_id
-          WHERE a.survey_id = :sid
-            AND a.estado   = 'enviado'
-            AND r.valor_likert IS NOT NULL
+        -- promedio por pregunta dentro de su sección (desde el cubo)
+        WITH perq AS (
+          SELECT q.section_id, c.question_id,
+                 SUM(c.n)          AS n,
+                 SUM(c.likert_sum) AS likert_sum,
+                 SUM(c.likert_sum)::numeric / NULLIF(SUM(c.n), 0) AS avg_q
+          FROM public.report_cube c
+          JOIN public.questions q ON q.id = c.question_id
+          WHERE c.survey_id = :sid
             AND q.tipo = 'likert'
-        ),
-        -- promedio por pregunta dentro de su sección
-        perq AS (
-          SELECT section_id, question_id, AVG(val) AS avg_q
-          FROM likert
-          GROUP BY section_id, question_id
+          GROUP BY q.section_id, c.question_id
         ),
         best AS (
           SELECT section_id, question_id, avg_q,
@@ -1779,11 +1610,11 @@ def sections_summary(
             s.id     AS section_id,
             s.titulo AS titulo,
             COUNT(DISTINCT q.id)                                   AS n_preguntas,
-            COUNT(l.val)                                           AS n_respuestas,
-            AVG(l.val)                                             AS promedio
+            COALESCE(SUM(p.n), 0)                                  AS n_respuestas,
+            SUM(p.likert_sum)::numeric / NULLIF(SUM(p.n), 0)       AS promedio
           FROM public.survey_sections s
           JOIN public.questions q ON q.section_id = s.id
-          LEFT JOIN likert l      ON l.question_id = q.id
+          LEFT JOIN perq p        ON p.question_id = q.id
           WHERE s.survey_id = :sid
             AND q.tipo = 'likert'
           GROUP BY s.id, s.titulo
@@ -1839,6 +1670,8 @@ def sections_summary(
 @router.get("/exports/survey/{survey_id}/responses.csv")
 def export_responses_csv(
     survey_id: UUID = Path(..., description="ID de encuesta"),
+    tz: Optional[str] = Query(None, description="Zona horaria para enviado_en (por defecto la de la sesión de BD)"),
+    bom: bool = Query(False, description="Antepone BOM UTF-8 (Excel)"),
     db: Session = Depends(get_db),
     _admin = Depends(require_admin),
 ):
@@ -1847,10 +1680,22 @@ def export_responses_csv(
     Columnas:
       attempt_id, user_id, teacher_id, question_id, codigo, section,
       valor_likert, texto_json, enviado_en
+    Con psycopg2 el CSV lo arma PostgreSQL (COPY ... TO STDOUT, ver
+    services/csv_export.copy_csv_chunks); si no, se recorre fila a fila.
+    Ambos caminos dan los mismos bytes y el formato de siempre (líneas CRLF,
+    enviado_en como str(datetime) con offset, p. ej. 2025-03-01
+    10:00:00.123456+00:00); `tz` solo cambia la zona en que se expresa.
+    texto_json es el texto del jsonb: coincide con el json.dumps anterior salvo
+    números no enteros, que conservan el literal guardado ("1.50" y no 1.5).
     """
     _ensure_survey(db, survey_id)
 
-    rows = db.execute(text("""
+    if tz:
+        # Zona de la transacción: to_char imprime la hora local y su offset
+        db.execute(text("SELECT set_config('TimeZone', :tz, true)"), {"tz": tz})
+
+    enviado = "COALESCE(a.actualizado_en, a.creado_en)"
+    sql = f"""
       SELECT
         a.id AS attempt_id,
         a.user_id,
@@ -1859,54 +1704,29 @@ def export_responses_csv(
         q.codigo,
         s.titulo AS section,
         r.valor_likert,
-        r.texto,
-        COALESCE(a.actualizado_en, a.creado_en) AS enviado_en
+        CAST(r.texto AS text) AS texto_json,
+        {py_timestamp_sql(enviado)} AS enviado_en
       FROM public.attempts a
-      JOIN public.responses r ON r.attempt_id = a.id
+      JOIN public.responses_all r ON r.attempt_id = a.id
       JOIN public.questions q ON q.id = r.question_id
       JOIN public.survey_sections s ON s.id = q.section_id
       WHERE a.survey_id = :sid
         AND a.estado = 'enviado'
-      ORDER BY COALESCE(a.actualizado_en, a.creado_en) DESC, a.id, q.orden
-    """), {"sid": str(survey_id)}).mappings().all()
+      ORDER BY {enviado} DESC, a.id, q.orden
+    """
+    params = {"sid": str(survey_id)}
+    filename = f"survey-{survey_id}-responses.csv"
+
+    if supports_copy(db):
+        return csv_response(filename, copy_csv_chunks(db, sql, params, bom=bom))
 
-    buf = io.StringIO()
-    w = csv.writer(buf)
-    w.writerow([
+    headers = [
         "attempt_id","user_id","teacher_id","question_id",
         "codigo","section","valor_likert","texto_json","enviado_en"
-    ])
-
-    for r in rows:
-        texto_obj = r.get("texto")
-        # Aseguramos serialización legible del JSONB
-        if texto_obj is None:
-            texto_str = ""
-        else:
-            try:
-                texto_str = json.dumps(texto_obj, ensure_ascii=False)
-            except Exception:
-                texto_str = str(texto_obj)
-
-        w.writerow([
-            r["attempt_id"],
-            r.get("user_id"),
-            r.get("teacher_id"),
-            r["question_id"],
-            r.get("codigo"),
-            r.get("section"),
-            r.get("valor_likert"),
-            texto_str,
-            r.get("enviado_en"),
-        ])
+    ]
 
-    buf.seek(0)
-    filename = f"survey-{survey_id}-responses.csv"
-    return StreamingResponse(
-        buf,
-        media_type="text/csv; charset=utf-8",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    rows = stream_rows(db, sql, params)
+    return csv_response(filename, csv_chunks(headers, ([r[h] for h in headers] for r in rows), bom=bom))
 
 
 @router.get("/exports/survey/{survey_id}/responses-pretty.csv")
@@ -1917,8 +1737,7 @@ def export_csv_pretty(
     db: Session = Depends(get_db),
     _admin = Depends(require_admin),
 ):
-    rows = db.execute(
-        text("""
+    sql = """
             SELECT
               a.id AS attempt_id,
               a.user_id,
@@ -1956,7 +1775,7 @@ def export_csv_pretty(
               ) AS enviado_local
 
             FROM public.attempts a
-            JOIN public.responses r ON r.attempt_id = a.id
+            JOIN public.responses_all r ON r.attempt_id = a.id
             JOIN public.questions q ON q.id = r.question_id
             JOIN public.survey_sections s ON s.id = q.section_id
             JOIN public.teachers t ON t.id = a.teacher_id
@@ -1964,14 +1783,7 @@ def export_csv_pretty(
             WHERE a.survey_id = :sid
               AND a.estado = 'enviado'
             ORDER BY enviado_local DESC, docente_nombre, pregunta_codigo
-
-        """),
-        {"sid": str(survey_id), "tz": tz}
-    ).mappings().all()
-
-    import io, csv
-    buf = io.StringIO()
-    buf.write("\ufeff")  # BOM para Excel
+    """
 
     human_headers = [
         "enviado_local",
@@ -1983,10 +1795,7 @@ def export_csv_pretty(
     ]
     id_headers = ["attempt_id", "user_id", "teacher_id", "question_id"] if include_ids else []
 
-    w = csv.writer(buf)
-    w.writerow(human_headers + id_headers)
-
-    for r in rows:
+    def to_row(r):
         row = [
             r.get("enviado_local") or "",
             r.get("usuario_email") or "",
@@ -2010,15 +1819,12 @@ def export_csv_pretty(
                 r.get("teacher_id"),
                 r.get("question_id"),
             ]
-        w.writerow(row)
-
-    buf.seek(0)
-    from fastapi.responses import StreamingResponse
-    filename = f"survey-{survey_id}-responses-pretty.csv"
-    return StreamingResponse(
-        buf,
-        media_type="text/csv; charset=utf-8",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        return row
+
+    rows = stream_rows(db, sql, {"sid": str(survey_id), "tz": tz})
+    return csv_response(
+        f"survey-{survey_id}-responses-pretty.csv",
+        csv_chunks(human_headers + id_headers, map(to_row, rows), bom=True),
     )
 
 
@@ -2068,7 +1874,7 @@ def export_questions_csv(
     
     if include_stats:
         base_query += """
-        LEFT JOIN public.responses r ON r.question_id = q.id
+        LEFT JOIN public.responses_all r ON r.question_id = q.id
         LEFT JOIN public.attempts a ON a.id = r.attempt_id AND a.survey_id = :sid
         """
     
@@ -2085,13 +1891,6 @@ def export_questions_csv(
         ORDER BY q.orden
     """
     
-    rows = db.execute(text(base_query), {"sid": str(survey_id)}).mappings().all()
-    
-    # Generar CSV
-    buf = io.StringIO()
-    buf.write("\ufeff")  # BOM para Excel
-    w = csv.writer(buf)
-    
     # Headers
     headers = [
         "question_id",
@@ -2110,10 +1909,8 @@ def export_questions_csv(
             "desviacion_estandar",
         ])
     
-    w.writerow(headers)
-    
     # Filas
-    for r in rows:
+    def to_row(r):
         row = [
             str(r["question_id"]),
             r.get("codigo") or "",
@@ -2130,13 +1927,7 @@ def export_questions_csv(
                 r.get("promedio") if r.get("promedio") is not None else "",
                 r.get("desviacion_estandar") if r.get("desviacion_estandar") is not None else "",
             ])
-        
-        w.writerow(row)
+        return row
     
-    buf.seek(0)
-    filename = f"survey-{survey_id}-questions.csv"
-    return StreamingResponse(
-        buf,
-        media_type="text/csv; charset=utf-8",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    rows = stream_rows(db, base_query, {"sid": str(survey_id)})
+    return csv_response(f"survey-{survey_id}-questions.csv", csv_chunks(headers, map(to_row, rows), bom=True))
@@ -8,6 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+from app.core.principal import bump_authz_version, invalidate_principal
 from app.core.security import get_admin_user
 from app.db.session import get_db
 from app.models.user import User, Role, UserRole
@@ -94,7 +95,9 @@ def grant_role(
         )
 
     db.add(UserRole(user_id=user.id, role_id=role.id))
+    bump_authz_version(db, [user.id])
     db.commit()
+    invalidate_principal([user.id])
 
     roles_after = _list_roles_for_user(db, user.id)
     return RoleChangeOut(
@@ -154,7 +157,9 @@ def revoke_role(
         )
 
     db.delete(row)
+    bump_authz_version(db, [user.id])
     db.commit()
+    invalidate_principal([user.id])
 
     roles_after = _list_roles_for_user(db, user.id)
     return RoleChangeOut(
@@ -11,6 +11,9 @@ from app.core.security import get_admin_user
 from app.db.session import get_db
 from app.models.docente import Teacher, SurveyTeacherAssignment
 from app.models.encuesta import Survey, Question
+from app.services.survey_cache import invalidate_survey_definition
+from app.services.attempt_scores import recompute_attempt_scores
+from app.services.survey_versions import bump_assignments_version, bump_data_version
 from app.schemas.admin import (
     AssignTeachersIn,
     AssignTeachersOut,
@@ -99,6 +102,8 @@ def admin_assign_teachers(
             .delete(synchronize_session=False)
         )
 
+    if added or removed:
+        bump_assignments_version(db, survey_id)
     db.commit()
 
     # 5) Resultado final
@@ -137,8 +142,13 @@ def admin_update_question_weight(
         raise HTTPException(status_code=400, detail="El peso debe ser > 0")
 
     q.peso = float(payload.peso)
+    db.flush()
+    # Los puntajes persistidos dependen del peso: recalcular en la misma transacción
+    recompute_attempt_scores(db, survey_id=survey_id)
+    bump_data_version(db, [survey_id])
     db.commit()
     db.refresh(q)
+    invalidate_survey_definition(survey_id)
 
     return QuestionOut(
         id=q.id,
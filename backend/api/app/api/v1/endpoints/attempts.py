@@ -1,118 +1,58 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
-from uuid import UUID
-from typing import Optional
+from uuid import UUID, uuid4
+from typing import NamedTuple, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Header
 from fastapi import Response as FastAPIResponse
-from sqlalchemy import func, or_
+from sqlalchemy import delete, insert, or_
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.context import RequestContext
 from app.core.security import (
+    current_user_id,
     get_current_user,
     get_current_user_with_claims,  # si lo usas en otros lados
     get_admin_user,
+    get_request_context,
 )
 from app.db.session import get_db
 from app.api.v1.endpoints.sessions import require_turno_open  # exige turno abierto
-from app.models.encuesta import Survey, Question, SurveySection
 from app.models.docente import Teacher, SurveyTeacherAssignment
-from app.models.attempt import Attempt, Response as AttemptResponse
-from app.models.attempt_limit import AttemptLimit
-from app.models.turno import Turno
+from app.models.attempt import Attempt, AttemptLikert, Response as AttemptResponse
+from app.services.attempt_state import get_attempt_state
+from app.services.attempt_expiry import effective_estado, is_stale
+from app.services.scoring import compute_scores
+from app.services.attempt_scores import build_score_rows, save_attempt_scores
+from app.services.report_cube import apply_cube_deltas, cube_deltas
+from app.services.survey_counters import record_transitions
+from app.services.survey_cache import get_survey_definition
+from app.services.teacher_permissions import is_teacher_allowed
+from app.services.turno_state import close_turno
+from app.services.likert_storage import compact_enabled, pack_likert, unpack_likert
+from app.services.autosave import PendingDelta, apply_deltas, autosave_buffer
 from app.schemas.attempts import (
     AttemptsCreateIn,
     AttemptOut,
     AttemptPatchIn,
     SubmitIn,
     SubmitOut,
+    SubmitBatchIn,
+    SubmitBatchItemOut,
+    SubmitBatchOut,
     NextItemOut,
 )
 
 router = APIRouter(tags=["attempts"])
 
 ATTEMPT_TIMEOUT_MIN = 30
-BASE_MAX_SESSIONS = 2
 MAX_DOCENTES_POR_CREACION = 20
 
 
 # -------------------- helpers -------------------- #
 
-def _max_permitidos(db: Session, survey_id: UUID, user_id: UUID) -> int:
-    row = (
-        db.query(AttemptLimit)
-        .filter(AttemptLimit.survey_id == survey_id, AttemptLimit.user_id == user_id)
-        .first()
-    )
-    base = row.max_intentos if row and row.max_intentos is not None else BASE_MAX_SESSIONS
-    extra = row.extra_otorgados if row else 0
-    return int(base) + int(extra)
-
-def _extract_user_id(current) -> UUID:
-    val = None
-    if hasattr(current, "id"):
-        val = getattr(current, "id", None)
-    if val is None and isinstance(current, dict):
-        val = current.get("sub") or current.get("id")
-    if not val:
-        raise HTTPException(status_code=401, detail="No se pudo obtener el usuario del token")
-    return UUID(str(val))
-
-def _expire_stale_attempts(db: Session, survey_id: UUID, user_id: UUID) -> int:
-    now = datetime.now(timezone.utc)
-    updated = (
-        db.query(Attempt)
-        .filter(
-            Attempt.survey_id == survey_id,
-            Attempt.user_id == user_id,
-            Attempt.estado == "en_progreso",
-            Attempt.expires_at.isnot(None),
-            Attempt.expires_at <= now,
-        )
-        .update({Attempt.estado: "expirado"}, synchronize_session=False)
-    )
-    if updated:
-        db.commit()
-    return updated
-
-def _count_failures(db: Session, survey_id: UUID, user_id: UUID) -> int:
-    return (
-        db.query(func.count(Attempt.id))
-        .filter(
-            Attempt.survey_id == survey_id,
-            Attempt.user_id == user_id,
-            Attempt.estado.in_(["fallido", "expirado"]),
-        )
-        .scalar()
-    ) or 0
-
-def _active_session_nro(db: Session, survey_id: UUID, user_id: UUID, now: datetime) -> int | None:
-    return db.query(func.max(Attempt.intento_nro)).filter(
-        Attempt.survey_id == survey_id,
-        Attempt.user_id == user_id,
-        Attempt.estado == "en_progreso",
-        or_(Attempt.expires_at.is_(None), Attempt.expires_at > now),
-    ).scalar()
-
-def _max_session_nro(db: Session, survey_id: UUID, user_id: UUID) -> int:
-    val = db.query(func.max(Attempt.intento_nro)).filter(
-        Attempt.survey_id == survey_id,
-        Attempt.user_id == user_id,
-    ).scalar()
-    return int(val or 0)
-
-def _count_used_sessions(db: Session, survey_id: UUID, user_id: UUID) -> int:
-    return int((
-        db.query(func.count(func.distinct(Attempt.intento_nro)))
-        .filter(
-            Attempt.survey_id == survey_id,
-            Attempt.user_id == user_id,
-            Attempt.estado.in_(["expirado", "fallido"]),
-        )
-        .scalar()
-    ) or 0)
-
 def _close_latest_open_turno_if_idle(db: Session, user_id: UUID, survey_id: UUID) -> None:
     """
     Si ya no quedan attempts en progreso para ese usuario/encuesta,
@@ -128,17 +68,8 @@ def _close_latest_open_turno_if_idle(db: Session, user_id: UUID, survey_id: UUID
     if still_open:
         return  # aún hay algo en progreso; no se cierra
 
-    t = (
-        db.query(Turno)
-        .filter(Turno.user_id == user_id, Turno.status == "open")
-        .order_by(Turno.opened_at.desc())
-        .first()
-    )
-    if t:
-        t.status = "closed"
-        t.closed_at = func.now()
-        db.add(t)
-        db.commit()
+    close_turno(db, user_id)
+
 
 
 # -------------------- endpoints -------------------- #
@@ -149,53 +80,10 @@ def attempts_summary(
     db: Session = Depends(get_db),
     current=Depends(get_current_user),
 ):
-    user_id = _extract_user_id(current)
-    _expire_stale_attempts(db, survey_id, user_id)
-
-    rows = (
-        db.query(Attempt.estado, func.count(Attempt.id))
-        .filter(Attempt.survey_id == survey_id, Attempt.user_id == user_id)
-        .group_by(Attempt.estado)
-        .all()
-    )
-    counts = {estado: n for estado, n in rows}
-
-    now = datetime.now(timezone.utc)
-    intento_activo = _active_session_nro(db, survey_id, user_id, now)
-    ultimo_intento = _max_session_nro(db, survey_id, user_id)
-    used_sessions = _count_used_sessions(db, survey_id, user_id)
-
-    max_permitidos = _max_permitidos(db, survey_id, user_id)
-    restantes = max(0, max_permitidos - used_sessions)
-
-    open_exp = (
-        db.query(func.max(Attempt.expires_at))
-        .filter(
-            Attempt.survey_id == survey_id,
-            Attempt.user_id == user_id,
-            Attempt.estado == "en_progreso",
-            or_(Attempt.expires_at.is_(None), Attempt.expires_at > now),
-        )
-        .scalar()
-    )
-    has_open = bool(intento_activo and (open_exp is None or open_exp > now))
+    user_id = current_user_id(current)
 
-    return {
-        "survey_id": str(survey_id),
-        "intento_activo": intento_activo,
-        "ultimo_intento": ultimo_intento,
-        "max_permitidos": max_permitidos,
-        "usadas": used_sessions,
-        "restantes": restantes,
-        "has_open_session": has_open,
-        "open_session_expires_at": open_exp,
-        "estados": {
-            "en_progreso": counts.get("en_progreso", 0),
-            "enviado": counts.get("enviado", 0),
-            "expirado": counts.get("expirado", 0),
-            "fallido": counts.get("fallido", 0),
-        },
-    }
+    state = get_attempt_state(db, survey_id, user_id)
+    return state.summary_payload()
 
 @router.get("/attempts/next", response_model=NextItemOut)
 def get_next(
@@ -203,8 +91,7 @@ def get_next(
     db: Session = Depends(get_db),
     current=Depends(get_current_user),
 ):
-    user_id = _extract_user_id(current)
-    _expire_stale_attempts(db, survey_id, user_id)
+    user_id = current_user_id(current)
 
     now = datetime.now(timezone.utc)
     row = (
@@ -242,24 +129,10 @@ def get_attempts_quota(
     db: Session = Depends(get_db),
     current=Depends(get_current_user),
 ):
-    user_id = _extract_user_id(current)
-    _expire_stale_attempts(db, survey_id, user_id)
-
-    max_permitidos = _max_permitidos(db, survey_id, user_id)
-    counts = dict(
-        db.query(Attempt.estado, func.count(Attempt.id))
-        .filter(Attempt.survey_id == survey_id, Attempt.user_id == user_id)
-        .group_by(Attempt.estado)
-        .all()
-    )
-    fallidos = (counts.get("fallido", 0) or 0) + (counts.get("expirado", 0) or 0)
-    restantes = max(0, max_permitidos - fallidos)
-    return {
-        "survey_id": str(survey_id),
-        "max_permitidos": max_permitidos,
-        "fallidos": fallidos,
-        "restantes": restantes,
-    }
+    user_id = current_user_id(current)
+
+    state = get_attempt_state(db, survey_id, user_id)
+    return state.quota_payload()
 
 @router.get("/attempts", response_model=list[AttemptOut])
 def list_attempts(
@@ -267,18 +140,18 @@ def list_attempts(
     db: Session = Depends(get_db),
     current=Depends(get_current_user),
 ):
-    user_id = _extract_user_id(current)
+    user_id = current_user_id(current)
     q = db.query(Attempt).filter(Attempt.user_id == user_id)
     if survey_id:
-        _expire_stale_attempts(db, survey_id, user_id)
         q = q.filter(Attempt.survey_id == survey_id)
     rows = q.all()
+    now = datetime.now(timezone.utc)
     return [
         AttemptOut(
             id=r.id,
             survey_id=r.survey_id,
             teacher_id=r.teacher_id,
-            estado=r.estado,
+            estado=effective_estado(r, now),
             intento_nro=r.intento_nro,
             expires_at=r.expires_at,
         )
@@ -291,12 +164,13 @@ def create_attempts(
     payload: AttemptsCreateIn,
     db: Session = Depends(get_db),
     current=Depends(get_current_user),
+    ctx: RequestContext = Depends(get_request_context),
     turno=Depends(require_turno_open),  # exige turno abierto
     survey_id_q: Optional[UUID] = Query(None, description="(fallback) ID de encuesta si no viene en el body"),
     x_survey_id: Optional[UUID] = Header(None, alias="X-Survey-Id"),
 ):
     # --- usuario / encuesta ---
-    user_id = _extract_user_id(current)
+    user_id = current_user_id(current)
     survey_id: Optional[UUID] = payload.survey_id or survey_id_q or x_survey_id
     if not survey_id:
         raise HTTPException(
@@ -304,19 +178,23 @@ def create_attempts(
             detail="Falta survey_id. Envíalo en el body como 'survey_id', o como query ?survey_id=, o header X-Survey-Id."
         )
 
-    survey = db.query(Survey).filter(Survey.id == survey_id, Survey.estado == "activa").first()
+    survey = ctx.active_survey(survey_id)
     if not survey:
         raise HTTPException(status_code=404, detail="Encuesta no encontrada o inactiva")
 
-    # --- housekeeping ---
-    _expire_stale_attempts(db, survey_id=survey_id, user_id=user_id)
+    # Normaliza: dedup conservando orden
+    teacher_ids: list[UUID] = list(dict.fromkeys(payload.teacher_ids))
+    if len(teacher_ids) > MAX_DOCENTES_POR_CREACION:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_DOCENTES_POR_CREACION} docentes por operación")
 
-    fails = _count_failures(db, survey_id=survey_id, user_id=user_id)
-    max_permitidos = _max_permitidos(db, survey_id, user_id)
-    if fails >= max_permitidos:
+    # --- límite de fallos (los vencidos ya cuentan como expirados en la foto) ---
+    now = datetime.now(timezone.utc)
+    state = get_attempt_state(db, survey_id, user_id, now)
+    fails = state.fallidos
+    if fails >= state.max_permitidos:
         raise HTTPException(status_code=403, detail="Límite de intentos fallidos alcanzado")
 
-    # Traemos los docentes válidos *para esa encuesta* y armamos un mapa id -> nombre
+    # Docentes válidos *para esa encuesta* entre los solicitados: id -> nombre
     valid_teachers: dict[UUID, str] = {
         tid: tnom
         for (tid, tnom) in (
@@ -324,6 +202,7 @@ def create_attempts(
             .join(SurveyTeacherAssignment, SurveyTeacherAssignment.teacher_id == Teacher.id)
             .filter(
                 SurveyTeacherAssignment.survey_id == survey_id,
+                Teacher.id.in_(teacher_ids),
                 Teacher.estado == "activo",
             )
             .all()
@@ -331,121 +210,165 @@ def create_attempts(
     }
 
     # Validamos que todos los IDs recibidos pertenezcan a la encuesta
-    for tid in payload.teacher_ids:
+    for tid in teacher_ids:
         if tid not in valid_teachers:
             raise HTTPException(status_code=400, detail=f"Docente {tid} no pertenece a la encuesta")
 
-    intento_nro = fails + 1
-    expires = datetime.now(timezone.utc) + timedelta(minutes=ATTEMPT_TIMEOUT_MIN)
-    now = datetime.now(timezone.utc)
+    # Matriz de permisos (caché por usuario): si existe, solo esos docentes
+    for tid in teacher_ids:
+        if not is_teacher_allowed(db, survey_id, user_id, tid):
+            raise HTTPException(status_code=403, detail=f"Docente {tid} no está permitido para este usuario")
 
-    created: list[Attempt] = []
-    for tid in payload.teacher_ids:
-        # Evitar duplicados ya enviados
-        already_sent = (
-            db.query(Attempt.id)
-            .filter(
-                Attempt.survey_id == survey_id,
-                Attempt.user_id == user_id,
-                Attempt.teacher_id == tid,
-                Attempt.estado == "enviado",
-            )
-            .first()
+    # --- prefetch único de attempts relevantes (enviado / en_progreso) para esos docentes ---
+    sent: set[UUID] = set()
+    live: dict[UUID, Attempt] = {}
+    stale_ids: list[UUID] = []
+    for att in (
+        db.query(Attempt)
+        .filter(
+            Attempt.survey_id == survey_id,
+            Attempt.user_id == user_id,
+            Attempt.teacher_id.in_(teacher_ids),
+            Attempt.estado.in_(["enviado", "en_progreso"]),
         )
-        if already_sent:
+        .all()
+    ):
+        if att.estado == "enviado":
+            sent.add(att.teacher_id)
+        elif is_stale(att, now):
+            stale_ids.append(att.id)
+        else:
+            live.setdefault(att.teacher_id, att)
+
+    # Evitar duplicados ya enviados
+    for tid in teacher_ids:
+        if tid in sent:
             nombre_doc = valid_teachers.get(tid) or "Docente"
-            # 👉 ahora devolvemos el NOMBRE del docente
             raise HTTPException(
                 status_code=409,
                 detail=f"Docente '{nombre_doc}' ya fue evaluado por este usuario"
             )
 
-        # Reusar en_progreso vigente (si existe y no expiró)
-        existing = (
-            db.query(Attempt)
-            .filter(
-                Attempt.survey_id == survey_id,
-                Attempt.user_id == user_id,
-                Attempt.teacher_id == tid,
-                Attempt.estado == "en_progreso",
-                or_(Attempt.expires_at.is_(None), Attempt.expires_at > now),
-            )
-            .first()
-        )
-        if existing:
-            created.append(existing)
-            continue
+    # Marcar como expirados los 'en_progreso' vencidos de esos docentes (misma transacción)
+    transitions: list[tuple] = []
+    if stale_ids:
+        n_stale = db.query(Attempt).filter(
+            Attempt.id.in_(stale_ids), Attempt.estado == "en_progreso"
+        ).update({Attempt.estado: "expirado"}, synchronize_session=False)
+        transitions += [(survey_id, "en_progreso", "expirado")] * n_stale
 
-        # Marcar como expirados los 'en_progreso' vencidos de ese docente
-        stale = (
-            db.query(Attempt)
-            .filter(
-                Attempt.survey_id == survey_id,
-                Attempt.user_id == user_id,
-                Attempt.teacher_id == tid,
-                Attempt.estado == "en_progreso",
-                Attempt.expires_at.isnot(None),
-                Attempt.expires_at <= now,
+    # --- un solo INSERT multi-fila para los docentes sin intento vigente ---
+    intento_nro = fails + 1
+    expires = now + timedelta(minutes=ATTEMPT_TIMEOUT_MIN)
+    new_rows = [
+        {
+            "id": uuid4(),
+            "survey_id": survey_id,
+            "user_id": user_id,
+            "teacher_id": tid,
+            "intento_nro": intento_nro,
+            "estado": "en_progreso",
+            "expires_at": expires,
+        }
+        for tid in teacher_ids
+        if tid not in live
+    ]
+    created: dict[UUID, AttemptOut] = {}
+    if new_rows:
+        inserted = db.execute(
+            insert(Attempt)
+            .values(new_rows)
+            .returning(
+                Attempt.id, Attempt.survey_id, Attempt.teacher_id,
+                Attempt.estado, Attempt.intento_nro, Attempt.expires_at,
+            )
+        ).all()
+        transitions += [(survey_id, None, "en_progreso")] * len(inserted)
+        for r in inserted:
+            created[r.teacher_id] = AttemptOut(
+                id=r.id,
+                survey_id=r.survey_id,
+                teacher_id=r.teacher_id,
+                estado=r.estado,
+                intento_nro=r.intento_nro,
+                expires_at=r.expires_at,
             )
-            .update({Attempt.estado: "expirado"}, synchronize_session=False)
-        )
-        if stale:
-            db.commit()
-            fails = _count_failures(db, survey_id, user_id)
-            if fails >= _max_permitidos(db, survey_id, user_id):
-                raise HTTPException(status_code=403, detail="Límite de intentos fallidos alcanzado")
-            intento_nro = fails + 1
-
-        # Crear nuevo intento
-        att = Attempt(
-            survey_id=survey_id,
-            user_id=user_id,
-            teacher_id=tid,
-            intento_nro=intento_nro,
-            estado="en_progreso",
-            expires_at=expires,
-        )
-        db.add(att)
-        created.append(att)
 
+    record_transitions(db, transitions)
     db.commit()
-    for att in created:
-        db.refresh(att)
 
-    return [
-        AttemptOut(
+    # Respuesta en el orden solicitado: reutilizados + recién creados
+    out: list[AttemptOut] = []
+    for tid in teacher_ids:
+        if tid in created:
+            out.append(created[tid])
+            continue
+        att = live[tid]
+        out.append(AttemptOut(
             id=att.id,
             survey_id=att.survey_id,
             teacher_id=att.teacher_id,
             estado=att.estado,
             intento_nro=att.intento_nro,
             expires_at=att.expires_at,
-        )
-        for att in created
-    ]
+        ))
+    return out
 
 
 @router.patch("/attempts/{attempt_id}", response_model=AttemptOut)
 def patch_attempt(
     attempt_id: UUID,
     payload: AttemptPatchIn,
+    response: FastAPIResponse,
     db: Session = Depends(get_db),
     current=Depends(get_current_user),
 ):
-    user_id = _extract_user_id(current)
+    user_id = current_user_id(current)
     att = db.query(Attempt).filter(Attempt.id == attempt_id, Attempt.user_id == user_id).first()
     if not att:
         raise HTTPException(status_code=404, detail="Attempt no encontrado")
     if att.estado != "en_progreso":
         raise HTTPException(status_code=409, detail=f"No editable en estado {att.estado}")
+    # Una renovación aún en el buffer cuenta: el PATCH que la trajo ya la informó
+    now = datetime.now(timezone.utc)
+    pending_until = autosave_buffer.pending_expires_at(att.id)
+    if is_stale(att, now) and not (pending_until and pending_until > now):
+        autosave_buffer.discard(att.id)
+        att.estado = "expirado"
+        record_transitions(db, [(att.survey_id, "en_progreso", "expirado")])
+        db.commit()
+        raise HTTPException(status_code=409, detail="Attempt expirado (30 min)")
 
-    if payload.progreso is not None:
-        att.progreso_json = payload.progreso
+    renew_until = None
     if payload.renew is None or payload.renew:
-        att.expires_at = datetime.now(timezone.utc) + timedelta(minutes=ATTEMPT_TIMEOUT_MIN)
+        renew_until = datetime.now(timezone.utc) + timedelta(minutes=ATTEMPT_TIMEOUT_MIN)
+
+    if payload.progreso is None:
+        # Autosave: delta y/o renovación se acumulan y se escriben en lote
+        delta = payload.delta or {}
+        if settings.AUTOSAVE_FLUSH_SECONDS > 0 and autosave_buffer.add(att.id, delta, renew_until):
+            response.headers["X-Autosave"] = "buffered"
+            return AttemptOut(
+                id=att.id,
+                survey_id=att.survey_id,
+                teacher_id=att.teacher_id,
+                estado=att.estado,
+                intento_nro=att.intento_nro,
+                expires_at=max(filter(None, [att.expires_at, renew_until]), default=None),
+            )
+        pending = PendingDelta()
+        pending.merge(delta, renew_until)
+        apply_deltas(db, {att.id: pending})
+    else:
+        # Reemplazo completo: lo pendiente queda obsoleto
+        autosave_buffer.discard(att.id)
+        att.progreso_json = payload.progreso
+        if renew_until:
+            att.expires_at = renew_until
 
     db.commit()
     db.refresh(att)
+    response.headers["X-Autosave"] = "written"
     return AttemptOut(
         id=att.id,
         survey_id=att.survey_id,
@@ -455,82 +378,128 @@ def patch_attempt(
         expires_at=att.expires_at,
     )
 
-@router.post("/attempts/{attempt_id}/submit", response_model=SubmitOut)
-def submit_attempt(
-    attempt_id: UUID,
-    payload: SubmitIn,
-    db: Session = Depends(get_db),
-    current=Depends(get_current_user),
-):
-    user_id = _extract_user_id(current)
+class _Submission(NamedTuple):
+    rows: list[dict]            # filas de responses
+    likert_row: Optional[dict]  # fila de attempt_likert (LIKERT_STORAGE=compact)
+    score_row: dict             # fila de attempt_scores
+    section_rows: list[dict]    # filas de attempt_section_scores
+    cube_rows: list[dict]       # deltas de report_cube
+    total: Optional[float]
+    secciones: list[dict]
 
-    att = db.query(Attempt).filter(Attempt.id == attempt_id, Attempt.user_id == user_id).first()
-    if not att:
-        raise HTTPException(status_code=404, detail="Attempt no encontrado")
-    if att.estado == "enviado":
-        raise HTTPException(status_code=409, detail="Attempt ya fue enviado")
-    if att.expires_at and datetime.now(timezone.utc) > att.expires_at:
-        att.estado = "expirado"
-        db.commit()
-        raise HTTPException(status_code=409, detail="Attempt expirado (30 min)")
-
-    qs = db.query(Question).filter(Question.survey_id == att.survey_id).all()
-    likert_qs = [q for q in qs if (q.tipo or "").lower() == "likert"]
-    if len(likert_qs) != 15:
+def _build_submission(att: Attempt, payload: SubmitIn, sdef) -> _Submission:
+    """
+    Valida las respuestas de un attempt contra la definición cacheada y arma
+    las filas a insertar + puntajes. No escribe en BD; lanza HTTPException
+    si el payload no es válido.
+    """
+    if len(sdef.likert_ids) != 15:
         raise HTTPException(status_code=500, detail="Se esperaban 15 preguntas Likert")
 
-    likert_ids = {q.id for q in likert_qs}
-    provided_ids = {a.question_id for a in payload.answers}
-    missing = likert_ids - provided_ids
+    # Respuestas como dict (una entrada por pregunta): validación y puntaje en O(n)
+    values = {a.question_id: int(a.value) for a in payload.answers}
+    likert_ids = sdef.likert_ids
+    missing = likert_ids - values.keys()
     if missing:
         raise HTTPException(status_code=400, detail=f"Faltan respuestas a preguntas: {sorted(list(missing))}")
-
-    db.query(AttemptResponse).filter(AttemptResponse.attempt_id == att.id).delete(synchronize_session=False)
-    for a in payload.answers:
-        v = int(a.value)
-        if v not in (1, 2, 3, 4, 5):
-            raise HTTPException(status_code=400, detail=f"Valor inválido {a.value} en pregunta {a.question_id}")
-        db.add(AttemptResponse(attempt_id=att.id, question_id=a.question_id, valor_likert=v))
+    unknown = values.keys() - likert_ids
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Preguntas no pertenecen a la encuesta: {sorted(list(unknown))}")
+
+    if compact_enabled():
+        rows = []
+        likert_row = {
+            "attempt_id": att.id,
+            "survey_id": att.survey_id,
+            "valores": pack_likert(values, sdef.likert_order),
+        }
+    else:
+        rows = [
+            {"id": uuid4(), "attempt_id": att.id, "question_id": qid, "valor_likert": v, "texto": None}
+            for qid, v in values.items()
+        ]
+        likert_row = None
 
     # Guardar Q16 (pregunta de texto/comentarios) si tiene contenido
-    q16 = next((q for q in qs if q.codigo == "Q16"), None)
-    
-    if q16 and payload.q16:
+    q16_id = sdef.q16_id
+
+    if q16_id and payload.q16:
         # Verificar si hay al menos un campo con contenido real (no vacío)
         has_content = any([
             (payload.q16.positivos or "").strip(),
             (payload.q16.mejorar or "").strip(),
             (payload.q16.comentarios or "").strip()
         ])
-        
+
         if has_content:
             texto_data = payload.q16.model_dump(exclude_none=False)
-            response_obj = AttemptResponse(
-                attempt_id=att.id, 
-                question_id=q16.id, 
-                texto=texto_data
-            )
-            db.add(response_obj)
+            rows.append({
+                "id": uuid4(), "attempt_id": att.id, "question_id": q16_id,
+                "valor_likert": None, "texto": texto_data,
+            })
             # Opcional: log de éxito para monitoreo
             print(f"[INFO] Q16 guardado para attempt {att.id}")
 
-    pesos = {q.id: (q.peso or 1) for q in likert_qs}
-    sum_w = sum(pesos.values())
-    sum_wx = sum(int(a.value) * pesos[a.question_id] for a in payload.answers)
-    total_score = round(sum_wx / sum_w, 3) if sum_w else None
+    total_score, sec_scores = compute_scores(
+        values, pesos=sdef.pesos, section_of=sdef.section_of, sections=sdef.sections
+    )
+    score_row, section_rows = build_score_rows(att, values, sdef.section_of, total_score, sec_scores)
+    return _Submission(
+        rows, likert_row, score_row, section_rows, cube_deltas(att, values), total_score, sec_scores
+    )
+
+def _write_responses(db: Session, attempt_ids: list[UUID], rows: list[dict], likert_rows: list[dict]) -> None:
+    """Reemplaza las respuestas de los attempts con un DELETE y un INSERT multi-fila por tabla."""
+    db.query(AttemptResponse).filter(AttemptResponse.attempt_id.in_(attempt_ids)).delete(synchronize_session=False)
+    db.query(AttemptLikert).filter(AttemptLikert.attempt_id.in_(attempt_ids)).delete(synchronize_session=False)
+    if rows:
+        db.execute(insert(AttemptResponse), rows)
+    if likert_rows:
+        db.execute(insert(AttemptLikert), likert_rows)
 
-    sections = db.query(SurveySection).filter(SurveySection.survey_id == att.survey_id).all()
-    sec_scores = []
-    for sec in sections:
-        sec_q_ids = [q.id for q in likert_qs if q.section_id == sec.id]
-        if not sec_q_ids:
-            continue
-        sec_w = sum(pesos[qid] for qid in sec_q_ids)
-        sec_wx = sum(
-            next((int(a.value) * pesos[a.question_id] for a in payload.answers if a.question_id == qid), 0)
-            for qid in sec_q_ids
-        )
-        sec_scores.append({"section_id": sec.id, "titulo": sec.titulo, "score": round(sec_wx / sec_w, 3)})
+@router.post("/attempts/{attempt_id}/submit", response_model=SubmitOut)
+def submit_attempt(
+    attempt_id: UUID,
+    payload: SubmitIn,
+    db: Session = Depends(get_db),
+    current=Depends(get_current_user),
+):
+    user_id = current_user_id(current)
+
+    # FOR UPDATE: dos envíos simultáneos del mismo attempt sumarían dos veces al cubo
+    att = (
+        db.query(Attempt)
+        .filter(Attempt.id == attempt_id, Attempt.user_id == user_id)
+        .with_for_update()
+        .first()
+    )
+    if not att:
+        raise HTTPException(status_code=404, detail="Attempt no encontrado")
+    if att.estado == "enviado":
+        raise HTTPException(status_code=409, detail="Attempt ya fue enviado")
+
+    # Una renovación aún en el buffer cuenta (se escribe abajo, con el envío)
+    expires_at = max(filter(None, (att.expires_at, autosave_buffer.pending_expires_at(att.id))), default=None)
+    if expires_at and datetime.now(timezone.utc) > expires_at:
+        record_transitions(db, [(att.survey_id, att.estado, "expirado")])
+        att.estado = "expirado"
+        db.commit()
+        raise HTTPException(status_code=409, detail="Attempt expirado (30 min)")
+
+    sdef = get_survey_definition(db, att.survey_id)
+    sub = _build_submission(att, payload, sdef)
+
+    # Flush forzado del autosave pendiente, en la misma transacción del envío
+    # (después de validar: si el payload falla, el delta sigue en el buffer)
+    autosave_buffer.flush_pending(db, [att.id])
+
+    # Un solo INSERT multi-fila (sin unit-of-work del ORM por respuesta)
+    _write_responses(db, [att.id], sub.rows, [sub.likert_row] if sub.likert_row else [])
+    save_attempt_scores(db, [sub.score_row], sub.section_rows)
+    apply_cube_deltas(db, sub.cube_rows)
+    record_transitions(
+        db, [(att.survey_id, att.estado, "enviado")], sent=[(att.survey_id, att.teacher_id, att.user_id)]
+    )
 
     att.estado = "enviado"
     db.commit()
@@ -538,7 +507,108 @@ def submit_attempt(
     # Si ya no hay intentos abiertos para esta encuesta/usuario => cerrar turno
     _close_latest_open_turno_if_idle(db, user_id, att.survey_id)
 
-    return SubmitOut(estado="enviado", scores={"total": total_score, "secciones": sec_scores})
+    return SubmitOut(estado="enviado", scores={"total": sub.total, "secciones": sub.secciones})
+
+@router.post("/attempts/submit-batch", response_model=SubmitBatchOut)
+def submit_attempts_batch(
+    payload: SubmitBatchIn,
+    db: Session = Depends(get_db),
+    current=Depends(get_current_user),
+):
+    """
+    Envía varios attempts (uno por docente) en una sola request y transacción.
+    Cada item se valida por separado: los inválidos se devuelven con su error
+    y no impiden guardar los demás. El cierre de turno se revisa una sola vez.
+    """
+    user_id = current_user_id(current)
+    if len(payload.items) > MAX_DOCENTES_POR_CREACION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {MAX_DOCENTES_POR_CREACION} attempts por envío",
+        )
+
+    ids = [it.attempt_id for it in payload.items]
+    attempts = {
+        a.id: a
+        for a in (
+            db.query(Attempt)
+            .filter(Attempt.id.in_(ids), Attempt.user_id == user_id)
+            .order_by(Attempt.id)
+            .with_for_update()
+            .all()
+        )
+    }
+
+    now = datetime.now(timezone.utc)
+    # Flush forzado del autosave pendiente antes de tocar estados (se commitea abajo);
+    # devuelve el expires_at renovado, que los objetos ORM cargados arriba no ven
+    flushed = autosave_buffer.flush_pending(db, attempts.keys())
+
+    results: list[SubmitBatchItemOut] = []
+    ok_ids: list[UUID] = []
+    all_rows: list[dict] = []
+    likert_rows: list[dict] = []
+    score_rows: list[dict] = []
+    section_rows: list[dict] = []
+    cube_rows: list[dict] = []
+    survey_ids: set[UUID] = set()
+    seen: set[UUID] = set()
+    transitions: list[tuple] = []
+    sent: list[tuple] = []
+
+    for it in payload.items:
+        att = attempts.get(it.attempt_id)
+        try:
+            if it.attempt_id in seen:
+                raise HTTPException(status_code=400, detail="Attempt repetido en el envío")
+            seen.add(it.attempt_id)
+            if not att:
+                raise HTTPException(status_code=404, detail="Attempt no encontrado")
+            if att.estado == "enviado":
+                raise HTTPException(status_code=409, detail="Attempt ya fue enviado")
+            expires_at = flushed.get(att.id, att.expires_at)
+            if expires_at and now > expires_at:
+                transitions.append((att.survey_id, att.estado, "expirado"))
+                att.estado = "expirado"
+                raise HTTPException(status_code=409, detail="Attempt expirado (30 min)")
+
+            sdef = get_survey_definition(db, att.survey_id)
+            sub = _build_submission(att, it, sdef)
+        except HTTPException as e:
+            results.append(SubmitBatchItemOut(
+                attempt_id=it.attempt_id, ok=False, status_code=e.status_code, error=str(e.detail),
+            ))
+            continue
+
+        transitions.append((att.survey_id, att.estado, "enviado"))
+        sent.append((att.survey_id, att.teacher_id, att.user_id))
+        att.estado = "enviado"
+        ok_ids.append(att.id)
+        all_rows.extend(sub.rows)
+        if sub.likert_row:
+            likert_rows.append(sub.likert_row)
+        score_rows.append(sub.score_row)
+        section_rows.extend(sub.section_rows)
+        cube_rows.extend(sub.cube_rows)
+        survey_ids.add(att.survey_id)
+        results.append(SubmitBatchItemOut(
+            attempt_id=att.id, ok=True, estado="enviado",
+            scores={"total": sub.total, "secciones": sub.secciones},
+        ))
+
+    if ok_ids:
+        _write_responses(db, ok_ids, all_rows, likert_rows)
+        save_attempt_scores(db, score_rows, section_rows)
+        apply_cube_deltas(db, cube_rows)
+    if transitions:
+        record_transitions(db, transitions, sent=sent)
+    if transitions or flushed:
+        db.commit()
+
+    for sid in survey_ids:
+        _close_latest_open_turno_if_idle(db, user_id, sid)
+
+    return SubmitBatchOut(enviados=len(ok_ids), fallidos=len(results) - len(ok_ids), results=results)
 
 @router.get("/attempts/{attempt_id}")
 def get_attempt(
@@ -546,21 +616,29 @@ def get_attempt(
     db: Session = Depends(get_db),
     current=Depends(get_current_user),
 ):
-    user_id = _extract_user_id(current)
+    user_id = current_user_id(current)
     att = db.query(Attempt).filter(Attempt.id == attempt_id, Attempt.user_id == user_id).first()
     if not att:
         raise HTTPException(status_code=404, detail="Attempt no encontrado")
     res = db.query(AttemptResponse).filter(AttemptResponse.attempt_id == attempt_id).all()
+    answers = [
+        {"question_id": r.question_id, "value": r.valor_likert, "texto": r.texto}
+        for r in res
+    ]
+    compact = db.query(AttemptLikert.valores).filter(AttemptLikert.attempt_id == attempt_id).scalar()
+    if compact is not None:
+        order = get_survey_definition(db, att.survey_id).likert_order
+        answers = [
+            {"question_id": qid, "value": v, "texto": None}
+            for qid, v in unpack_likert(compact, order)
+        ] + answers
     return {
         "id": att.id,
         "survey_id": att.survey_id,
         "teacher_id": att.teacher_id,
-        "estado": att.estado,
+        "estado": effective_estado(att),
         "expires_at": att.expires_at,
-        "answers": [
-            {"question_id": r.question_id, "value": r.valor_likert, "texto": r.texto}
-            for r in res
-        ],
+        "answers": answers,
     }
 
 @router.post("/attempts/admin/reset")
@@ -570,11 +648,17 @@ def reset_attempts(
     db: Session = Depends(get_db),
     current=Depends(get_admin_user),
 ):
-    db.query(Attempt).filter(
-        Attempt.survey_id == survey_id,
-        Attempt.user_id == user_id,
-        Attempt.estado.in_(["expirado", "fallido"]),
-    ).delete(synchronize_session=False)
+    deleted = db.execute(
+        delete(Attempt)
+        .where(
+            Attempt.survey_id == survey_id,
+            Attempt.user_id == user_id,
+            Attempt.estado.in_(["expirado", "fallido"]),
+        )
+        .returning(Attempt.estado)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    record_transitions(db, [(survey_id, estado, None) for estado in deleted])
     db.commit()
     return {"ok": True}
 
@@ -584,12 +668,17 @@ def get_current_attempt(
     db: Session = Depends(get_db),
     current=Depends(get_current_user),
 ):
-    user_id = _extract_user_id(current)
-    _expire_stale_attempts(db, survey_id, user_id)
+    user_id = current_user_id(current)
 
     now = datetime.now(timezone.utc)
-    att = (
-        db.query(Attempt)
+    # La foto agregada evita la consulta de filas cuando no hay nada abierto
+    state = get_attempt_state(db, survey_id, user_id, now)
+    if not state.has_open_session:
+        return {"status": "empty"}
+
+    row = (
+        db.query(Attempt, Teacher.nombre.label("teacher_nombre"))
+        .outerjoin(Teacher, Teacher.id == Attempt.teacher_id)
         .filter(
             Attempt.survey_id == survey_id,
             Attempt.user_id == user_id,
@@ -599,14 +688,14 @@ def get_current_attempt(
         .order_by(Attempt.id.asc().nullslast())
         .first()
     )
-    if not att:
+    if not row:
         return {"status": "empty"}
 
-    teacher = db.query(Teacher).filter(Teacher.id == att.teacher_id).first()
+    att, tname = row
     return {
         "attempt_id": att.id,
         "teacher_id": att.teacher_id,
-        "teacher_nombre": teacher.nombre if teacher else None,
+        "teacher_nombre": tname,
         "expires_at": att.expires_at,
         "intento_nro": att.intento_nro,
     }
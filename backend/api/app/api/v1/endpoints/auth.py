@@ -1,13 +1,13 @@
 # app/api/v1/endpoints/auth.py
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
 from app.core.security import create_access_token, get_current_user
 from app.core.config import settings
+from app.core.principal import Principal
 from app.db.session import get_db
 from app.models.user import User
-from app.models.turno import Turno
+from app.services.turno_state import get_turno_state
 from app.schemas.auth import LoginIn, TokenOut, MeOut
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -35,12 +35,8 @@ def login(data: LoginIn, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=401, detail="Usuario no encontrado o inactivo")
 
-    # Conteo de turnos CERRADOS (consumidos)
-    closed_count = (
-        db.query(func.count(Turno.id))
-        .filter(Turno.user_id == user.id, Turno.status == "closed")
-        .scalar()
-    ) or 0
+    # Turnos CERRADOS (consumidos), de la foto compartida con /sessions
+    closed_count = get_turno_state(db, user.id).closed
 
     if closed_count >= MAX_TURNOS:
         # Bloquea el login: no emitir token
@@ -52,16 +48,24 @@ def login(data: LoginIn, db: Session = Depends(get_db)):
             ),
         )
 
-    token = create_access_token({"sub": str(user.id), "email": user.email})
+    # Roles + authz_version en el token: get_current_user no recarga usuario ni
+    # roles mientras la versión siga vigente (ver core/principal)
+    token = create_access_token({
+        "sub": str(user.id),
+        "email": user.email,
+        "nombre": user.nombre,
+        "roles": sorted(r.nombre for r in user.roles),
+        "authz_version": int(user.authz_version or 0),
+    })
     return TokenOut(access_token=token)
 
 
 @router.get("/me", response_model=MeOut)
-def me(current_user: User = Depends(get_current_user)):
+def me(current_user: Principal = Depends(get_current_user)):
     """
     Devuelve el usuario actual según el token.
     """
-    roles = [r.nombre for r in getattr(current_user, "roles", [])]
+    roles = list(current_user.roles)
     return MeOut(
         id=current_user.id,
         email=current_user.email,
@@ -71,7 +75,7 @@ def me(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/logout")
-def logout(current_user: User = Depends(get_current_user)):
+def logout(current_user: Principal = Depends(get_current_user)):
     """
     Logout del usuario. En un sistema JWT stateless, el logout se maneja
     en el frontend eliminando el token. Este endpoint solo valida que el
@@ -1,54 +1,51 @@
 # api/app/api/v1/endpoints/catalogs.py
 from uuid import UUID
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Header, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 from app.db.session import get_db
 from app.models.encuesta import Survey
-from app.core.security import get_current_user  # 👈 necesario para saber el usuario
+from app.services.survey_cache import get_survey_definition
+from app.services.surveys import active_surveys
+from app.services.etag import conditional, make_etag
+from app.services.teacher_permissions import allowed_param, allowed_teacher_ids
+from app.core.context import RequestContext
+from app.core.security import get_current_user, get_request_context  # 👈 necesario para saber el usuario
 
 router = APIRouter(tags=["catalogs"])
 
+
 # ✅ LISTAR ENCUESTAS ACTIVAS
 @router.get("/surveys/activas")
 def listar_encuestas_activas(
+    response: Response,
     hoy: date | None = Query(None, description="Filtra por vigencia en esta fecha (YYYY-MM-DD)"),
+    if_none_match: str | None = Header(None, alias="If-None-Match"),
     db: Session = Depends(get_db),
 ):
-    sql = text("""
-        SELECT id, codigo, nombre, estado, fecha_inicio, fecha_fin
-        FROM public.surveys
-        WHERE estado = 'activa'
-          AND (
-            :hoy IS NULL
-            OR (
-              (fecha_inicio IS NULL OR fecha_inicio <= :hoy)
-              AND (fecha_fin IS NULL OR fecha_fin >= :hoy)
-            )
-          )
-        ORDER BY fecha_inicio NULLS FIRST, nombre
-    """)
-    rows = db.execute(sql, {"hoy": hoy}).mappings().all()
+    rows = active_surveys(db, hoy)
+    etag = make_etag("activas", [dict(r) for r in rows])
+    not_modified = conditional(response, if_none_match, etag, "public, max-age=60")
+    if not_modified:
+        return not_modified
     return rows
 
 
 @router.get("/surveys/{survey_id}/questions")
 def listar_preguntas(
     survey_id: UUID,
+    response: Response,
+    if_none_match: str | None = Header(None, alias="If-None-Match"),
     db: Session = Depends(get_db),
 ):
-    sql = text("""
-        SELECT q.id, q.codigo, q.enunciado, q.orden, q.tipo, q.peso,
-               s.titulo AS section
-        FROM public.questions q
-        JOIN public.survey_sections s ON s.id = q.section_id
-        WHERE q.survey_id = :sid
-        ORDER BY q.orden
-    """)
-    rows = db.execute(sql, {"sid": str(survey_id)}).mappings().all()
-    return rows
+    # Definición cacheada (services/survey_cache); mismas columnas y orden que el JOIN original
+    sdef = get_survey_definition(db, survey_id)
+    not_modified = conditional(response, if_none_match, sdef.etag, "public, max-age=300")
+    if not_modified:
+        return not_modified
+    return [dict(q) for q in sdef.questions]
 
 
 @router.get("/surveys/by-codigo/{codigo}")
@@ -69,15 +66,17 @@ def listar_docentes_de_encuesta(
     include_state: bool = Query(True, description="Incluye columna booleana 'evaluated'"),
     db: Session = Depends(get_db),
     current = Depends(get_current_user),
+    ctx: RequestContext = Depends(get_request_context),
 ):
     """
-    Lista docentes asignados a la encuesta.
+    Lista docentes asignados a la encuesta (solo los permitidos si el usuario
+    tiene filas en user_teacher_permissions para ella).
 
     - hide_evaluated=true  -> oculta docentes ya 'enviado' por el usuario actual.
     - include_state=true   -> agrega columna booleana 'evaluated' por fila.
     """
     # Validar encuesta activa (opcional pero recomendado)
-    survey = db.query(Survey).filter(Survey.id == survey_id, Survey.estado == "activa").first()
+    survey = ctx.active_survey(survey_id)
     if not survey:
         raise HTTPException(status_code=404, detail="Encuesta no encontrada o inactiva")
 
@@ -110,6 +109,7 @@ def listar_docentes_de_encuesta(
         JOIN public.teachers t ON t.id = sta.teacher_id
         LEFT JOIN enviados e ON e.teacher_id = t.id
         WHERE sta.survey_id = :sid
+          AND (CAST(:allowed AS uuid[]) IS NULL OR sta.teacher_id = ANY(CAST(:allowed AS uuid[])))
           AND (
             :q IS NULL OR
             t.nombre ILIKE '%' || :q || '%' OR
@@ -129,6 +129,7 @@ def listar_docentes_de_encuesta(
     params = {
         "sid": str(survey_id),
         "uid": str(user_id),
+        "allowed": allowed_param(allowed_teacher_ids(db, survey_id, user_id)),
         "q": q,
         "limit": limit,
         "offset": offset,
@@ -1,8 +1,28 @@
 # api/app/api/v1/endpoints/health.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.api.deps.admin import require_admin
+
+from app.core.principal import principal_cache_stats
+from app.core.security import verified_tokens
+from app.services.autosave import autosave_buffer
+from app.services.report_cache import report_cache
+from app.services.survey_counters import counters_metrics
+from app.services.turno_idle import turno_idle_metrics
 
 router = APIRouter(tags=["health"])
 
 @router.get("/healthz")
 def healthz():
     return {"status": "ok"}
+
+@router.get("/healthz/jobs")
+def healthz_jobs(_admin = Depends(require_admin)):
+    """Métricas de los trabajos y cachés en proceso de este worker (solo administradores)."""
+    return {
+        "turno_idle": turno_idle_metrics.snapshot(),
+        "counters_reconcile": counters_metrics.snapshot(),
+        "autosave": autosave_buffer.stats(),
+        "jwt_cache": verified_tokens.stats(),
+        "principal_cache": principal_cache_stats(),
+        "report_cache": report_cache.stats(),
+    }
@@ -0,0 +1,61 @@
+# app/api/v1/endpoints/me.py
+from __future__ import annotations
+
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.core.security import current_user_id, get_current_user
+from app.db.session import get_db
+from app.services.attempt_state import get_attempt_state
+from app.services.queue import build_queue
+from app.services.survey_cache import get_survey_definition
+from app.services.surveys import active_surveys
+from app.services.turno_state import get_turno_state
+
+router = APIRouter(prefix="/me", tags=["me"])
+
+
+@router.get("/bootstrap")
+def bootstrap(
+    survey_id: Optional[UUID] = Query(None, description="Encuesta; por defecto la primera activa"),
+    db: Session = Depends(get_db),
+    current=Depends(get_current_user),
+):
+    """
+    Todo lo que el PWA necesita al cargar, en una sola request y una sola sesión de BD:
+    encuestas activas, preguntas, turno actual, cupo, resumen de intentos y cola.
+    Cada bloque tiene la misma forma que su endpoint individual
+    (/surveys/activas, /surveys/{id}/questions, /sessions/turno/current,
+    /attempts/quota, /attempts/summary, /queue).
+    """
+    user_id = current_user_id(current)
+
+    surveys = active_surveys(db)
+    if survey_id is None:
+        if not surveys:
+            raise HTTPException(status_code=404, detail="No hay encuestas activas")
+        survey_id = surveys[0]["id"]
+    elif not any(s["id"] == survey_id for s in surveys):
+        raise HTTPException(status_code=404, detail="Encuesta no encontrada o inactiva")
+
+    # Una sola foto de intentos para quota y summary
+    state = get_attempt_state(db, survey_id, user_id)
+
+    return {
+        "user": {
+            "id": user_id,
+            "email": getattr(current, "email", None),
+            "nombre": getattr(current, "nombre", None),
+            "roles": list(current.roles),
+        },
+        "survey_id": survey_id,
+        "surveys": surveys,
+        "questions": [dict(q) for q in get_survey_definition(db, survey_id).questions],
+        "turno": get_turno_state(db, user_id).current_payload(),
+        "quota": state.quota_payload(),
+        "summary": state.summary_payload(),
+        "queue": build_queue(db, survey_id, user_id),
+    }
@@ -3,15 +3,23 @@ from uuid import UUID
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Header
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.security import get_current_user
 from app.db.session import get_db
 from app.models.turno import Turno
-from app.models.attempt import Attempt
 from app.schemas.sessions import SessionCloseOut
+from app.services.attempt_state import get_attempt_state
+from app.services.turno_state import (
+    TurnoState,
+    get_turno_state,
+    invalidate_turno_state,
+    is_turno_open,
+    load_turno_state,
+    close_turno as service_close_turno,
+    open_turno as service_open_turno,
+)
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
@@ -21,44 +29,13 @@ MAX_TURNOS = getattr(settings, "MAX_TURNOS", 2)
 
 # ----------------------- helpers -----------------------
 
-def _get_open_turno(db: Session, user_id: UUID) -> Optional[Turno]:
-    """Devuelve el último turno abierto del usuario (si existe)."""
-    return (
-        db.query(Turno)
-        .filter(Turno.user_id == user_id, Turno.status == "open")
-        .order_by(Turno.opened_at.desc())
-        .first()
-    )
+def _get_open_turno(db: Session, user_id: UUID) -> Optional[UUID]:
+    """Id del último turno abierto del usuario (si existe), desde la foto cacheada."""
+    return get_turno_state(db, user_id).open_turno_id
 
 def _close_latest_open_turno(db: Session, user_id: UUID) -> bool:
     """Cierra el último turno abierto del usuario si existe. Devuelve True si lo cerró."""
-    t = _get_open_turno(db, user_id)
-    if not t:
-        return False
-    if t.status != "closed":
-        t.status = "closed"
-        t.closed_at = func.now()
-        db.add(t)
-        db.commit()
-    return True
-
-def _expire_stale_attempts(db: Session, survey_id: UUID, user_id: UUID) -> int:
-    now = datetime.now(timezone.utc)
-    updated = (
-        db.query(Attempt)
-        .filter(
-            Attempt.survey_id == survey_id,
-            Attempt.user_id == user_id,
-            Attempt.estado == "en_progreso",
-            Attempt.expires_at.isnot(None),
-            Attempt.expires_at <= now,
-        )
-        .update({Attempt.estado: "expirado"}, synchronize_session=False)
-    )
-    if updated:
-        db.commit()
-    return updated
-
+    return service_close_turno(db, user_id)
 
 # ----------------------- endpoints de sesión por encuesta -----------------------
 
@@ -76,21 +53,12 @@ def close_session(
     if not user_id:
         raise HTTPException(status_code=401, detail="No se pudo obtener el usuario del token")
 
-    # 1) Expirar por tiempo
-    _expire_stale_attempts(db, survey_id, user_id)
-
-    # 2) Conteos por estado
-    rows = (
-        db.query(Attempt.estado, func.count(Attempt.id))
-        .filter(Attempt.survey_id == survey_id, Attempt.user_id == user_id)
-        .group_by(Attempt.estado)
-        .all()
-    )
-    counts = {estado: int(n) for estado, n in rows}
-    en_progreso = counts.get("en_progreso", 0)
-    enviados = counts.get("enviado", 0)
-    expirados = counts.get("expirado", 0)
-    fallidos  = counts.get("fallido", 0)
+    # 1) Conteos por estado (una sola sentencia agregada; los vencidos cuentan como expirados)
+    state = get_attempt_state(db, survey_id, user_id)
+    en_progreso = state.en_progreso
+    enviados = state.enviado
+    expirados = state.expirado
+    fallidos  = state.fallido
 
     if en_progreso > 0:
         raise HTTPException(
@@ -98,7 +66,7 @@ def close_session(
             detail="Aún tienes docentes en progreso. Termina o deja expirar antes de cerrar el turno."
         )
 
-    # 3) Cerrar el turno abierto (si lo hubiera)
+    # 2) Cerrar el turno abierto (si lo hubiera)
     _close_latest_open_turno(db, user_id)
 
     return SessionCloseOut(
@@ -123,10 +91,7 @@ def turno_current(
     Devuelve el turno abierto actual (si existe) y el remanente de cupo.
     Respuesta: { turno_id: str | None, remaining: int }
     """
-    t = _get_open_turno(db, user.id)
-    used = db.query(func.count(Turno.id)).filter(Turno.user_id == user.id).scalar() or 0
-    remaining = max(0, MAX_TURNOS - used)
-    return {"turno_id": str(t.id) if t else None, "remaining": remaining}
+    return get_turno_state(db, user.id).current_payload()
 
 @router.post("/turno/open")
 def open_turno(
@@ -139,23 +104,17 @@ def open_turno(
     Abre un turno para el usuario autenticado respetando el tope MAX_TURNOS.
     - Si ya hay un turno 'open', lo reutiliza (idempotente).
     """
-    existing = _get_open_turno(db, user.id)
-    if existing:
-        used = db.query(func.count(Turno.id)).filter(Turno.user_id == user.id).scalar() or 0
-        remaining = max(0, MAX_TURNOS - used)
-        return {"turno_id": str(existing.id), "remaining": remaining}
-
-    used = db.query(func.count(Turno.id)).filter(Turno.user_id == user.id).scalar() or 0
-    if used >= MAX_TURNOS:
+    # Escritura: se decide con el estado de BD, no con la foto cacheada
+    state = load_turno_state(db, user.id)
+    if state.open_turno_id:
+        return state.current_payload()
+    if state.used >= MAX_TURNOS:
         raise HTTPException(status_code=403, detail=f"Has agotado tus {MAX_TURNOS} turnos.")
 
-    t = Turno(user_id=user.id, status="open", opened_at=func.now())
-    db.add(t)
-    db.commit()
-    db.refresh(t)
-
-    remaining = max(0, MAX_TURNOS - (used + 1))
-    return {"turno_id": str(t.id), "remaining": remaining}
+    opened = service_open_turno(db, user.id)
+    if opened is None:
+        raise HTTPException(status_code=403, detail=f"Has agotado tus {MAX_TURNOS} turnos.")
+    return opened.current_payload()
 
 @router.post("/turno/close")
 def close_turno(
@@ -168,14 +127,15 @@ def close_turno(
     """
     if not x_turno_id:
         raise HTTPException(status_code=400, detail="Falta header X-Turno-Id.")
-    t = db.query(Turno).filter(Turno.id == x_turno_id, Turno.user_id == user.id).first()
-    if not t:
+    try:
+        turno_id = UUID(x_turno_id)
+    except ValueError:
         raise HTTPException(status_code=404, detail="Turno no encontrado.")
-    if t.status != "closed":
-        t.status = "closed"
-        t.closed_at = func.now()
-        db.add(t)
-        db.commit()
+    if not service_close_turno(db, user.id, turno_id):
+        # Nada que cerrar: ya estaba cerrado o no es de este usuario
+        exists = db.query(Turno.id).filter(Turno.id == turno_id, Turno.user_id == user.id).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Turno no encontrado.")
     return {"ok": True}
 
 @router.get("/turno/quota")
@@ -183,9 +143,8 @@ def turno_quota(
     db: Session = Depends(get_db),
     user = Depends(get_current_user),
 ):
-    used = db.query(func.count(Turno.id)).filter(Turno.user_id == user.id).scalar() or 0
-    remaining = max(0, MAX_TURNOS - used)
-    return {"used": used, "limit": MAX_TURNOS, "remaining": remaining}
+    state = get_turno_state(db, user.id)
+    return {"used": state.used, "limit": MAX_TURNOS, "remaining": state.remaining}
 
 
 # -------- Dependency para proteger endpoints --------
@@ -193,12 +152,19 @@ def require_turno_open(
     x_turno_id: Optional[str] = Header(None, alias="X-Turno-Id"),
     db: Session = Depends(get_db),
     user = Depends(get_current_user),
-) -> Turno:
+) -> TurnoState:
     if not x_turno_id:
         raise HTTPException(status_code=403, detail="Turno no iniciado (falta X-Turno-Id).")
-    t = db.query(Turno).filter(
-        Turno.id == x_turno_id, Turno.user_id == user.id, Turno.status == "open"
-    ).first()
-    if not t:
+    try:
+        turno_id = UUID(x_turno_id)
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Turno inválido o cerrado.")
+    # La foto puede estar vieja (cierre en otro worker o por inactividad):
+    # el turno se confirma siempre en BD por PK
+    if not is_turno_open(db, user.id, turno_id):
+        invalidate_turno_state(user.id)
         raise HTTPException(status_code=403, detail="Turno inválido o cerrado.")
-    return t
+    state = get_turno_state(db, user.id)
+    if state.open_turno_id != turno_id:
+        state = load_turno_state(db, user.id)
+    return state
@@ -22,7 +22,52 @@ class Settings(BaseSettings):
     JWT_SECRET: str = "change-me"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRE_MINUTES: int = 60
+    # LRU de tokens ya verificados por worker (ver core/token_cache; 0 = desactivado)
+    JWT_DECODE_CACHE_SIZE: int = 4096
+
+    # Caché por worker del usuario autenticado (ver core/principal)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    # Caché de users.authz_version para validar los roles embebidos en el JWT
+    AUTHZ_VERSION_CACHE_TTL_SECONDS: int = 30
     MAX_TURNOS: int = 2
+    # Caché por worker del estado de turnos de cada usuario (ver services/turno_state)
+    TURNO_STATE_CACHE_TTL_SECONDS: int = 15
+    # Cierre automático de turnos ociosos (0 = desactivado, usar scripts/close_idle_turnos.py)
+    TURNO_IDLE_SWEEP_SECONDS: int = 300
+    TURNO_IDLE_MINUTES: int = 120
+    TURNO_IDLE_BATCH_SIZE: int = 500
+
+    # Expiración de attempts (barrido en proceso; 0 = desactivado, usar scripts/expire_attempts.py)
+    ATTEMPT_EXPIRY_SWEEP_SECONDS: int = 60
+    ATTEMPT_EXPIRY_BATCH_SIZE: int = 500
+
+    # Reconciliación de contadores del dashboard (0 = desactivado, usar scripts/reconcile_counters.py)
+    COUNTERS_RECONCILE_SECONDS: int = 900
+
+    # Autosave write-behind (0 = write-through: cada PATCH commitea; ver services/autosave)
+    AUTOSAVE_FLUSH_SECONDS: float = 2.0
+    AUTOSAVE_MAX_PENDING: int = 5000
+
+    # Almacenamiento de respuestas likert al enviar: "rows" (una fila por respuesta en
+    # responses) o "compact" (un smallint[] por attempt en attempt_likert; ver services/likert_storage)
+    LIKERT_STORAGE: str = "rows"
+
+    # Caché de definición de encuestas (preguntas/secciones/pesos) por worker
+    SURVEY_CACHE_TTL_SECONDS: int = 300
+
+    # Caché por worker de respuestas de reportes del dashboard (ver services/report_cache;
+    # 0 bytes = desactivada). La versión de datos de cada encuesta se relee tras el TTL.
+    REPORT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    REPORT_CACHE_VERSION_TTL_SECONDS: float = 2.0
+
+    # Exports CSV en streaming (ver services/csv_export): filas por viaje del cursor
+    # del lado del servidor y tamaño de cada chunk de la respuesta
+    EXPORT_FETCH_ROWS: int = 2000
+    EXPORT_CHUNK_BYTES: int = 64 * 1024
+
+    # Caché de docentes permitidos por (encuesta, usuario) por worker (ver services/teacher_permissions)
+    TEACHER_PERMISSIONS_CACHE_TTL_SECONDS: int = 60
 
     # CORS
     CORS_ORIGINS: str = "https://encuesta-docente-f.vercel.app,https://encuesta-docente.onrender.com"
@@ -0,0 +1,46 @@
+# app/core/context.py
+"""
+Contexto por request compartido por todas las dependencias.
+
+FastAPI solo reutiliza una dependencia dentro de la misma request si es la
+misma función; get_current_user, get_current_user_with_claims, get_admin_user,
+require_admin y require_turno_open resolvían cada uno su propio token. Con
+get_request_context (app/core/security) todas leen de un único RequestContext
+guardado en request.state: el JWT se decodifica una vez, el Principal se
+resuelve una vez y las búsquedas de encuesta se memorizan.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Hashable, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.models.encuesta import Survey
+
+_MISSING = object()
+
+
+class RequestContext:
+    """Estado de una request: token, sesión de BD y valores ya resueltos."""
+
+    def __init__(self, token: str, db: Session):
+        self.token = token
+        self.db = db
+        self._memo: dict[Hashable, Any] = {}
+
+    def memo(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """Valor de `key` para esta request; `load` se ejecuta solo la primera vez."""
+        value = self._memo.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._memo[key] = load()
+        return value
+
+    def active_survey(self, survey_id: UUID) -> Optional[Survey]:
+        """Encuesta activa (o None), consultada como mucho una vez por request."""
+        return self.memo(
+            ("survey_activa", survey_id),
+            lambda: self.db.query(Survey)
+            .filter(Survey.id == survey_id, Survey.estado == "activa")
+            .first(),
+        )
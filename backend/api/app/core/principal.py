@@ -0,0 +1,174 @@
+# app/core/principal.py
+"""
+Caché del usuario autenticado (principal) para get_current_user.
+
+Cada request autenticada cargaba el User y luego sus roles (dos consultas).
+Aquí se guarda por user_id una foto inmutable (id, email, nombre, estado,
+nombres de rol) en un LRU con TTL por worker; la foto sale de UNA consulta.
+
+Tokens con roles (claim authz_version, ver auth.login): si la versión del
+token coincide con users.authz_version, el Principal se arma de los claims sin
+cargar usuario ni roles; solo se consulta la versión, cacheada por usuario
+durante AUTHZ_VERSION_CACHE_TTL_SECONDS. Si no coincide (roles cambiados,
+usuario desactivado) o el token es viejo, se usa la foto de BD de arriba.
+
+Invalidación: grant_role / revoke_role y el import de usuarios incrementan la
+versión con bump_authz_version() y llaman a invalidate_principal(); los demás
+workers ven el cambio al vencer los TTL.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+_PRINCIPAL_SQL = text("""
+    SELECT u.id, u.email, u.nombre, u.estado,
+           COALESCE(array_agg(r.nombre ORDER BY r.nombre) FILTER (WHERE r.nombre IS NOT NULL),
+                    ARRAY[]::varchar[]) AS roles
+    FROM public.users u
+    LEFT JOIN public.user_roles ur ON ur.user_id = u.id
+    LEFT JOIN public.roles r ON r.id = ur.role_id
+    WHERE u.id = :uid AND u.estado = 'activo'
+    GROUP BY u.id
+""")
+
+_VERSION_SQL = text("""
+    SELECT u.authz_version FROM public.users u
+    WHERE u.id = :uid AND u.estado = 'activo'
+""")
+
+_BUMP_SQL = text("""
+    UPDATE public.users SET authz_version = authz_version + 1
+    WHERE id = ANY(CAST(:uids AS uuid[]))
+""")
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Usuario autenticado sin sesión ORM; `roles` son nombres de rol."""
+    id: UUID
+    email: str
+    nombre: Optional[str]
+    estado: str
+    roles: tuple[str, ...]
+
+    def has_role(self, *names: str) -> bool:
+        wanted = {n.lower() for n in names}
+        return any(r.lower() in wanted for r in self.roles)
+
+
+_lock = threading.Lock()
+# user_id -> (loaded_at, Principal)
+_cache: "OrderedDict[UUID, tuple[float, Principal]]" = OrderedDict()
+# user_id -> (loaded_at, authz_version | None si inactivo/inexistente)
+_versions: "OrderedDict[UUID, tuple[float, Optional[int]]]" = OrderedDict()
+hits = 0
+misses = 0
+
+
+def _load(db: Session, user_id: UUID) -> Optional[Principal]:
+    row = db.execute(_PRINCIPAL_SQL, {"uid": str(user_id)}).first()
+    if row is None:
+        return None
+    return Principal(
+        id=row.id if isinstance(row.id, UUID) else UUID(str(row.id)),
+        email=row.email,
+        nombre=row.nombre,
+        estado=row.estado,
+        roles=tuple(row.roles or ()),
+    )
+
+
+def get_principal(db: Session, user_id: UUID) -> Optional[Principal]:
+    """Foto cacheada del usuario activo, o None si no existe o está inactivo."""
+    global hits, misses
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(user_id)
+        if hit is not None and now - hit[0] < settings.PRINCIPAL_CACHE_TTL_SECONDS:
+            _cache.move_to_end(user_id)
+            hits += 1
+            return hit[1]
+        misses += 1
+
+    principal = _load(db, user_id)
+    with _lock:
+        if principal is None:
+            _cache.pop(user_id, None)
+        else:
+            _cache[user_id] = (now, principal)
+            _cache.move_to_end(user_id)
+            while len(_cache) > settings.PRINCIPAL_CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+    return principal
+
+
+def get_authz_version(db: Session, user_id: UUID) -> Optional[int]:
+    """users.authz_version cacheada; None si el usuario no existe o está inactivo."""
+    now = time.monotonic()
+    with _lock:
+        hit = _versions.get(user_id)
+        if hit is not None and now - hit[0] < settings.AUTHZ_VERSION_CACHE_TTL_SECONDS:
+            _versions.move_to_end(user_id)
+            return hit[1]
+
+    version = db.execute(_VERSION_SQL, {"uid": str(user_id)}).scalar_one_or_none()
+    with _lock:
+        _versions[user_id] = (now, version)
+        _versions.move_to_end(user_id)
+        while len(_versions) > settings.PRINCIPAL_CACHE_MAX_ENTRIES:
+            _versions.popitem(last=False)
+    return version
+
+
+def principal_from_claims(db: Session, user_id: UUID, claims: dict[str, Any]) -> Optional[Principal]:
+    """
+    Principal armado solo con los claims si su authz_version está vigente;
+    None si el token no trae versión/roles o quedó desactualizado.
+    """
+    claimed = claims.get("authz_version")
+    roles = claims.get("roles")
+    if not isinstance(claimed, int) or not isinstance(roles, list):
+        return None
+    if get_authz_version(db, user_id) != claimed:
+        return None
+    return Principal(
+        id=user_id,
+        email=claims.get("email") or "",
+        nombre=claims.get("nombre"),
+        estado="activo",
+        roles=tuple(str(r) for r in roles),
+    )
+
+
+def bump_authz_version(db: Session, user_ids: Iterable[UUID]) -> None:
+    """+1 a authz_version de esos usuarios: sus tokens dejan de valer como fuente de roles. NO hace commit."""
+    uids = [str(u) for u in user_ids]
+    if uids:
+        db.execute(_BUMP_SQL, {"uids": uids})
+
+
+def invalidate_principal(user_ids: Optional[Iterable[UUID]] = None) -> None:
+    """Olvida la foto y la versión de esos usuarios (o de todos si user_ids es None)."""
+    with _lock:
+        if user_ids is None:
+            _cache.clear()
+            _versions.clear()
+            return
+        for uid in user_ids:
+            _cache.pop(uid, None)
+            _versions.pop(uid, None)
+
+
+def principal_cache_stats() -> dict[str, int]:
+    with _lock:
+        return {"size": len(_cache), "hits": hits, "misses": misses}
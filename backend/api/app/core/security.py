@@ -6,17 +6,22 @@ from typing import Any, Optional, Tuple, Iterable
 from uuid import UUID
 
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.context import RequestContext
+from app.core.principal import Principal, get_principal, principal_from_claims
+from app.core.token_cache import VerifiedTokenCache
 from app.db.session import get_db
-from app.models.user import User
 
 # Solo para docs/Swagger; no ejecuta nada por sí mismo
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
-ADMIN_ROLE_NAMES = {"Administrador", "Admin", "admin", "administrator"}
+# Única lista de roles admin (get_admin_user y api/deps/admin.require_admin), sin distinguir mayúsculas
+ADMIN_ROLE_NAMES = {"administrador", "admin", "administrator", "superadmin"}
+JWT_LEEWAY_SECONDS = 5  # pequeño margen por skew de reloj
+verified_tokens = VerifiedTokenCache(settings.JWT_DECODE_CACHE_SIZE, leeway=JWT_LEEWAY_SECONDS)
 
 
 def create_access_token(subject: dict[str, Any], expires_minutes: int | None = None) -> str:
@@ -46,28 +51,28 @@ def create_access_token(subject: dict[str, Any], expires_minutes: int | None = N
 def decode_token(token: str) -> dict[str, Any]:
     """
     Decodifica exigiendo 'exp' e 'iat' y verificando expiración.
+    Los tokens ya verificados salen de verified_tokens hasta su 'exp'.
     """
+    cached = verified_tokens.get(token)
+    if cached is not None:
+        return cached
     try:
-        return jwt.decode(
+        claims = jwt.decode(
             token,
             settings.JWT_SECRET,
             algorithms=[settings.JWT_ALGORITHM],
             options={"require": ["exp", "iat"], "verify_exp": True},
-            leeway=5,  # pequeño margen por skew de reloj
+            leeway=JWT_LEEWAY_SECONDS,
         )
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expirado")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
+    verified_tokens.put(token, claims)
+    return claims
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """
-    Devuelve el objeto User activo con sus roles cargados.
-    """
-    from sqlalchemy.orm import selectinload
-    
-    payload = decode_token(token)
+def _principal_from_payload(payload: dict[str, Any], db: Session) -> Principal:
     sub = payload.get("sub")
     if not sub:
         raise HTTPException(status_code=401, detail="Token sin sujeto")
@@ -78,65 +83,70 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except Exception:
         raise HTTPException(status_code=401, detail="Token con 'sub' inválido")
 
-    user = (
-        db.query(User)
-        .options(selectinload(User.roles))
-        .filter(User.id == user_id, User.estado == "activo")
-        .first()
-    )
-    if not user:
+    # Roles del token si su authz_version sigue vigente; si no, foto de BD
+    principal = principal_from_claims(db, user_id, payload) or get_principal(db, user_id)
+    if principal is None:
         raise HTTPException(status_code=401, detail="Usuario no encontrado o inactivo")
-    
-    # Asegurar que los roles están cargados haciendo una copia de los nombres
-    # para evitar lazy loading fuera de la sesión
-    if hasattr(user, 'roles') and user.roles:
-        # Forzar la carga de roles accediendo a ellos dentro de la sesión
-        _ = [r.nombre for r in user.roles]
-    
-    return user
+    return principal
 
 
-def get_current_user_with_claims(
+def get_request_context(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
-) -> Tuple[User, dict]:
+) -> RequestContext:
+    """Un RequestContext por request (request.state.ctx), compartido por todas las dependencias."""
+    ctx = getattr(request.state, "ctx", None)
+    if ctx is None:
+        ctx = request.state.ctx = RequestContext(token, db)
+    return ctx
+
+
+def request_claims(ctx: RequestContext) -> dict[str, Any]:
+    """Claims del JWT de la request, decodificados una sola vez."""
+    return ctx.memo("claims", lambda: decode_token(ctx.token))
+
+
+def request_principal(ctx: RequestContext) -> Principal:
+    """Principal de la request, resuelto una sola vez."""
+    return ctx.memo("principal", lambda: _principal_from_payload(request_claims(ctx), ctx.db))
+
+
+def get_current_user(ctx: RequestContext = Depends(get_request_context)) -> Principal:
     """
-    Igual que get_current_user pero retorna también los claims (para leer iat).
+    Devuelve la foto inmutable del usuario activo con sus nombres de rol
+    (caché de app/core/principal; sin objetos ORM ni lazy loading).
     """
-    from sqlalchemy.orm import selectinload
-    
-    payload = decode_token(token)
-    sub = payload.get("sub")
-    if not sub:
-        raise HTTPException(status_code=401, detail="Token sin sujeto") 
+    return request_principal(ctx)
 
-    try:
-        user_id = UUID(str(sub))
-    except Exception:
-        raise HTTPException(status_code=401, detail="Token con 'sub' inválido")
 
-    user = (
-        db.query(User)
-        .options(selectinload(User.roles))
-        .filter(User.id == user_id, User.estado == "activo")
-        .first()
-    )
-    if not user:
-        raise HTTPException(status_code=401, detail="Usuario no encontrado o inactivo")
-    
-    # Asegurar que los roles están cargados
-    if hasattr(user, 'roles') and user.roles:
-        _ = [r.nombre for r in user.roles]
-    
-    return user, payload
+def current_user_id(current) -> UUID:
+    """UUID del usuario de get_current_user (Principal) o de un dict de claims."""
+    val = None
+    if hasattr(current, "id"):
+        val = getattr(current, "id", None)
+    if val is None and isinstance(current, dict):
+        val = current.get("sub") or current.get("id")
+    if not val:
+        raise HTTPException(status_code=401, detail="No se pudo obtener el usuario del token")
+    return UUID(str(val))
+
+
+def get_current_user_with_claims(
+    ctx: RequestContext = Depends(get_request_context),
+) -> Tuple[Principal, dict]:
+    """
+    Igual que get_current_user pero retorna también los claims (para leer iat).
+    """
+    return request_principal(ctx), request_claims(ctx)
 
 
-def _roles_from_user(user: User) -> set[str]:
+def _roles_from_user(user) -> set[str]:
     names: set[str] = set()
-    # si tienes relación user.roles (SQLAlchemy)
+    # Principal.roles son nombres; un User ORM trae objetos Role
     if hasattr(user, "roles") and user.roles:
         for r in user.roles:
-            n = getattr(r, "nombre", None) or getattr(r, "name", None)
+            n = r if isinstance(r, str) else (getattr(r, "nombre", None) or getattr(r, "name", None))
             if n:
                 names.add(str(n))
     return names
@@ -151,19 +161,16 @@ def _roles_from_claims(claims: dict | None) -> set[str]:
         return {str(x) for x in raw}
     return set()
 
-def user_is_admin(user: User, claims: dict | None = None) -> bool:
-    names = set()
-    names |= _roles_from_user(user)
-    names |= _roles_from_claims(claims)
-    # normaliza
-    lower = {n.lower() for n in names}
-    return (
-        bool(ADMIN_ROLE_NAMES & names) or
-        any(n in {"administrador","admin","administrator"} for n in lower)
-    )
-
-def get_admin_user(dep=Depends(get_current_user_with_claims)) -> User:
-    user, claims = dep  # get_current_user_with_claims devuelve (user, claims)
-    if not user_is_admin(user, claims):
+def user_is_admin(user, claims: dict | None = None) -> bool:
+    """
+    True si el usuario tiene un rol admin. Los roles del Principal ya vienen de
+    claims vigentes o de BD; `claims` solo se consulta si `user` no trae roles.
+    """
+    names = _roles_from_user(user) or _roles_from_claims(claims)
+    return any(n.lower() in ADMIN_ROLE_NAMES for n in names)
+
+def get_admin_user(dep=Depends(get_current_user_with_claims)) -> Principal:
+    user, _claims = dep  # get_current_user_with_claims devuelve (user, claims)
+    if not user_is_admin(user):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Solo administradores")
-    return user
\ No newline at end of file
+    return user
@@ -0,0 +1,71 @@
+# app/core/token_cache.py
+"""
+LRU de JWT ya verificados para decode_token.
+
+En una ventana de examen los mismos pocos miles de tokens se repiten miles de
+veces por hora y cada request repetía la verificación HMAC y la validación de
+claims de PyJWT. Aquí se guardan los claims de un token YA verificado, con
+clave = sha256 del token crudo, hasta su `exp` (+ leeway). Un token vencido o
+desconocido vuelve al camino completo de jwt.decode, que es quien produce
+los errores 401. Tamaño: JWT_DECODE_CACHE_SIZE por worker (0 = desactivado).
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries: int, leeway: int = 0):
+        self.max_entries = max_entries
+        self.leeway = leeway
+        self._lock = threading.Lock()
+        # digest -> (exp epoch, claims)
+        self._items: "OrderedDict[bytes, tuple[float, dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict[str, Any]]:
+        """Copia de los claims si el token está y no venció; None si hay que verificarlo."""
+        if self.max_entries <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and time.time() <= item[0] + self.leeway:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return dict(item[1])
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, claims: dict[str, Any]) -> None:
+        """Guarda los claims de un token verificado (exp viene validado por jwt.decode)."""
+        if self.max_entries <= 0:
+            return
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._items[key] = (float(exp), dict(claims))
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
@@ -4,16 +4,32 @@ from sqlalchemy import text
 import logging
 
 from app.core.config import settings
-from app.api.v1.endpoints import health, auth, catalogs, attempts, sessions, admin_attempts, admin_surveys, admin_imports, admin_roles, admin_reports
+from app.api.v1.endpoints import health, auth, catalogs, attempts, sessions, admin_attempts, admin_surveys, admin_imports, admin_roles, admin_reports, me
 from app.api.v1.endpoints import queue as queue_ep
 
 from app.db.session import check_db_connection, SessionLocal  # <- FIX
+from app.services.attempt_expiry import AttemptExpirySweeper
+from app.services.autosave import AutosaveFlusher, autosave_buffer
+from app.services.survey_counters import CountersReconciler
+from app.services.turno_idle import TurnoIdleCloser
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 API_V1_PREFIX = "/api/v1"
 
+expiry_sweeper = AttemptExpirySweeper(
+    interval_seconds=settings.ATTEMPT_EXPIRY_SWEEP_SECONDS,
+    batch_size=settings.ATTEMPT_EXPIRY_BATCH_SIZE,
+)
+autosave_flusher = AutosaveFlusher(autosave_buffer, settings.AUTOSAVE_FLUSH_SECONDS)
+turno_idle_closer = TurnoIdleCloser(
+    interval_seconds=settings.TURNO_IDLE_SWEEP_SECONDS,
+    idle_minutes=settings.TURNO_IDLE_MINUTES,
+    batch_size=settings.TURNO_IDLE_BATCH_SIZE,
+)
+counters_reconciler = CountersReconciler(interval_seconds=settings.COUNTERS_RECONCILE_SECONDS)
+
 app = FastAPI(
     title=settings.APP_NAME,
     description="API para el sistema de encuestas docentes",
@@ -38,9 +54,29 @@ async def startup_event():
     else:
         logger.error("[APP] ✗ Database connection failed")
 
+    if settings.ATTEMPT_EXPIRY_SWEEP_SECONDS > 0:
+        expiry_sweeper.start()
+        logger.info(f"[APP] ✓ Attempt expiry sweeper every {settings.ATTEMPT_EXPIRY_SWEEP_SECONDS}s")
+
+    if settings.AUTOSAVE_FLUSH_SECONDS > 0:
+        autosave_flusher.start()
+        logger.info(f"[APP] ✓ Autosave write-behind every {settings.AUTOSAVE_FLUSH_SECONDS}s")
+
+    if settings.TURNO_IDLE_SWEEP_SECONDS > 0:
+        turno_idle_closer.start()
+        logger.info(f"[APP] ✓ Idle turno closer every {settings.TURNO_IDLE_SWEEP_SECONDS}s (idle {settings.TURNO_IDLE_MINUTES} min)")
+
+    if settings.COUNTERS_RECONCILE_SECONDS > 0:
+        counters_reconciler.start()
+        logger.info(f"[APP] ✓ Counters reconciliation every {settings.COUNTERS_RECONCILE_SECONDS}s")
+
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("[APP] Shutting down...")
+    await expiry_sweeper.stop()
+    await turno_idle_closer.stop()
+    await counters_reconciler.stop()
+    await autosave_flusher.stop()  # flush final de autosaves pendientes
     # No llames engine.dispose() si no importas engine
     logger.info("[APP] ✓ Shutdown complete")
 
@@ -51,6 +87,7 @@ app.include_router(catalogs.router, prefix=API_V1_PREFIX)
 app.include_router(attempts.router, prefix=API_V1_PREFIX)
 app.include_router(queue_ep.router, prefix=API_V1_PREFIX)
 app.include_router(sessions.router, prefix=API_V1_PREFIX)
+app.include_router(me.router,       prefix=API_V1_PREFIX)
 app.include_router(admin_surveys.router, prefix=API_V1_PREFIX)
 
 app.include_router(admin_imports.router,  prefix=f"{API_V1_PREFIX}/admin")
@@ -3,7 +3,7 @@ from sqlalchemy import (
   Column, Integer, String, ForeignKey, DateTime, func, UniqueConstraint, SmallInteger, text
 )
 
-from sqlalchemy.dialects.postgresql import UUID as PGUUID, JSONB
+from sqlalchemy.dialects.postgresql import UUID as PGUUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -43,4 +43,17 @@ class Response(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    attempt = relationship("Attempt", back_populates="responses")
\ No newline at end of file
+    attempt = relationship("Attempt", back_populates="responses")
+
+class AttemptLikert(Base):
+    """
+    Likert compacto de un attempt enviado (LIKERT_STORAGE=compact): un smallint[]
+    en el orden de la vista survey_likert_order en vez de una fila por respuesta.
+    """
+    __tablename__ = "attempt_likert"
+
+    attempt_id = Column(PGUUID(as_uuid=True), ForeignKey("attempts.id", ondelete="CASCADE"), primary_key=True)
+    survey_id = Column(PGUUID(as_uuid=True), nullable=False)
+    valores = Column(ARRAY(SmallInteger), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
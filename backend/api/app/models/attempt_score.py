@@ -0,0 +1,30 @@
+# app/models/attempt_score.py
+from sqlalchemy import Column, ForeignKey, Integer, Numeric, SmallInteger, DateTime, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base_class import Base
+
+
+class AttemptScore(Base):
+    """Puntaje de un attempt enviado (se calcula en el submit; ver services/attempt_scores)."""
+    __tablename__ = "attempt_scores"
+
+    attempt_id = Column(UUID(as_uuid=True), ForeignKey("attempts.id", ondelete="CASCADE"), primary_key=True)
+    survey_id  = Column(UUID(as_uuid=True), nullable=False)
+    teacher_id = Column(UUID(as_uuid=True), nullable=False)
+
+    total      = Column(Numeric(6, 3))                 # ponderado por Question.peso
+    likert_sum = Column(Integer, nullable=False)       # suma simple (AVG exacto = sum/n)
+    likert_n   = Column(SmallInteger, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class AttemptSectionScore(Base):
+    __tablename__ = "attempt_section_scores"
+
+    attempt_id = Column(UUID(as_uuid=True), ForeignKey("attempts.id", ondelete="CASCADE"), primary_key=True)
+    section_id = Column(UUID(as_uuid=True), ForeignKey("survey_sections.id"), primary_key=True)
+
+    score      = Column(Numeric(6, 3))
+    likert_sum = Column(Integer, nullable=False)
+    likert_n   = Column(SmallInteger, nullable=False)
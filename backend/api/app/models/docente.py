@@ -25,3 +25,16 @@ class SurveyTeacherAssignment(Base):
     )
 
     teacher = relationship("Teacher")
+
+
+class UserTeacherPermission(Base):
+    """Matriz usuario -> docentes permitidos por encuesta (tabla de la migración 0002)."""
+    __tablename__ = "user_teacher_permissions"
+    id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    survey_id = Column(UUID(as_uuid=True), ForeignKey("surveys.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    teacher_id = Column(UUID(as_uuid=True), ForeignKey("teachers.id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("survey_id", "user_id", "teacher_id", name="uq_user_survey_teacher_once"),
+    )
@@ -0,0 +1,24 @@
+# app/models/report_cube.py
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base_class import Base
+
+
+class ReportCube(Base):
+    """Agregado likert por (encuesta, docente, pregunta); se suma en el submit (ver services/report_cube)."""
+    __tablename__ = "report_cube"
+
+    survey_id   = Column(UUID(as_uuid=True), ForeignKey("surveys.id", ondelete="CASCADE"), primary_key=True)
+    teacher_id  = Column(UUID(as_uuid=True), ForeignKey("teachers.id", ondelete="CASCADE"), primary_key=True)
+    question_id = Column(UUID(as_uuid=True), ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True)
+
+    n            = Column(Integer, nullable=False, default=0)
+    likert_sum   = Column(BigInteger, nullable=False, default=0)    # AVG = sum / n
+    likert_sumsq = Column(BigInteger, nullable=False, default=0)    # VAR_POP = sumsq / n - AVG²
+    c1 = Column(Integer, nullable=False, default=0)
+    c2 = Column(Integer, nullable=False, default=0)
+    c3 = Column(Integer, nullable=False, default=0)
+    c4 = Column(Integer, nullable=False, default=0)
+    c5 = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
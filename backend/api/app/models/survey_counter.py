@@ -0,0 +1,19 @@
+# app/models/survey_counter.py
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base_class import Base
+
+
+class SurveyCounter(Base):
+    """Contadores de cabecera por encuesta; se mantienen en cada transición de attempt (ver services/survey_counters)."""
+    __tablename__ = "survey_counters"
+
+    survey_id = Column(UUID(as_uuid=True), ForeignKey("surveys.id", ondelete="CASCADE"), primary_key=True)
+
+    enviados           = Column(Integer, nullable=False, default=0)
+    en_progreso        = Column(Integer, nullable=False, default=0)   # en BD (los vencidos hasta el barrido)
+    expirados          = Column(Integer, nullable=False, default=0)
+    responded_teachers = Column(Integer, nullable=False, default=0)   # docentes con >= 1 enviado
+    responding_users   = Column(Integer, nullable=False, default=0)   # usuarios con >= 1 enviado
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -23,6 +23,8 @@ class User(Base):
     nombre = Column(String, nullable=True)
     estado = Column(String, nullable=False, server_default=text("'activo'::character varying"))
     creado_en = Column(DateTime(timezone=True), server_default=text("now()"))
+    # +1 en cada cambio de roles/estado; viaja en el JWT (claim authz_version)
+    authz_version = Column(Integer, nullable=False, server_default=text("0"))
 
     roles = relationship("Role", secondary="user_roles", back_populates="users")
 
@@ -42,9 +42,20 @@ class SubmitIn(BaseModel):
         extra = 'allow'
 
 
+class SubmitBatchItemIn(SubmitIn):
+    attempt_id: UUID
+
+
+class SubmitBatchIn(BaseModel):
+    items: List[SubmitBatchItemIn] = Field(min_items=1)
+
+
 class AttemptPatchIn(BaseModel):
-    # Progreso parcial (por ejemplo, valores marcados en la UI)
+    # Progreso parcial (por ejemplo, valores marcados en la UI); reemplaza todo progreso_json
     progreso: Optional[dict[str, Any]] = None
+    # Cambios de primer nivel sobre progreso_json (null borra la clave); se acumulan
+    # en memoria y se escriben en lote (ver services/autosave)
+    delta: Optional[dict[str, Any]] = None
     # Si True (por defecto), renueva la ventana de 30 min del intento
     renew: Optional[bool] = True
 
@@ -75,6 +86,20 @@ class SubmitOut(BaseModel):
     estado: str  # "enviado"
     scores: ScoreBundleOut
 
+class SubmitBatchItemOut(BaseModel):
+    attempt_id: UUID
+    ok: bool
+    estado: Optional[str] = None
+    scores: Optional[ScoreBundleOut] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+
+class SubmitBatchOut(BaseModel):
+    enviados: int
+    fallidos: int
+    results: List[SubmitBatchItemOut]
+
 # sumar intentos
 class AttemptsSummaryOut(BaseModel):
     survey_id: UUID
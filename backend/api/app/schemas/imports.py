@@ -14,3 +14,8 @@ class ImportSummary(BaseModel):
 class TeachersImportOut(BaseModel):
     summary: ImportSummary
     errors: List[RowError] = []
+
+class TeacherPermissionsImportOut(BaseModel):
+    summary: ImportSummary
+    deleted: int = Field(0, description="Permisos quitados (replace=true)")
+    errors: List[RowError] = []
@@ -20,3 +20,4 @@ class QueueOut(BaseModel):
         default_factory=lambda: {"pendiente": 0, "en_progreso": 0, "enviado": 0}
     )
     items: list[QueueItemOut]
+    next_cursor: Optional[str] = None  # None = última página
@@ -0,0 +1,135 @@
+# app/services/attempt_expiry.py
+"""
+Expiración de attempts 'en_progreso' vencidos.
+
+Las rutas de lectura NO escriben: tratan `expires_at <= now()` como expirado
+(ver is_stale / effective_estado y la foto de attempt_state). El paso a
+'expirado' en BD lo hace un barrido periódico en lotes acotados, en proceso
+(AttemptExpirySweeper, arrancado desde main.py) o por CLI
+(scripts/expire_attempts.py). Apoyado en el índice parcial
+ix_attempts_expires_en_progreso (migración 0007).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.attempt import Attempt
+from app.services.survey_counters import record_transitions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def is_stale(att: Attempt, now: Optional[datetime] = None) -> bool:
+    """True si el attempt sigue 'en_progreso' en BD pero ya venció."""
+    now = now or datetime.now(timezone.utc)
+    return (
+        att.estado == "en_progreso"
+        and att.expires_at is not None
+        and att.expires_at <= now
+    )
+
+
+def effective_estado(att: Attempt, now: Optional[datetime] = None) -> str:
+    """Estado visible del attempt sin esperar al barrido."""
+    return "expirado" if is_stale(att, now) else att.estado
+
+
+def expire_batch(
+    db: Session,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Expira hasta `batch_size` attempts vencidos (todas las encuestas/usuarios).
+    Usa FOR UPDATE SKIP LOCKED: no espera por filas que un submit tiene tomadas
+    y permite varios workers barriendo a la vez. Descuenta los expirados en
+    survey_counters en la misma transacción. NO hace commit.
+    """
+    now = now or datetime.now(timezone.utc)
+    ids = (
+        select(Attempt.id)
+        .where(
+            Attempt.estado == "en_progreso",
+            Attempt.expires_at.isnot(None),
+            Attempt.expires_at <= now,
+        )
+        .order_by(Attempt.expires_at.asc())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    survey_ids = db.execute(
+        update(Attempt)
+        .where(Attempt.id.in_(ids.scalar_subquery()), Attempt.estado == "en_progreso")
+        .values(estado="expirado")
+        .returning(Attempt.survey_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    record_transitions(db, [(sid, "en_progreso", "expirado") for sid in survey_ids])
+    return len(survey_ids)
+
+
+def sweep_expired_attempts(
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batches: int = 0,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> int:
+    """
+    Barre en lotes (un commit por lote) hasta que no queden vencidos
+    o se alcance `max_batches` (0 = sin tope). Devuelve el total expirado.
+    """
+    total = 0
+    batches = 0
+    while True:
+        with session_factory() as db:
+            n = expire_batch(db, batch_size=batch_size)
+            db.commit()
+        total += n
+        batches += 1
+        if n < batch_size or (max_batches and batches >= max_batches):
+            break
+    return total
+
+
+class AttemptExpirySweeper:
+    """Tarea asyncio que ejecuta sweep_expired_attempts cada `interval_seconds`."""
+
+    def __init__(self, interval_seconds: int, batch_size: int = DEFAULT_BATCH_SIZE, max_batches: int = 0):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                n = await asyncio.to_thread(
+                    sweep_expired_attempts, self.batch_size, self.max_batches
+                )
+                if n:
+                    logger.info(f"[EXPIRY] {n} attempts marcados como expirado")
+            except Exception as e:
+                logger.error(f"[EXPIRY] Barrido fallido: {e}")
+            await asyncio.sleep(self.interval_seconds)
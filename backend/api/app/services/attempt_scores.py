@@ -0,0 +1,145 @@
+# app/services/attempt_scores.py
+"""
+Puntajes persistidos por attempt (tablas attempt_scores / attempt_section_scores).
+
+El submit guarda el total ponderado y el de cada sección junto con la suma y el
+conteo simples de likert, para que los reportes agreguen una fila por attempt
+(AVG exacto = SUM(likert_sum) / SUM(likert_n)) en vez de todas las respuestas.
+
+recompute_attempt_scores() rehace los puntajes desde `responses_all` en SQL: lo usa
+el backfill (scripts/backfill_attempt_scores.py) y el cambio de Question.peso.
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.attempt_score import AttemptScore, AttemptSectionScore
+
+# Mismo criterio que compute_scores: peso NULL/0 cuenta como 1, total solo sobre likert
+_W = "COALESCE(NULLIF(q.peso, 0), 1)"
+_IS_LIKERT = "lower(q.tipo) = 'likert'"
+
+_RECOMPUTE_TOTALS_SQL = text(f"""
+    INSERT INTO public.attempt_scores
+      (attempt_id, survey_id, teacher_id, total, likert_sum, likert_n, computed_at)
+    SELECT a.id, a.survey_id, a.teacher_id,
+           ROUND(SUM(r.valor_likert * {_W}) FILTER (WHERE {_IS_LIKERT})
+                 / NULLIF(SUM({_W}) FILTER (WHERE {_IS_LIKERT}), 0), 3),
+           SUM(r.valor_likert),
+           COUNT(*),
+           now()
+    FROM public.attempts a
+    JOIN public.responses_all r ON r.attempt_id = a.id
+    JOIN public.questions q ON q.id = r.question_id
+    WHERE a.estado = 'enviado'
+      AND r.valor_likert IS NOT NULL
+      AND (CAST(:sid AS uuid) IS NULL OR a.survey_id = CAST(:sid AS uuid))
+    GROUP BY a.id, a.survey_id, a.teacher_id
+    ON CONFLICT (attempt_id) DO UPDATE
+      SET total = EXCLUDED.total,
+          likert_sum = EXCLUDED.likert_sum,
+          likert_n = EXCLUDED.likert_n,
+          computed_at = EXCLUDED.computed_at
+""")
+
+_RECOMPUTE_SECTIONS_SQL = text(f"""
+    INSERT INTO public.attempt_section_scores
+      (attempt_id, section_id, score, likert_sum, likert_n)
+    SELECT a.id, q.section_id,
+           ROUND(SUM(r.valor_likert * {_W}) FILTER (WHERE {_IS_LIKERT})
+                 / NULLIF(SUM({_W}) FILTER (WHERE {_IS_LIKERT}), 0), 3),
+           SUM(r.valor_likert),
+           COUNT(*)
+    FROM public.attempts a
+    JOIN public.responses_all r ON r.attempt_id = a.id
+    JOIN public.questions q ON q.id = r.question_id
+    WHERE a.estado = 'enviado'
+      AND r.valor_likert IS NOT NULL
+      AND q.section_id IS NOT NULL
+      AND (CAST(:sid AS uuid) IS NULL OR a.survey_id = CAST(:sid AS uuid))
+    GROUP BY a.id, q.section_id
+    ON CONFLICT (attempt_id, section_id) DO UPDATE
+      SET score = EXCLUDED.score,
+          likert_sum = EXCLUDED.likert_sum,
+          likert_n = EXCLUDED.likert_n
+""")
+
+
+def build_score_rows(
+    att,
+    values: dict[Any, int],
+    section_of,
+    total: Optional[Any],
+    sec_scores: list[dict],
+) -> tuple[dict, list[dict]]:
+    """Filas de attempt_scores / attempt_section_scores para un submit (sin tocar BD)."""
+    sums: dict[Any, list[int]] = {}
+    for qid, v in values.items():
+        acc = sums.setdefault(section_of.get(qid), [0, 0])
+        acc[0] += v
+        acc[1] += 1
+    score_by_section = {s["section_id"]: s["score"] for s in sec_scores}
+
+    score_row = {
+        "attempt_id": att.id,
+        "survey_id": att.survey_id,
+        "teacher_id": att.teacher_id,
+        "total": total,
+        "likert_sum": sum(values.values()),
+        "likert_n": len(values),
+    }
+    section_rows = [
+        {
+            "attempt_id": att.id,
+            "section_id": sid,
+            "score": score_by_section.get(sid),
+            "likert_sum": s,
+            "likert_n": n,
+        }
+        for sid, (s, n) in sums.items()
+        if sid is not None
+    ]
+    return score_row, section_rows
+
+
+def save_attempt_scores(db: Session, score_rows: list[dict], section_rows: Iterable[dict]) -> None:
+    """Upsert multi-fila de los puntajes (un INSERT por tabla). NO hace commit."""
+    section_rows = list(section_rows)
+    if score_rows:
+        stmt = pg_insert(AttemptScore).values(score_rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[AttemptScore.attempt_id],
+            set_={
+                "total": stmt.excluded.total,
+                "likert_sum": stmt.excluded.likert_sum,
+                "likert_n": stmt.excluded.likert_n,
+                "computed_at": text("now()"),
+            },
+        ))
+    if section_rows:
+        stmt = pg_insert(AttemptSectionScore).values(section_rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[AttemptSectionScore.attempt_id, AttemptSectionScore.section_id],
+            set_={
+                "score": stmt.excluded.score,
+                "likert_sum": stmt.excluded.likert_sum,
+                "likert_n": stmt.excluded.likert_n,
+            },
+        ))
+
+
+def recompute_attempt_scores(db: Session, survey_id: Optional[UUID] = None) -> int:
+    """
+    Recalcula desde `responses` los puntajes de los attempts enviados
+    (de una encuesta, o de todas si survey_id es None). NO hace commit.
+    Devuelve cuántos attempts se (re)escribieron.
+    """
+    params = {"sid": str(survey_id) if survey_id else None}
+    n = db.execute(_RECOMPUTE_TOTALS_SQL, params).rowcount
+    db.execute(_RECOMPUTE_SECTIONS_SQL, params)
+    return int(n or 0)
@@ -0,0 +1,146 @@
+# app/services/attempt_state.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.attempt import Attempt
+from app.models.attempt_limit import AttemptLimit
+
+# Valor por defecto cuando el usuario no tiene fila en attempt_limits
+BASE_MAX_SESSIONS = 2
+
+
+@dataclass(frozen=True)
+class AttemptState:
+    """
+    Foto del estado de intentos de un usuario en una encuesta.
+    Se obtiene con una sola sentencia agregada (ver get_attempt_state).
+    Los 'en_progreso' vencidos cuentan como 'expirado' aunque el barrido
+    (services/attempt_expiry) aún no los haya actualizado en BD.
+    """
+    survey_id: UUID
+    user_id: UUID
+    en_progreso: int
+    enviado: int
+    expirado: int
+    fallido: int
+    intento_activo: Optional[int]        # max(intento_nro) de los en_progreso vigentes
+    ultimo_intento: int                  # max(intento_nro) de todos los attempts
+    usadas: int                          # sesiones (intento_nro distintos) expiradas/fallidas
+    open_expires_at: Optional[datetime]  # max(expires_at) de los en_progreso vigentes
+    max_intentos: int
+    extra_otorgados: int
+
+    @property
+    def max_permitidos(self) -> int:
+        return self.max_intentos + self.extra_otorgados
+
+    @property
+    def fallidos(self) -> int:
+        """Attempts que cuentan como fallo (expirado + fallido)."""
+        return self.expirado + self.fallido
+
+    @property
+    def restantes(self) -> int:
+        return max(0, self.max_permitidos - self.usadas)
+
+    @property
+    def has_open_session(self) -> bool:
+        return bool(self.intento_activo)
+
+    def estados(self) -> dict[str, int]:
+        return {
+            "en_progreso": self.en_progreso,
+            "enviado": self.enviado,
+            "expirado": self.expirado,
+            "fallido": self.fallido,
+        }
+
+    def summary_payload(self) -> dict:
+        """Respuesta de /attempts/summary."""
+        return {
+            "survey_id": str(self.survey_id),
+            "intento_activo": self.intento_activo,
+            "ultimo_intento": self.ultimo_intento,
+            "max_permitidos": self.max_permitidos,
+            "usadas": self.usadas,
+            "restantes": self.restantes,
+            "has_open_session": self.has_open_session,
+            "open_session_expires_at": self.open_expires_at,
+            "estados": self.estados(),
+        }
+
+    def quota_payload(self) -> dict:
+        """Respuesta de /attempts/quota (el cupo cuenta attempts fallidos, no sesiones)."""
+        return {
+            "survey_id": str(self.survey_id),
+            "max_permitidos": self.max_permitidos,
+            "fallidos": self.fallidos,
+            "restantes": max(0, self.max_permitidos - self.fallidos),
+        }
+
+
+def get_attempt_state(
+    db: Session,
+    survey_id: UUID,
+    user_id: UUID,
+    now: Optional[datetime] = None,
+) -> AttemptState:
+    """
+    Conteos por estado, intento activo/último, sesiones usadas, expiración abierta
+    y la fila de AttemptLimit en un único round trip (agregados con FILTER +
+    subconsultas escalares sobre la PK de attempt_limits).
+    """
+    now = now or datetime.now(timezone.utc)
+
+    is_live = and_(
+        Attempt.estado == "en_progreso",
+        or_(Attempt.expires_at.is_(None), Attempt.expires_at > now),
+    )
+    is_stale = and_(
+        Attempt.estado == "en_progreso",
+        Attempt.expires_at.isnot(None),
+        Attempt.expires_at <= now,
+    )
+    limit_filter = and_(AttemptLimit.survey_id == survey_id, AttemptLimit.user_id == user_id)
+
+    stmt = (
+        select(
+            func.count(Attempt.id).filter(is_live).label("en_progreso"),
+            func.count(Attempt.id).filter(Attempt.estado == "enviado").label("enviado"),
+            func.count(Attempt.id).filter(or_(Attempt.estado == "expirado", is_stale)).label("expirado"),
+            func.count(Attempt.id).filter(Attempt.estado == "fallido").label("fallido"),
+            func.max(Attempt.intento_nro).filter(is_live).label("intento_activo"),
+            func.max(Attempt.intento_nro).label("ultimo_intento"),
+            func.count(func.distinct(Attempt.intento_nro))
+            .filter(or_(Attempt.estado.in_(["expirado", "fallido"]), is_stale))
+            .label("usadas"),
+            func.max(Attempt.expires_at).filter(is_live).label("open_expires_at"),
+            select(AttemptLimit.max_intentos).where(limit_filter).scalar_subquery().label("max_intentos"),
+            select(AttemptLimit.extra_otorgados).where(limit_filter).scalar_subquery().label("extra_otorgados"),
+        )
+        .select_from(Attempt)
+        .where(Attempt.survey_id == survey_id, Attempt.user_id == user_id)
+    )
+    row = db.execute(stmt).one()
+
+    return AttemptState(
+        survey_id=survey_id,
+        user_id=user_id,
+        en_progreso=int(row.en_progreso or 0),
+        enviado=int(row.enviado or 0),
+        expirado=int(row.expirado or 0),
+        fallido=int(row.fallido or 0),
+        intento_activo=row.intento_activo,
+        ultimo_intento=int(row.ultimo_intento or 0),
+        usadas=int(row.usadas or 0),
+        open_expires_at=row.open_expires_at,
+        max_intentos=int(row.max_intentos) if row.max_intentos is not None else BASE_MAX_SESSIONS,
+        extra_otorgados=int(row.extra_otorgados or 0),
+    )
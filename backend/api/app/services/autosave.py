@@ -0,0 +1,239 @@
+# app/services/autosave.py
+"""
+Autosave write-behind para PATCH /attempts/{id}.
+
+El PWA guarda progreso muy seguido y cada PATCH reescribía todo progreso_json
+y renovaba expires_at con su propio commit. Aquí los PATCH con `delta` (merge
+de primer nivel estilo JSON Merge Patch: clave -> valor, null borra la clave)
+se acumulan en memoria por attempt y se escriben juntos en un solo UPDATE
+cada AUTOSAVE_FLUSH_SECONDS.
+
+Durabilidad (explícita y configurable):
+- AUTOSAVE_FLUSH_SECONDS = 0  -> write-through: cada delta se escribe y
+  commitea en la misma request (mismo comportamiento durable de antes).
+- AUTOSAVE_FLUSH_SECONDS > 0  -> un delta aceptado puede perderse si el
+  proceso muere antes del siguiente flush (ventana máxima = ese intervalo).
+  El apagado ordenado hace un flush final.
+- AUTOSAVE_MAX_PENDING acota cuántos attempts pueden quedar pendientes; si se
+  llena, el PATCH escribe directo en BD.
+- El submit fuerza el flush del attempt (flush_pending) en su transacción.
+  Una renovación aceptada como "buffered" ya se informó al cliente y cuenta
+  para el vencimiento en PATCH y submit aunque no esté en BD
+  (pending_expires_at; el batch usa el expires_at que devuelve el flush).
+
+Cada worker tiene su propio buffer. Los deltas se aplican sobre lo que haya en
+BD (`progreso_json || values - deleted`), así que flushes de distintos workers
+sobre el mismo attempt no se pisan claves distintas.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_APPLY_SQL = text("""
+    UPDATE public.attempts a
+    SET progreso_json = (COALESCE(a.progreso_json, '{}'::jsonb) || v.set_json)
+                        - ARRAY(SELECT jsonb_array_elements_text(v.deleted)),
+        expires_at = GREATEST(a.expires_at, v.expires_at),
+        actualizado_en = now()
+    FROM jsonb_to_recordset(CAST(:batch AS jsonb))
+         AS v(id uuid, set_json jsonb, deleted jsonb, expires_at timestamptz)
+    WHERE a.id = v.id
+      AND a.estado = 'en_progreso'
+    RETURNING a.id, a.expires_at
+""")
+
+
+@dataclass
+class PendingDelta:
+    values: dict[str, Any] = field(default_factory=dict)
+    deleted: set[str] = field(default_factory=set)
+    expires_at: Optional[datetime] = None
+
+    def merge(self, delta: dict[str, Any], expires_at: Optional[datetime]) -> None:
+        for k, v in delta.items():
+            k = str(k)
+            if v is None:
+                self.values.pop(k, None)
+                self.deleted.add(k)
+            else:
+                self.values[k] = v
+                self.deleted.discard(k)
+        if expires_at and (self.expires_at is None or expires_at > self.expires_at):
+            self.expires_at = expires_at
+
+    def absorb_older(self, older: "PendingDelta") -> None:
+        """Re-encola un delta más viejo debajo de este (tras un flush fallido)."""
+        for k, v in older.values.items():
+            if k not in self.values and k not in self.deleted:
+                self.values[k] = v
+        for k in older.deleted:
+            if k not in self.values:
+                self.deleted.add(k)
+        if older.expires_at and (self.expires_at is None or older.expires_at > self.expires_at):
+            self.expires_at = older.expires_at
+
+
+def apply_deltas(db: Session, pending: dict[UUID, PendingDelta]) -> dict[UUID, Optional[datetime]]:
+    """
+    Escribe los deltas en un único UPDATE ... FROM jsonb_to_recordset. Devuelve
+    attempt_id -> expires_at ya renovado de los attempts escritos (los que
+    seguían 'en_progreso'). NO hace commit.
+    """
+    if not pending:
+        return {}
+    batch = [
+        {
+            "id": str(aid),
+            "set_json": p.values,
+            "deleted": sorted(p.deleted),
+            "expires_at": p.expires_at.isoformat() if p.expires_at else None,
+        }
+        for aid, p in pending.items()
+    ]
+    result = db.execute(_APPLY_SQL, {"batch": json.dumps(batch, default=str)})
+    return {r.id: r.expires_at for r in result}
+
+
+class AutosaveBuffer:
+    """Deltas pendientes por attempt, protegidos por un lock (rutas sync en threadpool)."""
+
+    def __init__(self, max_pending: int = 5000):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending: dict[UUID, PendingDelta] = {}
+        self.flushed_batches = 0
+        self.flushed_rows = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, attempt_id: UUID, delta: dict[str, Any], expires_at: Optional[datetime]) -> bool:
+        """Acumula el delta. Devuelve False si el buffer está lleno (escribir directo)."""
+        with self._lock:
+            p = self._pending.get(attempt_id)
+            if p is None:
+                if len(self._pending) >= self.max_pending:
+                    return False
+                p = self._pending[attempt_id] = PendingDelta()
+            p.merge(delta, expires_at)
+            return True
+
+    def pending_expires_at(self, attempt_id: UUID) -> Optional[datetime]:
+        """Renovación aún no escrita del attempt (None si no hay)."""
+        with self._lock:
+            p = self._pending.get(attempt_id)
+            return p.expires_at if p is not None else None
+
+    def discard(self, attempt_id: UUID) -> None:
+        with self._lock:
+            self._pending.pop(attempt_id, None)
+
+    def _take(self, attempt_ids: Optional[Iterable[UUID]] = None) -> dict[UUID, PendingDelta]:
+        with self._lock:
+            if attempt_ids is None:
+                taken, self._pending = self._pending, {}
+                return taken
+            return {
+                aid: self._pending.pop(aid)
+                for aid in set(attempt_ids)
+                if aid in self._pending
+            }
+
+    def _restore(self, taken: dict[UUID, PendingDelta]) -> None:
+        with self._lock:
+            for aid, older in taken.items():
+                newer = self._pending.get(aid)
+                if newer is None:
+                    self._pending[aid] = older
+                else:
+                    newer.absorb_older(older)
+
+    def flush_pending(self, db: Session, attempt_ids: Iterable[UUID]) -> dict[UUID, Optional[datetime]]:
+        """
+        Escribe los deltas pendientes de esos attempts dentro de la transacción
+        de `db` (el commit lo hace el llamador, p. ej. submit). Devuelve el
+        expires_at resultante de los attempts escritos (ver apply_deltas).
+        """
+        taken = self._take(attempt_ids)
+        try:
+            return apply_deltas(db, taken)
+        except Exception:
+            self._restore(taken)
+            raise
+
+    def flush_all(self, session_factory: Callable[[], Session] = SessionLocal) -> int:
+        """Escribe todo lo pendiente en un UPDATE y un commit. Si falla, re-encola."""
+        taken = self._take()
+        if not taken:
+            return 0
+        try:
+            with session_factory() as db:
+                n = len(apply_deltas(db, taken))
+                db.commit()
+        except Exception:
+            self._restore(taken)
+            raise
+        self.flushed_batches += 1
+        self.flushed_rows += n
+        return n
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "flushed_batches": self.flushed_batches,
+            "flushed_rows": self.flushed_rows,
+        }
+
+
+class AutosaveFlusher:
+    """Tarea asyncio que vacía el buffer cada `interval_seconds`; flush final al detenerse."""
+
+    def __init__(self, buffer: AutosaveBuffer, interval_seconds: float):
+        self.buffer = buffer
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            n = await asyncio.to_thread(self.buffer.flush_all)
+            if n:
+                logger.info(f"[AUTOSAVE] Flush final: {n} attempts")
+        except Exception as e:
+            logger.error(f"[AUTOSAVE] Flush final fallido, {len(self.buffer)} attempts sin guardar: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await asyncio.to_thread(self.buffer.flush_all)
+            except Exception as e:
+                logger.error(f"[AUTOSAVE] Flush fallido (se reintenta): {e}")
+
+
+autosave_buffer = AutosaveBuffer(max_pending=settings.AUTOSAVE_MAX_PENDING)
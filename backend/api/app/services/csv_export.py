@@ -0,0 +1,237 @@
+# app/services/csv_export.py
+"""
+Pipeline de exportaciones CSV con memoria constante.
+
+Los exports hacían `.mappings().all()` y escribían el archivo completo en un
+StringIO antes de responder: con un semestre de respuestas eso es todo el
+resultado en memoria dos veces (filas + texto). Aquí cada export es:
+
+  stream_rows()  -> cursor del lado del servidor (stream_results + yield_per):
+                    la BD entrega EXPORT_FETCH_ROWS filas por viaje.
+  csv_chunks()   -> csv.writer sobre un buffer que se vacía al pasar de
+                    EXPORT_CHUNK_BYTES caracteres; cada vaciado es un chunk
+                    UTF-8 de la respuesta (transfer-encoding chunked).
+  csv_response() -> StreamingResponse con el Content-Disposition; genera el
+                    primer chunk antes de responder para que los errores de
+                    la consulta no lleguen como un archivo cortado.
+
+La memoria queda acotada por un lote de filas más un chunk, sin importar el
+tamaño de la encuesta (ver test_export_memory.py).
+
+stream_rows() recibe la sesión del request y la cierra al terminar (o si el
+cliente corta la descarga): el export usa una sola conexión aunque FastAPI
+cierre o no las dependencias antes de enviar el cuerpo. Las validaciones
+(404, definición de la encuesta) van en el endpoint, antes de responder.
+
+copy_csv_chunks() es el camino rápido para exports crudos: PostgreSQL arma el
+CSV con `COPY (SELECT ...) TO STDOUT WITH CSV HEADER` (copy_expert de
+psycopg2) y Python solo reenvía bytes, sin mapear filas ni citar campos. El
+COPY corre en un hilo que escribe en una cola acotada; si el cliente corta la
+descarga se cancela la consulta en el servidor. Los valores salen con el
+formato de texto de PostgreSQL: para que el camino fila a fila dé los mismos
+bytes, el SQL formatea fechas (py_timestamp_sql) y jsonb (CAST AS text), y el
+fin de registro de COPY (LF) se reescribe a CRLF como el de csv.writer (ver
+test_responses_copy.py).
+"""
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import queue
+import re
+import threading
+from itertools import chain
+from typing import Any, Iterable, Iterator, Mapping, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# :nombre -> %(nombre)s, con la misma regla que text() (no toca los casts ::tipo)
+_BIND_RE = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+_COPY_QUEUE_CHUNKS = 4
+_DONE = object()
+
+
+def py_timestamp_sql(expr: str) -> str:
+    """
+    SQL que formatea el timestamptz `expr` como str(datetime) de Python en la
+    zona de la sesión ('2025-03-01 10:00:00.123456+00:00'; sin fracción si es
+    cero): el mismo texto que csv.writer escribía para la columna.
+    """
+    return (
+        f"(to_char({expr}, 'YYYY-MM-DD HH24:MI:SS')"
+        f" || CASE WHEN extract(microseconds FROM {expr})::bigint % 1000000 <> 0"
+        f" THEN to_char({expr}, '.US') ELSE '' END"
+        f" || to_char({expr}, 'TZH:TZM'))"
+    )
+
+
+def stream_rows(
+    db: Session,
+    sql: str,
+    params: Optional[Mapping[str, Any]] = None,
+    fetch_rows: Optional[int] = None,
+) -> Iterator[Mapping[str, Any]]:
+    """Filas (mappings) de `sql` leídas por lotes con un cursor del lado del servidor."""
+    fetch_rows = fetch_rows or settings.EXPORT_FETCH_ROWS
+    try:
+        result = db.execute(text(sql), dict(params or {}), execution_options={"yield_per": fetch_rows})
+        for row in result.mappings():
+            yield row
+    finally:
+        db.close()
+
+
+def csv_chunks(
+    header: Sequence[Any],
+    rows: Iterable[Sequence[Any]],
+    bom: bool = False,
+    chunk_size: Optional[int] = None,
+    lineterminator: str = "\r\n",
+) -> Iterator[bytes]:
+    """CSV en chunks UTF-8 de ~chunk_size caracteres (BOM opcional para Excel)."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_BYTES
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator=lineterminator)
+    if bom:
+        buf.write("\ufeff")
+    w.writerow(header)
+    for row in rows:
+        w.writerow(row)
+        if buf.tell() >= chunk_size:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def csv_response(filename: str, chunks: Iterable[bytes]) -> StreamingResponse:
+    """
+    Respuesta con los chunks. El primero se genera aquí, antes de responder:
+    un error de la consulta (zona horaria inválida, timeout) sale como error
+    del request y no como un 200 con el archivo cortado.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    return StreamingResponse(
+        chain([first], chunks) if first is not None else iter(()),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def supports_copy(db: Session) -> bool:
+    """True si la conexión es psycopg2 (copy_expert disponible)."""
+    return db.get_bind().dialect.driver == "psycopg2"
+
+
+class _CopySink:
+    """
+    Archivo para copy_expert: junta lo que escribe COPY en chunks y los encola.
+    Con crlf=True reescribe los fin de registro a CRLF; los saltos dentro de un
+    campo entre comillas se dejan (csv.writer tampoco los toca).
+    """
+
+    def __init__(self, q: "queue.Queue", chunk_size: int, cancelled: threading.Event, crlf: bool = False):
+        self.q = q
+        self.chunk_size = chunk_size
+        self.cancelled = cancelled
+        self.crlf = crlf
+        self.in_quotes = False   # el último chunk terminó dentro de un campo citado
+        self.buf = bytearray()
+
+    def _to_crlf(self, data: bytes) -> bytes:
+        # Partido por comillas, los tramos alternan fuera/dentro de un campo
+        # citado ("" escapado abre y cierra: no cambia la paridad)
+        parts = data.split(b'"')
+        first_outside = 1 if self.in_quotes else 0
+        for i in range(first_outside, len(parts), 2):
+            parts[i] = parts[i].replace(b"\n", b"\r\n")
+        if len(parts) % 2 == 0:
+            self.in_quotes = not self.in_quotes
+        return b'"'.join(parts)
+
+    def write(self, data) -> None:
+        data = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        self.buf += self._to_crlf(data) if self.crlf else data
+        if len(self.buf) >= self.chunk_size:
+            self.put(bytes(self.buf))
+            self.buf.clear()
+
+    def put(self, item) -> None:
+        # Con la cola llena espera al consumidor; si la descarga se cortó,
+        # descarta (la cancelación detiene el COPY en el servidor)
+        while not self.cancelled.is_set():
+            try:
+                self.q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+
+def copy_csv_chunks(
+    db: Session,
+    sql: str,
+    params: Optional[Mapping[str, Any]] = None,
+    bom: bool = False,
+    chunk_size: Optional[int] = None,
+    lineterminator: str = "\r\n",
+) -> Iterator[bytes]:
+    """
+    CSV de `sql` (con encabezado = alias de columnas) generado por COPY, en
+    chunks de ~chunk_size bytes. lineterminator es "\r\n" (como csv_chunks)
+    o "\n" (el de COPY, sin reescribir). Cierra la sesión al terminar.
+    """
+    if lineterminator not in ("\r\n", "\n"):
+        raise ValueError(f"lineterminator no soportado por COPY: {lineterminator!r}")
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_BYTES
+    raw = db.connection().connection.dbapi_connection
+    with raw.cursor() as cur:
+        select_sql = cur.mogrify(_BIND_RE.sub(r"%(\1)s", sql.replace("%", "%%")), dict(params or {}))
+    copy_sql = b"COPY (" + select_sql + b") TO STDOUT WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')"
+
+    q: "queue.Queue" = queue.Queue(maxsize=_COPY_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    finished = threading.Event()
+    sink = _CopySink(q, chunk_size, cancelled, crlf=lineterminator == "\r\n")
+
+    def run() -> None:
+        try:
+            with raw.cursor() as cur:
+                cur.copy_expert(copy_sql.decode("utf-8"), sink, size=chunk_size)
+            finished.set()
+            if sink.buf:
+                sink.put(bytes(sink.buf))
+            sink.put(_DONE)
+        except BaseException as e:
+            finished.set()
+            if not cancelled.is_set():
+                sink.put(e)
+
+    producer = threading.Thread(target=run, name="csv-copy", daemon=True)
+    # El BOM va pegado al primer chunk: así csv_response ve los errores del COPY
+    prefix = "\ufeff".encode("utf-8") if bom else b""
+    try:
+        producer.start()
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                logger.error("[EXPORT] COPY falló: %s", item)
+                raise item
+            yield prefix + item
+            prefix = b""
+    finally:
+        cancelled.set()
+        if producer.is_alive() and not finished.is_set():
+            raw.cancel()
+        producer.join()
+        db.close()
@@ -0,0 +1,48 @@
+# app/services/etag.py
+"""
+ETags fuertes y GET condicional (If-None-Match -> 304).
+
+Los endpoints calculan un ETag barato (versión/fingerprint en una consulta
+indexada o un hash ya cacheado) ANTES de construir el payload; si coincide con
+If-None-Match responden 304 sin serializar nada.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """ETag fuerte (entre comillas) a partir de valores serializables."""
+    raw = json.dumps(parts, default=str, sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil (RFC 9110 §13.1.2): ignora el prefijo W/
+    candidates = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return etag in candidates
+
+
+def conditional(
+    response: Response,
+    if_none_match: Optional[str],
+    etag: str,
+    cache_control: str,
+) -> Optional[Response]:
+    """
+    Pone ETag/Cache-Control en `response`. Si el cliente ya tiene esa versión,
+    devuelve la respuesta 304 a retornar tal cual; si no, None.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
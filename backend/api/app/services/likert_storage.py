@@ -0,0 +1,125 @@
+# app/services/likert_storage.py
+"""
+Almacenamiento compacto de respuestas likert (tabla attempt_likert).
+
+Con LIKERT_STORAGE=compact el submit guarda las 15 respuestas likert de un
+attempt como un smallint[] (posición = orden de la pregunta en la vista
+survey_likert_order, es decir por Question.orden, id) en vez de 15 filas de
+`responses`. Q16 y demás textos siguen en `responses`.
+
+Compatibilidad: la vista `responses_all` (migración 0009) une `responses` con
+attempt_likert desempaquetado y expone las mismas columnas, así que los reportes
+leen de ahí sin importar el formato. Los attempts se pueden pasar de un formato
+a otro en lote con compact_attempts / expand_attempts
+(scripts/likert_storage.py).
+
+Ojo: las posiciones dependen del orden de las preguntas likert de la encuesta.
+Antes de reordenar/agregar preguntas likert en una encuesta con attempts
+compactos, expandirlos.
+"""
+from __future__ import annotations
+
+from typing import Any, Mapping, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def compact_enabled() -> bool:
+    return (settings.LIKERT_STORAGE or "").lower() == "compact"
+
+
+def pack_likert(values: Mapping[Any, int], likert_order) -> list[Optional[int]]:
+    """question_id -> valor  =>  [valor por posición] (None si falta)."""
+    return [values.get(qid) for qid in likert_order]
+
+
+def unpack_likert(valores, likert_order) -> list[tuple[Any, int]]:
+    """[valor por posición]  =>  [(question_id, valor)] omitiendo posiciones vacías."""
+    return [(qid, v) for qid, v in zip(likert_order, valores or []) if v is not None]
+
+
+_COMPACT_SQL = text("""
+    WITH picked AS (
+      SELECT a.id, a.survey_id
+      FROM public.attempts a
+      WHERE a.estado = 'enviado'
+        AND (CAST(:sid AS uuid) IS NULL OR a.survey_id = CAST(:sid AS uuid))
+        AND NOT EXISTS (SELECT 1 FROM public.attempt_likert al WHERE al.attempt_id = a.id)
+        AND EXISTS (SELECT 1 FROM public.responses r
+                    WHERE r.attempt_id = a.id AND r.valor_likert IS NOT NULL)
+      ORDER BY a.id
+      LIMIT :n
+      FOR UPDATE SKIP LOCKED
+    ),
+    ins AS (
+      INSERT INTO public.attempt_likert (attempt_id, survey_id, valores, created_at)
+      SELECT p.id, p.survey_id,
+             ARRAY(
+               SELECT r.valor_likert
+               FROM public.survey_likert_order o
+               LEFT JOIN public.responses r ON r.attempt_id = p.id AND r.question_id = o.question_id
+               WHERE o.survey_id = p.survey_id
+               ORDER BY o.pos
+             )::smallint[],
+             COALESCE((SELECT MIN(r.created_at) FROM public.responses r WHERE r.attempt_id = p.id), now())
+      FROM picked p
+      RETURNING attempt_id
+    ),
+    del AS (
+      DELETE FROM public.responses r
+      USING picked p, public.survey_likert_order o
+      WHERE r.attempt_id = p.id
+        AND o.survey_id = p.survey_id
+        AND o.question_id = r.question_id
+      RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM ins) AS attempts, (SELECT COUNT(*) FROM del) AS filas
+""")
+
+_EXPAND_SQL = text("""
+    WITH picked AS (
+      SELECT al.attempt_id, al.survey_id, al.valores, al.created_at
+      FROM public.attempt_likert al
+      WHERE (CAST(:sid AS uuid) IS NULL OR al.survey_id = CAST(:sid AS uuid))
+      ORDER BY al.attempt_id
+      LIMIT :n
+      FOR UPDATE SKIP LOCKED
+    ),
+    ins AS (
+      INSERT INTO public.responses (id, attempt_id, question_id, valor_likert, texto, created_at)
+      SELECT gen_random_uuid(), p.attempt_id, o.question_id, v.valor, NULL, p.created_at
+      FROM picked p
+      CROSS JOIN LATERAL unnest(p.valores) WITH ORDINALITY AS v(valor, pos)
+      JOIN public.survey_likert_order o ON o.survey_id = p.survey_id AND o.pos = v.pos
+      WHERE v.valor IS NOT NULL
+      RETURNING 1
+    ),
+    del AS (
+      DELETE FROM public.attempt_likert al
+      USING picked p
+      WHERE al.attempt_id = p.attempt_id
+      RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM del) AS attempts, (SELECT COUNT(*) FROM ins) AS filas
+""")
+
+
+def compact_attempts(db: Session, survey_id: Optional[UUID] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Pasa hasta `batch_size` attempts enviados de filas en `responses` a attempt_likert
+    (un solo statement: INSERT + DELETE en CTEs). NO hace commit. Devuelve attempts movidos.
+    """
+    row = db.execute(_COMPACT_SQL, {"sid": str(survey_id) if survey_id else None, "n": batch_size}).one()
+    return int(row.attempts or 0)
+
+
+def expand_attempts(db: Session, survey_id: Optional[UUID] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Inverso de compact_attempts: vuelve a filas en `responses`. NO hace commit."""
+    row = db.execute(_EXPAND_SQL, {"sid": str(survey_id) if survey_id else None, "n": batch_size}).one()
+    return int(row.attempts or 0)
@@ -0,0 +1,215 @@
+# app/services/queue.py
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import base64
+import json
+from typing import Literal, Optional, Sequence
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.schemas.queue import QueueItemOut, QueueOut, QueueState
+from app.services.etag import make_etag
+from app.services.teacher_permissions import allowed_param, allowed_teacher_ids
+
+_FINGERPRINT_SQL = text("""
+    SELECT
+      EXISTS (SELECT 1 FROM public.surveys s WHERE s.id = :sid) AS survey_exists,
+      (SELECT v.assignments_version FROM public.survey_versions v WHERE v.survey_id = :sid) AS assignments_version,
+      COUNT(a.id)           AS n,
+      MAX(a.actualizado_en) AS last_change,
+      COUNT(a.id) FILTER (WHERE a.estado = 'en_progreso' AND a.expires_at <= :now) AS stale
+    FROM public.attempts a
+    WHERE a.survey_id = :sid AND a.user_id = :uid
+""")
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def queue_etag(db: Session, survey_id: UUID, user_id: UUID, *params) -> Optional[str]:
+    """
+    ETag de la cola en una sola consulta indexada, sin construir el payload:
+    versión de asignaciones de la encuesta + docentes permitidos al usuario
+    (caché de services/teacher_permissions) + fingerprint de los attempts del
+    usuario (cantidad, último cambio y cuántos vencieron por tiempo).
+    `params` son los parámetros de la request (scope, filtros, cursor...).
+    Devuelve None si la encuesta no existe.
+    """
+    now = datetime.now(timezone.utc)
+    row = db.execute(_FINGERPRINT_SQL, {"sid": str(survey_id), "uid": str(user_id), "now": now}).one()
+    if not row.survey_exists:
+        return None
+    allowed = allowed_param(allowed_teacher_ids(db, survey_id, user_id))
+    return make_etag(
+        "queue", survey_id, user_id, params,
+        row.assignments_version or 0, sorted(allowed) if allowed is not None else None,
+        row.n, row.last_change, row.stale,
+    )
+
+
+# Mejor attempt visible por docente: enviado > en_progreso vigente.
+# expirado/fallido (y vencidos) no entran: el docente queda 'pendiente'.
+_BEST_CTE = """
+    best AS (
+      SELECT DISTINCT ON (a.teacher_id)
+             a.teacher_id,
+             a.id AS attempt_id,
+             a.intento_nro,
+             CASE WHEN a.estado = 'enviado' THEN 'enviado' ELSE 'en_progreso' END AS estado,
+             CASE WHEN a.estado = 'enviado' THEN NULL ELSE a.expires_at END AS expires_at
+      FROM public.attempts a
+      WHERE a.survey_id = :sid
+        AND a.user_id = :uid
+        AND (
+          a.estado = 'enviado'
+          OR (a.estado = 'en_progreso' AND (a.expires_at IS NULL OR a.expires_at > :now))
+        )
+      ORDER BY a.teacher_id,
+               (a.estado = 'enviado') DESC,
+               a.intento_nro DESC,
+               a.creado_en DESC
+    )
+"""
+
+# Página por keyset sobre (t.nombre, t.id); ver índices de la migración 0011
+_QUEUE_PAGE_SQL = text(f"""
+    WITH {_BEST_CTE}
+    SELECT t.id AS teacher_id,
+           t.nombre AS teacher_nombre,
+           COALESCE(b.estado, 'pendiente') AS estado,
+           b.attempt_id,
+           b.intento_nro,
+           b.expires_at
+    FROM public.survey_teacher_assignments sta
+    JOIN public.teachers t ON t.id = sta.teacher_id AND t.estado = 'activo'
+    LEFT JOIN best b ON b.teacher_id = t.id
+    WHERE sta.survey_id = :sid
+      AND (CAST(:allowed AS uuid[]) IS NULL OR sta.teacher_id = ANY(CAST(:allowed AS uuid[])))
+      AND (NOT :selected OR b.teacher_id IS NOT NULL)
+      AND (CAST(:estados AS text[]) IS NULL OR COALESCE(b.estado, 'pendiente') = ANY(CAST(:estados AS text[])))
+      AND (CAST(:prefix AS text) IS NULL OR lower(t.nombre) LIKE CAST(:prefix AS text) ESCAPE '\\')
+      AND (CAST(:c_nombre AS text) IS NULL OR (t.nombre, t.id) > (CAST(:c_nombre AS text), CAST(:c_id AS uuid)))
+    ORDER BY t.nombre ASC, t.id ASC
+    LIMIT :limit
+""")
+
+# Summary exacto de toda la cola (no de la página): un agregado sin DISTINCT ON ni ordenamiento
+_QUEUE_SUMMARY_SQL = text("""
+    WITH per_teacher AS (
+      SELECT a.teacher_id, bool_or(a.estado = 'enviado') AS enviado
+      FROM public.attempts a
+      WHERE a.survey_id = :sid
+        AND a.user_id = :uid
+        AND (
+          a.estado = 'enviado'
+          OR (a.estado = 'en_progreso' AND (a.expires_at IS NULL OR a.expires_at > :now))
+        )
+      GROUP BY a.teacher_id
+    )
+    SELECT COUNT(*) FILTER (WHERE p.teacher_id IS NULL) AS pendiente,
+           COUNT(*) FILTER (WHERE NOT p.enviado)        AS en_progreso,
+           COUNT(*) FILTER (WHERE p.enviado)            AS enviado
+    FROM public.survey_teacher_assignments sta
+    JOIN public.teachers t ON t.id = sta.teacher_id AND t.estado = 'activo'
+    LEFT JOIN per_teacher p ON p.teacher_id = t.id
+    WHERE sta.survey_id = :sid
+      AND (CAST(:allowed AS uuid[]) IS NULL OR sta.teacher_id = ANY(CAST(:allowed AS uuid[])))
+""")
+
+
+def encode_cursor(nombre: str, teacher_id) -> str:
+    raw = json.dumps([nombre, str(teacher_id)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        nombre, teacher_id = json.loads(raw)
+        return str(nombre), str(UUID(str(teacher_id)))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _like_prefix(q: Optional[str]) -> Optional[str]:
+    q = (q or "").strip().lower()
+    if not q:
+        return None
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def build_queue(
+    db: Session,
+    survey_id: UUID,
+    user_id: UUID,
+    scope: Literal["all", "selected"] = "all",
+    estados: Optional[Sequence[QueueState]] = None,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> QueueOut:
+    """
+    Cola de docentes para el usuario en una encuesta, paginada por keyset (nombre, id):
+    - scope=all      : docentes autorizados (pendiente / en_progreso / enviado)
+    - scope=selected : solo docentes que YA tienen attempt (oculta 'pendiente')
+    - permisos       : si el usuario tiene filas en user_teacher_permissions para
+                       la encuesta, solo esos docentes (page y summary)
+    - estados        : filtra items por estado
+    - q              : prefijo del nombre (sin distinguir mayúsculas)
+    - cursor         : next_cursor de la página anterior
+    Nota: 'expirado' o 'fallido' se consideran 'pendiente' para el flujo UI.
+
+    La página sale de una sentencia (asignaciones LEFT JOIN el mejor attempt por
+    docente con DISTINCT ON). El summary es exacto sobre toda la cola del scope
+    (no depende de página, estados ni q) y sale de un agregado aparte.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    c_nombre, c_id = decode_cursor(cursor) if cursor else (None, None)
+    params = {
+        "sid": str(survey_id),
+        "uid": str(user_id),
+        "now": datetime.now(timezone.utc),
+        "allowed": allowed_param(allowed_teacher_ids(db, survey_id, user_id)),
+    }
+
+    rows = db.execute(_QUEUE_PAGE_SQL, {
+        **params,
+        "selected": scope == "selected",
+        "estados": list(estados) if estados else None,
+        "prefix": _like_prefix(q),
+        "c_nombre": c_nombre,
+        "c_id": c_id,
+        "limit": limit + 1,
+    }).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["teacher_nombre"], last["teacher_id"])
+
+    items = [
+        QueueItemOut(
+            teacher_id=r["teacher_id"],
+            teacher_nombre=r["teacher_nombre"],
+            estado=r["estado"],            # 'pendiente' | 'en_progreso' | 'enviado'
+            attempt_id=r["attempt_id"],    # si en_progreso o enviado
+            intento_nro=r["intento_nro"],
+            expires_at=r["expires_at"],
+        )
+        for r in rows
+    ]
+
+    counts = db.execute(_QUEUE_SUMMARY_SQL, params).mappings().one()
+    summary = {
+        "pendiente": 0 if scope == "selected" else int(counts["pendiente"] or 0),
+        "en_progreso": int(counts["en_progreso"] or 0),
+        "enviado": int(counts["enviado"] or 0),
+    }
+
+    return QueueOut(survey_id=survey_id, summary=summary, items=items, next_cursor=next_cursor)
@@ -0,0 +1,211 @@
+# app/services/report_cache.py
+"""
+Caché en proceso de las respuestas de reportes del dashboard.
+
+El dashboard dispara summary, questions, top-bottom, teachers, matrix, filters
+y progress/daily a la vez, y varios admins lo abren al mismo tiempo; cada
+llamada recalculaba todo. Aquí la respuesta se guarda con clave
+(encuesta, survey_versions.data_version, endpoint, parámetros):
+
+  - data_version sube en la misma transacción que cambia los datos del reporte
+    (envíos, pesos, asignaciones, cubo, reconciliación; ver
+    services/survey_versions). Una respuesta cacheada nunca se invalida: deja
+    de pedirse porque la clave cambia, y al ver una versión nueva se descartan
+    las entradas viejas de esa encuesta.
+  - La versión se lee con una consulta por PK y se recuerda por encuesta
+    durante REPORT_CACHE_VERSION_TTL_SECONDS: recargas del dashboard entre
+    envíos no tocan la BD, a costa de que un cambio tarde hasta ese TTL en
+    verse en cada worker.
+  - Single-flight: requests idénticas concurrentes esperan al cálculo de la
+    primera en vez de repetirlo (si falla, todas reciben el mismo error).
+  - LRU acotado por REPORT_CACHE_MAX_BYTES, medido como el tamaño del JSON de
+    la respuesta (aproximado: los objetos Python ocupan algo más).
+
+Los valores cacheados se comparten entre requests: no se deben mutar.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+# None si la encuesta no existe (el endpoint responde 404 sin cachear)
+_VERSION_SQL = text("""
+    SELECT COALESCE(v.data_version, 0) AS data_version
+    FROM public.surveys s
+    LEFT JOIN public.survey_versions v ON v.survey_id = s.id
+    WHERE s.id = :sid
+""")
+
+
+def _json_default(o: Any) -> Any:
+    if hasattr(o, "model_dump"):
+        return o.model_dump()
+    return str(o)
+
+
+def _approx_size(value: Any) -> int:
+    return len(json.dumps(value, default=_json_default))
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ReportCache:
+    def __init__(self, max_bytes: int, version_ttl: float):
+        self.max_bytes = max_bytes
+        self.version_ttl = version_ttl
+        self._lock = threading.Lock()
+        # (survey_id, version, endpoint, params) -> (bytes, value)
+        self._items: "OrderedDict[tuple, tuple[int, Any]]" = OrderedDict()
+        self._by_survey: dict[str, set[tuple]] = {}
+        self._latest: dict[str, int] = {}                    # survey_id -> versión más nueva vista
+        self._versions: dict[str, tuple[float, int]] = {}    # survey_id -> (leída en, versión)
+        self._inflight: dict[tuple, _Flight] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.version_reads = 0
+
+    def data_version(self, db: Session, survey_id: UUID) -> Optional[int]:
+        """data_version de la encuesta (recordada por version_ttl); None si no existe."""
+        sid = str(survey_id)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._versions.get(sid)
+            if hit is not None and now - hit[0] < self.version_ttl:
+                return hit[1]
+            self.version_reads += 1
+
+        version = db.execute(_VERSION_SQL, {"sid": sid}).scalar_one_or_none()
+        if version is None:
+            return None
+        version = int(version)
+        with self._lock:
+            self._versions[sid] = (now, version)
+        return version
+
+    def get_or_compute(
+        self,
+        survey_id: UUID,
+        version: int,
+        endpoint: str,
+        params: Hashable,
+        compute: Callable[[], Any],
+    ) -> Any:
+        """Respuesta cacheada para la clave, o compute() una sola vez entre requests concurrentes."""
+        if self.max_bytes <= 0:
+            return compute()
+        sid = str(survey_id)
+        key = (sid, version, endpoint, params)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            flight.value = value
+            self._store(key, value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+        return value
+
+    def _store(self, key: tuple, value: Any) -> None:
+        size = _approx_size(value)
+        if size > self.max_bytes:
+            return
+        sid, version = key[0], key[1]
+        with self._lock:
+            latest = self._latest.get(sid, -1)
+            if version < latest:
+                return  # alguien ya vio una versión más nueva
+            if version > latest:
+                self._latest[sid] = version
+                for old in self._by_survey.pop(sid, ()):
+                    self._discard(old)
+            if key in self._items:
+                self._discard(key)
+            self._items[key] = (size, value)
+            self._by_survey.setdefault(sid, set()).add(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._items))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def _discard(self, key: tuple) -> None:
+        """Saca una entrada (con el lock tomado)."""
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        self.bytes -= item[0]
+        keys = self._by_survey.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_survey[key[0]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._by_survey.clear()
+            self._latest.clear()
+            self._versions.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "version_reads": self.version_reads,
+            }
+
+
+report_cache = ReportCache(
+    max_bytes=settings.REPORT_CACHE_MAX_BYTES,
+    version_ttl=settings.REPORT_CACHE_VERSION_TTL_SECONDS,
+)
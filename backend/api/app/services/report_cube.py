@@ -0,0 +1,174 @@
+# app/services/report_cube.py
+"""
+Cubo de reportes (tabla report_cube): por (encuesta, docente, pregunta) guarda
+n, suma, suma de cuadrados y conteos c1..c5 de las respuestas likert enviadas.
+
+Los reportes de admin_reports agregaban `responses_all ⋈ attempts ⋈ questions`
+con AVG / STDDEV / SUM(CASE ...) sobre todo el historial de la encuesta. Con el
+cubo leen unas pocas miles de filas y derivan lo mismo:
+  - media       = sum / n
+  - var_pop     = (n·sumsq − sum²) / n²        (STDDEV_POP = √var_pop)
+  - var_samp    = (n·sumsq − sum²) / (n·(n−1)) (STDDEV_SAMP)
+  - mediana, min y max salen de la distribución c1..c5 (likert_stats).
+
+El submit suma sus deltas en la misma transacción que escribe las respuestas
+(apply_cube_deltas). Las filas se bloquean hasta el commit, en orden de clave
+para no generar deadlocks entre envíos concurrentes del mismo docente.
+
+rebuild_report_cube() rehace el cubo desde `responses_all`: lo usa la migración
+0015 (backfill) y scripts/rebuild_report_cube.py.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Iterable, Mapping, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.report_cube import ReportCube
+from app.services.survey_versions import bump_data_version
+
+_KEY = ("survey_id", "teacher_id", "question_id")
+_SUMS = ("n", "likert_sum", "likert_sumsq", "c1", "c2", "c3", "c4", "c5")
+
+_REBUILD_SQL = text("""
+    INSERT INTO public.report_cube
+      (survey_id, teacher_id, question_id, n, likert_sum, likert_sumsq, c1, c2, c3, c4, c5, updated_at)
+    SELECT a.survey_id, a.teacher_id, r.question_id,
+           COUNT(*),
+           SUM(r.valor_likert),
+           SUM(r.valor_likert * r.valor_likert),
+           COUNT(*) FILTER (WHERE r.valor_likert = 1),
+           COUNT(*) FILTER (WHERE r.valor_likert = 2),
+           COUNT(*) FILTER (WHERE r.valor_likert = 3),
+           COUNT(*) FILTER (WHERE r.valor_likert = 4),
+           COUNT(*) FILTER (WHERE r.valor_likert = 5),
+           now()
+    FROM public.attempts a
+    JOIN public.responses_all r ON r.attempt_id = a.id
+    WHERE a.estado = 'enviado'
+      AND r.valor_likert IS NOT NULL
+      AND (CAST(:sid AS uuid) IS NULL OR a.survey_id = CAST(:sid AS uuid))
+    GROUP BY a.survey_id, a.teacher_id, r.question_id
+""")
+
+# Columnas agregadas del cubo (alias c) que espera likert_stats
+CUBE_SUMS = """
+    SUM(c.n)            AS n,
+    SUM(c.likert_sum)   AS likert_sum,
+    SUM(c.likert_sumsq) AS likert_sumsq,
+    SUM(c.c1) AS c1, SUM(c.c2) AS c2, SUM(c.c3) AS c3, SUM(c.c4) AS c4, SUM(c.c5) AS c5
+"""
+
+_DELETE_SQL = text("""
+    DELETE FROM public.report_cube
+    WHERE CAST(:sid AS uuid) IS NULL OR survey_id = CAST(:sid AS uuid)
+""")
+
+
+def cube_deltas(att, values: Mapping[Any, int]) -> list[dict]:
+    """Filas a sumar en report_cube por un attempt enviado (question_id -> valor likert)."""
+    return [
+        {
+            "survey_id": att.survey_id,
+            "teacher_id": att.teacher_id,
+            "question_id": qid,
+            "n": 1,
+            "likert_sum": v,
+            "likert_sumsq": v * v,
+            "c1": int(v == 1), "c2": int(v == 2), "c3": int(v == 3),
+            "c4": int(v == 4), "c5": int(v == 5),
+        }
+        for qid, v in values.items()
+    ]
+
+
+def apply_cube_deltas(db: Session, deltas: Iterable[dict]) -> None:
+    """
+    Suma los deltas al cubo con un INSERT ... ON CONFLICT DO UPDATE multi-fila.
+    Agrupa antes por clave (un envío en lote puede traer varios attempts del
+    mismo docente) y ordena las filas para bloquearlas siempre en el mismo orden.
+    NO hace commit.
+    """
+    merged: dict[tuple, dict] = {}
+    for d in deltas:
+        key = tuple(d[k] for k in _KEY)
+        acc = merged.get(key)
+        if acc is None:
+            merged[key] = dict(d)
+        else:
+            for k in _SUMS:
+                acc[k] += d[k]
+    if not merged:
+        return
+
+    rows = [merged[k] for k in sorted(merged, key=lambda k: tuple(str(x) for x in k))]
+    stmt = pg_insert(ReportCube).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[ReportCube.survey_id, ReportCube.teacher_id, ReportCube.question_id],
+        set_={
+            **{k: getattr(ReportCube, k) + getattr(stmt.excluded, k) for k in _SUMS},
+            "updated_at": text("now()"),
+        },
+    ))
+
+
+def rebuild_report_cube(db: Session, survey_id: Optional[UUID] = None) -> int:
+    """
+    Rehace el cubo desde `responses_all` (de una encuesta, o de todas si
+    survey_id es None). Toma un lock EXCLUSIVE sobre report_cube: los submits
+    concurrentes esperan al commit en vez de sumar sobre filas a medio rehacer;
+    las lecturas de reportes no se bloquean. Sube la versión de datos de las
+    encuestas afectadas (caché de reportes). NO hace commit.
+    Devuelve cuántas filas quedaron en el cubo.
+    """
+    params = {"sid": str(survey_id) if survey_id else None}
+    db.execute(text("LOCK TABLE public.report_cube IN EXCLUSIVE MODE"))
+    db.execute(_DELETE_SQL, params)
+    n = int(db.execute(_REBUILD_SQL, params).rowcount or 0)
+    bump_data_version(db, [survey_id] if survey_id else None)
+    return n
+
+
+def _value_at(counts: Sequence[int], k: int) -> int:
+    """Valor likert en la posición k (0-based) de las respuestas ordenadas."""
+    acc = 0
+    for value, c in enumerate(counts, start=1):
+        acc += c
+        if k < acc:
+            return value
+    return len(counts)
+
+
+def likert_stats(row: Mapping[str, Any], sample: bool = False) -> dict:
+    """
+    mean / median / stddev / min / max a partir de una fila del cubo (o de una
+    suma de filas con las columnas de CUBE_SUMS). Mismos resultados que AVG,
+    PERCENTILE_CONT(0.5), STDDEV_POP (o STDDEV_SAMP con sample=True), MIN y
+    MAX sobre las respuestas.
+    """
+    n = int(row["n"] or 0)
+    if n == 0:
+        return {"mean": None, "median": None, "stddev": None, "min": None, "max": None}
+    s, ss = int(row["likert_sum"] or 0), int(row["likert_sumsq"] or 0)
+    counts = [int(row[f"c{i}"] or 0) for i in range(1, 6)]
+
+    spread = max(n * ss - s * s, 0)   # n²·var_pop, exacto en enteros
+    if sample:
+        stddev = math.sqrt(spread / (n * (n - 1))) if n > 1 else None
+    else:
+        stddev = math.sqrt(spread) / n
+
+    pos = 0.5 * (n - 1)
+    lo, hi = _value_at(counts, math.floor(pos)), _value_at(counts, math.ceil(pos))
+    present = [v for v, c in enumerate(counts, start=1) if c]
+    return {
+        "mean": s / n,
+        "median": lo + (hi - lo) * (pos - math.floor(pos)),
+        "stddev": stddev,
+        "min": present[0] if present else None,
+        "max": present[-1] if present else None,
+    }
@@ -0,0 +1,43 @@
+# app/services/scoring.py
+from __future__ import annotations
+
+from typing import Any, Hashable, Iterable, Mapping, Optional
+
+
+def compute_scores(
+    values: Mapping[Hashable, int],
+    pesos: Mapping[Hashable, Any],
+    section_of: Mapping[Hashable, Hashable],
+    sections: Iterable[tuple[Hashable, str]],
+) -> tuple[Optional[Any], list[dict]]:
+    """
+    Puntaje ponderado total y por sección en una sola pasada sobre las preguntas likert.
+
+    - values: question_id -> valor likert (1..5)
+    - pesos: question_id -> peso (solo preguntas likert)
+    - section_of: question_id -> section_id
+    - sections: [(section_id, titulo)] en el orden en que se reportan
+
+    Devuelve (total, [{"section_id", "titulo", "score"}]). Las secciones sin
+    preguntas likert se omiten.
+    """
+    sum_w = 0
+    sum_wx = 0
+    sec_w: dict[Hashable, Any] = {}
+    sec_wx: dict[Hashable, Any] = {}
+
+    for qid, w in pesos.items():
+        wx = values.get(qid, 0) * w
+        sum_w += w
+        sum_wx += wx
+        sid = section_of.get(qid)
+        sec_w[sid] = sec_w.get(sid, 0) + w
+        sec_wx[sid] = sec_wx.get(sid, 0) + wx
+
+    total = round(sum_wx / sum_w, 3) if sum_w else None
+    secciones = [
+        {"section_id": sid, "titulo": titulo, "score": round(sec_wx[sid] / sec_w[sid], 3)}
+        for sid, titulo in sections
+        if sec_w.get(sid)
+    ]
+    return total, secciones
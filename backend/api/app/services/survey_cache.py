@@ -0,0 +1,145 @@
+# app/services/survey_cache.py
+"""
+Caché en proceso de la definición de una encuesta (preguntas, secciones, pesos).
+
+La definición solo cambia cuando un admin edita pesos o se reimportan preguntas,
+así que submit, /surveys/{id}/questions y los reportes la leen de aquí en vez de
+recargar Question/SurveySection en cada request.
+
+Cada encuesta tiene un número de versión en memoria; invalidate_survey_definition()
+lo incrementa y la siguiente lectura recarga. Como cada worker tiene su propia
+caché, SURVEY_CACHE_TTL_SECONDS acota cuánto puede durar una definición vieja en
+los demás workers (o tras un import por scripts/import_csv.py).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.encuesta import Question, SurveySection
+from app.services.etag import make_etag
+
+
+@dataclass(frozen=True)
+class SurveyDefinition:
+    survey_id: UUID
+    version: int
+    loaded_at: float
+    likert_ids: frozenset
+    likert_order: tuple                 # ids likert por (orden, id): posiciones de attempt_likert.valores
+    q16_id: Optional[Any]
+    pesos: Mapping[Any, Any]            # question_id -> peso (solo likert)
+    section_of: Mapping[Any, Any]       # question_id -> section_id (solo likert)
+    sections: tuple[tuple[Any, str], ...]  # (section_id, titulo) por orden
+    questions: tuple[Mapping[str, Any], ...]  # filas de /surveys/{id}/questions, por orden
+    etag: str                           # hash del contenido de `questions` (igual en todos los workers)
+
+    @property
+    def codes(self) -> list[str]:
+        """Códigos de preguntas no 'texto' en orden (columnas de matriz/heatmap)."""
+        return [
+            q["codigo"] for q in self.questions
+            if q["tipo"] is not None and q["tipo"] != "texto"
+        ]
+
+
+_lock = threading.Lock()
+_cache: dict[UUID, SurveyDefinition] = {}
+_versions: dict[UUID, int] = {}  # survey_id -> reloj en su última invalidación
+_global_version = 0              # reloj en la última invalidación total
+_clock = 0
+
+
+def _current_version(key: UUID) -> int:
+    return max(_versions.get(key, 0), _global_version)
+
+
+def _key(survey_id) -> UUID:
+    return survey_id if isinstance(survey_id, UUID) else UUID(str(survey_id))
+
+
+def _load(db: Session, survey_id: UUID, version: int) -> SurveyDefinition:
+    qs = (
+        db.query(Question)
+        .filter(Question.survey_id == survey_id)
+        .order_by(Question.orden.asc())
+        .all()
+    )
+    secs = (
+        db.query(SurveySection)
+        .filter(SurveySection.survey_id == survey_id)
+        .order_by(SurveySection.orden.asc())
+        .all()
+    )
+    titulos = {s.id: s.titulo for s in secs}
+    likert_qs = [q for q in qs if (q.tipo or "").lower() == "likert"]
+    q16 = next((q for q in qs if q.codigo == "Q16"), None)
+    questions = tuple(
+        MappingProxyType({
+            "id": q.id,
+            "codigo": q.codigo,
+            "enunciado": q.enunciado,
+            "orden": q.orden,
+            "tipo": q.tipo,
+            "peso": q.peso,
+            "section": titulos[q.section_id],
+        })
+        for q in qs
+        if q.section_id in titulos
+    )
+
+    return SurveyDefinition(
+        survey_id=survey_id,
+        version=version,
+        loaded_at=time.monotonic(),
+        likert_ids=frozenset(q.id for q in likert_qs),
+        likert_order=tuple(q.id for q in sorted(likert_qs, key=lambda q: (q.orden, str(q.id)))),
+        q16_id=q16.id if q16 else None,
+        pesos=MappingProxyType({q.id: (q.peso or 1) for q in likert_qs}),
+        section_of=MappingProxyType({q.id: q.section_id for q in likert_qs}),
+        sections=tuple((s.id, s.titulo) for s in secs),
+        questions=questions,
+        etag=make_etag("questions", survey_id, [dict(q) for q in questions]),
+    )
+
+
+def get_survey_definition(db: Session, survey_id) -> SurveyDefinition:
+    """Devuelve la definición cacheada; recarga si cambió la versión o venció el TTL."""
+    key = _key(survey_id)
+    with _lock:
+        cached = _cache.get(key)
+        version = _current_version(key)
+    if (
+        cached is not None
+        and cached.version == version
+        and time.monotonic() - cached.loaded_at < settings.SURVEY_CACHE_TTL_SECONDS
+    ):
+        return cached
+
+    loaded = _load(db, key, version)
+    with _lock:
+        # Si alguien invalidó mientras cargábamos, no guardamos una versión vieja
+        if _current_version(key) == version:
+            _cache[key] = loaded
+    return loaded
+
+
+def invalidate_survey_definition(survey_id=None) -> None:
+    """Invalida una encuesta (o todas si survey_id es None)."""
+    global _clock, _global_version
+    with _lock:
+        _clock += 1
+        if survey_id is None:
+            _global_version = _clock
+            _cache.clear()
+            return
+        key = _key(survey_id)
+        _versions[key] = _clock
+        _cache.pop(key, None)
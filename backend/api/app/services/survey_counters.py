@@ -0,0 +1,471 @@
+# app/services/survey_counters.py
+"""
+Contadores de cabecera del dashboard (tablas survey_counters / global_counters).
+
+`summary` contaba attempts por estado y COUNT(DISTINCT teacher_id) en cada
+refresco y `stats/overview` hacía count() sobre users, surveys y los usuarios
+distintos con algún envío. Aquí esos números se guardan ya calculados:
+
+  - por encuesta: enviados, en_progreso, expirados, docentes que recibieron al
+    menos un envío (responded_teachers) y usuarios que enviaron al menos uno
+    (responding_users);
+  - globales: usuarios_activos, encuestas, encuestas_activas y
+    usuarios_respondieron.
+
+Cada transición de attempt (crear, enviar, expirar, borrar) llama a
+record_transitions() en su misma transacción. Los conteos distintos se apoyan
+en survey_counter_teachers / survey_counter_users: el INSERT ... ON CONFLICT DO
+NOTHING del envío dice si el docente o usuario es nuevo en la encuesta. Las
+transiciones que entran o salen de 'enviado' suben además la data_version de
+la encuesta (services/survey_versions), que invalida los reportes cacheados;
+crear, expirar o barrer attempts no la tocan (los reportes solo miran envíos
+y summary lee en_progreso en vivo).
+
+El contador `en_progreso` incluye los attempts vencidos que el barrido de
+services/attempt_expiry aún no pasó a 'expirado'; get_survey_counters() los
+descuenta al leer (como cuando los GET expiraban en línea) con un COUNT sobre
+el índice parcial de vencimiento.
+
+Usuarios y encuestas se crean por import o por script, no por transiciones de
+attempt: los globales de usuarios/encuestas los refresca refresh_global_counters()
+(import de usuarios y reconciliación).
+
+La reconciliación (CountersReconciler en proceso, scripts/reconcile_counters.py
+por CLI) recalcula cada encuesta desde attempts y corrige la deriva. Se
+serializa por encuesta con un advisory lock de transacción que record_transitions()
+también toma: los envíos de esa encuesta esperan al commit en vez de perderse,
+los de otras encuestas no se bloquean. En proceso corre en un solo worker por
+intervalo: cada worker intenta reclamar la corrida en global_counters
+(counters_reconciled_at) y solo el que lo logra reconcilia.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.survey_counter import SurveyCounter
+from app.services.survey_versions import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+# estado del attempt -> columna de survey_counters ('fallido' no se muestra en el dashboard)
+_COLUMN_OF = {"enviado": "enviados", "en_progreso": "en_progreso", "expirado": "expirados"}
+_COUNTERS = ("enviados", "en_progreso", "expirados", "responded_teachers", "responding_users")
+GLOBAL_NAMES = ("usuarios_activos", "encuestas", "encuestas_activas", "usuarios_respondieron")
+
+_NEW_TEACHERS_SQL = text("""
+    WITH ins AS (
+      INSERT INTO public.survey_counter_teachers (survey_id, teacher_id)
+      SELECT DISTINCT x.s, x.t
+      FROM unnest(CAST(:sids AS uuid[]), CAST(:tids AS uuid[])) AS x(s, t)
+      ORDER BY 1, 2
+      ON CONFLICT DO NOTHING
+      RETURNING survey_id
+    )
+    SELECT survey_id, COUNT(*) AS n FROM ins GROUP BY survey_id
+""")
+
+# first_global: el usuario no tenía envíos en ninguna encuesta (la subconsulta
+# no ve las filas que inserta la misma sentencia)
+_NEW_USERS_SQL = text("""
+    WITH ins AS (
+      INSERT INTO public.survey_counter_users (survey_id, user_id)
+      SELECT DISTINCT x.s, x.u
+      FROM unnest(CAST(:sids AS uuid[]), CAST(:uids AS uuid[])) AS x(s, u)
+      ORDER BY 1, 2
+      ON CONFLICT DO NOTHING
+      RETURNING survey_id, user_id
+    )
+    SELECT ins.survey_id, ins.user_id,
+           NOT EXISTS (
+             SELECT 1 FROM public.survey_counter_users o WHERE o.user_id = ins.user_id
+           ) AS first_global
+    FROM ins
+""")
+
+_BUMP_GLOBAL_SQL = text("""
+    INSERT INTO public.global_counters (name, value, updated_at)
+    VALUES (:name, :n, now())
+    ON CONFLICT (name) DO UPDATE
+      SET value = global_counters.value + EXCLUDED.value, updated_at = now()
+""")
+
+# Conteos exactos desde attempts (fallback de lectura y reconciliación)
+_COMPUTE_SQL = text("""
+    SELECT s.id AS survey_id,
+           COUNT(a.id) FILTER (WHERE a.estado = 'enviado')                 AS enviados,
+           COUNT(a.id) FILTER (WHERE a.estado = 'en_progreso')             AS en_progreso,
+           COUNT(a.id) FILTER (WHERE a.estado = 'expirado')                AS expirados,
+           COUNT(DISTINCT a.teacher_id) FILTER (WHERE a.estado = 'enviado') AS responded_teachers,
+           COUNT(DISTINCT a.user_id) FILTER (WHERE a.estado = 'enviado')    AS responding_users
+    FROM public.surveys s
+    LEFT JOIN public.attempts a ON a.survey_id = s.id
+    WHERE s.id = :sid
+    GROUP BY s.id
+""")
+
+_READ_SQL = text("""
+    SELECT survey_id, enviados, en_progreso, expirados, responded_teachers, responding_users
+    FROM public.survey_counters
+    WHERE survey_id = :sid
+""")
+
+# Serializa transiciones y reconciliación de una encuesta (hasta el commit).
+# La primera clave separa estos locks de otros advisory locks de la BD.
+_LOCK_NAMESPACE = 22
+_LOCK_SURVEY_SQL = text("SELECT pg_advisory_xact_lock(:ns, hashtext(:sid))")
+
+# Attempts vencidos que el barrido aún no pasó a 'expirado' (índice parcial de 0007)
+_STALE_SQL = text("""
+    SELECT COUNT(*) FROM public.attempts
+    WHERE survey_id = :sid AND estado = 'en_progreso' AND expires_at < now()
+""")
+
+_RESYNC_MEMBERS_SQL = (
+    text("DELETE FROM public.survey_counter_teachers WHERE survey_id = :sid"),
+    text("DELETE FROM public.survey_counter_users WHERE survey_id = :sid"),
+    text("""
+        INSERT INTO public.survey_counter_teachers (survey_id, teacher_id)
+        SELECT DISTINCT a.survey_id, a.teacher_id FROM public.attempts a
+        WHERE a.survey_id = :sid AND a.estado = 'enviado'
+    """),
+    text("""
+        INSERT INTO public.survey_counter_users (survey_id, user_id)
+        SELECT DISTINCT a.survey_id, a.user_id FROM public.attempts a
+        WHERE a.survey_id = :sid AND a.estado = 'enviado'
+    """),
+)
+
+# Devuelve fila solo si el contador guardado difería (deriva corregida)
+_RECONCILE_SQL = text("""
+    INSERT INTO public.survey_counters
+      (survey_id, enviados, en_progreso, expirados, responded_teachers, responding_users, updated_at)
+    SELECT s.id,
+           COUNT(a.id) FILTER (WHERE a.estado = 'enviado'),
+           COUNT(a.id) FILTER (WHERE a.estado = 'en_progreso'),
+           COUNT(a.id) FILTER (WHERE a.estado = 'expirado'),
+           COUNT(DISTINCT a.teacher_id) FILTER (WHERE a.estado = 'enviado'),
+           COUNT(DISTINCT a.user_id) FILTER (WHERE a.estado = 'enviado'),
+           now()
+    FROM public.surveys s
+    LEFT JOIN public.attempts a ON a.survey_id = s.id
+    WHERE s.id = :sid
+    GROUP BY s.id
+    ON CONFLICT (survey_id) DO UPDATE
+      SET enviados = EXCLUDED.enviados,
+          en_progreso = EXCLUDED.en_progreso,
+          expirados = EXCLUDED.expirados,
+          responded_teachers = EXCLUDED.responded_teachers,
+          responding_users = EXCLUDED.responding_users,
+          updated_at = EXCLUDED.updated_at
+      WHERE (survey_counters.enviados, survey_counters.en_progreso, survey_counters.expirados,
+             survey_counters.responded_teachers, survey_counters.responding_users)
+            IS DISTINCT FROM
+            (EXCLUDED.enviados, EXCLUDED.en_progreso, EXCLUDED.expirados,
+             EXCLUDED.responded_teachers, EXCLUDED.responding_users)
+    RETURNING survey_id
+""")
+
+_GLOBAL_VALUES_SQL = """
+    SELECT 'usuarios_activos' AS name, (SELECT COUNT(*) FROM public.users WHERE estado = 'activo') AS value
+    UNION ALL SELECT 'encuestas', (SELECT COUNT(*) FROM public.surveys)
+    UNION ALL SELECT 'encuestas_activas', (SELECT COUNT(*) FROM public.surveys WHERE estado = 'activa')
+    UNION ALL SELECT 'usuarios_respondieron', (SELECT COUNT(DISTINCT user_id) FROM public.survey_counter_users)
+"""
+
+# Devuelve fila solo si la última corrida reclamada tiene al menos :interval segundos
+_CLAIM_RUN_SQL = text("""
+    INSERT INTO public.global_counters (name, value, updated_at)
+    VALUES ('counters_reconciled_at', :now, now())
+    ON CONFLICT (name) DO UPDATE
+      SET value = EXCLUDED.value, updated_at = now()
+      WHERE global_counters.value <= EXCLUDED.value - :interval
+    RETURNING name
+""")
+
+_REFRESH_GLOBALS_SQL = text(f"""
+    INSERT INTO public.global_counters (name, value, updated_at)
+    SELECT g.name, g.value, now() FROM ({_GLOBAL_VALUES_SQL}) g
+    ON CONFLICT (name) DO UPDATE
+      SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at
+      WHERE global_counters.value IS DISTINCT FROM EXCLUDED.value
+    RETURNING name
+""")
+
+
+@dataclass(frozen=True)
+class SurveyCounters:
+    survey_id: UUID
+    enviados: int
+    en_progreso: int
+    expirados: int
+    responded_teachers: int
+    responding_users: int
+
+
+def _from_row(row) -> SurveyCounters:
+    return SurveyCounters(
+        survey_id=row.survey_id,
+        **{k: int(getattr(row, k) or 0) for k in _COUNTERS},
+    )
+
+
+def lock_surveys(db: Session, survey_ids: Iterable[UUID]) -> None:
+    """Advisory lock de transacción por encuesta, en orden (sin deadlocks entre ellas)."""
+    for sid in sorted({str(s) for s in survey_ids}):
+        db.execute(_LOCK_SURVEY_SQL, {"ns": _LOCK_NAMESPACE, "sid": sid})
+
+
+def record_transitions(
+    db: Session,
+    transitions: Iterable[tuple[UUID, Optional[str], Optional[str]]],
+    sent: Iterable[tuple[UUID, UUID, UUID]] = (),
+) -> None:
+    """
+    Aplica a survey_counters las transiciones (survey_id, estado_antes,
+    estado_después) de attempts; None = creado / borrado. `sent` son los
+    (survey_id, teacher_id, user_id) de los attempts recién enviados, para
+    los conteos de docentes y usuarios distintos. Un upsert multi-fila,
+    ordenado por encuesta. NO hace commit.
+    """
+    transitions = [(sid, before, after) for sid, before, after in transitions if before != after]
+    sent = list(sent)
+    if not transitions and not sent:
+        return
+    lock_surveys(db, [sid for sid, _, _ in transitions] + [sid for sid, _, _ in sent])
+
+    deltas: dict[UUID, dict[str, int]] = {}
+
+    def delta(sid: UUID) -> dict[str, int]:
+        return deltas.setdefault(sid, dict.fromkeys(_COUNTERS, 0))
+
+    for sid, before, after in transitions:
+        if before in _COLUMN_OF:
+            delta(sid)[_COLUMN_OF[before]] -= 1
+        if after in _COLUMN_OF:
+            delta(sid)[_COLUMN_OF[after]] += 1
+
+    if sent:
+        sids = [str(s) for s, _, _ in sent]
+        for r in db.execute(_NEW_TEACHERS_SQL, {"sids": sids, "tids": [str(t) for _, t, _ in sent]}):
+            delta(r.survey_id)["responded_teachers"] += int(r.n)
+        first_global: set[UUID] = set()
+        for r in db.execute(_NEW_USERS_SQL, {"sids": sids, "uids": [str(u) for _, _, u in sent]}):
+            delta(r.survey_id)["responding_users"] += 1
+            if r.first_global:
+                first_global.add(r.user_id)
+
+    rows = [
+        {"survey_id": sid, **d}
+        for sid, d in sorted(deltas.items(), key=lambda kv: str(kv[0]))
+        if any(d.values())
+    ]
+    if rows:
+        stmt = pg_insert(SurveyCounter).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[SurveyCounter.survey_id],
+            set_={
+                **{k: getattr(SurveyCounter, k) + getattr(stmt.excluded, k) for k in _COUNTERS},
+                "updated_at": text("now()"),
+            },
+        ))
+        # Solo los envíos cambian los reportes cacheados (services/report_cache)
+        changed = {sid for sid, before, after in transitions if "enviado" in (before, after)}
+        bump_data_version(db, changed | {sid for sid, _, _ in sent})
+    if sent and first_global:
+        db.execute(_BUMP_GLOBAL_SQL, {"name": "usuarios_respondieron", "n": len(first_global)})
+
+
+def get_survey_counters(db: Session, survey_id: UUID) -> SurveyCounters:
+    """
+    Contadores de la encuesta (una lectura por PK). Si la encuesta aún no
+    tiene fila (creada después de la última reconciliación y sin attempts),
+    los calcula desde attempts sin escribir. Los attempts vencidos sin barrer
+    cuentan como expirados.
+    """
+    row = db.execute(_READ_SQL, {"sid": str(survey_id)}).first()
+    if row is None:
+        row = db.execute(_COMPUTE_SQL, {"sid": str(survey_id)}).first()
+    if row is None:
+        return SurveyCounters(survey_id, 0, 0, 0, 0, 0)
+    counters = _from_row(row)
+    stale = min(int(db.execute(_STALE_SQL, {"sid": str(survey_id)}).scalar() or 0), counters.en_progreso)
+    if not stale:
+        return counters
+    return replace(counters, en_progreso=counters.en_progreso - stale, expirados=counters.expirados + stale)
+
+
+def get_global_counters(db: Session) -> dict[str, int]:
+    """name -> valor de global_counters; los que falten se calculan al vuelo."""
+    values = {
+        r.name: int(r.value or 0)
+        for r in db.execute(
+            text("SELECT name, value FROM public.global_counters WHERE name = ANY(:names)"),
+            {"names": list(GLOBAL_NAMES)},
+        )
+    }
+    if any(n not in values for n in GLOBAL_NAMES):
+        values.update({r.name: int(r.value or 0) for r in db.execute(text(_GLOBAL_VALUES_SQL))})
+    return values
+
+
+def refresh_global_counters(db: Session) -> list[str]:
+    """Recalcula los contadores globales. Devuelve los que cambiaron. NO hace commit."""
+    # usuarios_respondieron se suma en el submit: el lock de tabla evita pisar un
+    # incremento en vuelo. Es un COUNT breve y corre una vez por reconciliación.
+    db.execute(text(
+        "LOCK TABLE public.survey_counter_users, public.global_counters IN EXCLUSIVE MODE"
+    ))
+    return [r.name for r in db.execute(_REFRESH_GLOBALS_SQL)]
+
+
+def reconcile_survey_counters(db: Session, survey_id: UUID) -> bool:
+    """
+    Recalcula desde attempts los contadores y pertenencias de una encuesta.
+    Devuelve True si había deriva. NO hace commit (el lock dura hasta él).
+    """
+    params = {"sid": str(survey_id)}
+    lock_surveys(db, [survey_id])
+    for stmt in _RESYNC_MEMBERS_SQL:
+        db.execute(stmt, params)
+    drifted = db.execute(_RECONCILE_SQL, params).first() is not None
+    if drifted:
+        bump_data_version(db, [survey_id])
+    return drifted
+
+
+@dataclass
+class CountersMetrics:
+    runs: int = 0
+    skipped: int = 0
+    surveys_checked: int = 0
+    corrected_total: int = 0
+    errors: int = 0
+    last_run_at: Optional[datetime] = None
+    last_corrected: int = 0
+    last_duration_ms: float = 0.0
+    last_error: Optional[str] = None
+
+    def snapshot(self) -> dict:
+        with _metrics_lock:
+            return asdict(self)
+
+
+_metrics_lock = threading.Lock()
+counters_metrics = CountersMetrics()
+
+
+def reconcile_counters(
+    survey_id: Optional[UUID] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> int:
+    """
+    Reconcilia una encuesta (o todas, una transacción por encuesta para no
+    retener los locks) y luego los globales. Devuelve cuántas encuestas
+    tenían deriva y actualiza counters_metrics.
+    """
+    started = time.perf_counter()
+    corrected = 0
+    checked = 0
+    try:
+        if survey_id is not None:
+            survey_ids = [survey_id]
+        else:
+            with session_factory() as db:
+                survey_ids = list(db.execute(text("SELECT id FROM public.surveys ORDER BY id")).scalars())
+        for sid in survey_ids:
+            with session_factory() as db:
+                if reconcile_survey_counters(db, sid):
+                    corrected += 1
+                    logger.warning(f"[COUNTERS] Deriva corregida en encuesta {sid}")
+                db.commit()
+            checked += 1
+        with session_factory() as db:
+            changed = refresh_global_counters(db)
+            db.commit()
+        if changed:
+            logger.info(f"[COUNTERS] Globales actualizados: {', '.join(changed)}")
+    except Exception as e:
+        with _metrics_lock:
+            counters_metrics.errors += 1
+            # Solo la clase: el mensaje puede traer SQL o datos (se expone en /healthz/jobs)
+            counters_metrics.last_error = type(e).__name__
+        raise
+    finally:
+        with _metrics_lock:
+            counters_metrics.runs += 1
+            counters_metrics.surveys_checked += checked
+            counters_metrics.corrected_total += corrected
+            counters_metrics.last_corrected = corrected
+            counters_metrics.last_run_at = datetime.now(timezone.utc)
+            counters_metrics.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    return corrected
+
+
+def claim_reconcile_run(
+    interval_seconds: int,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> bool:
+    """
+    Reclama la corrida periódica: True solo para el primer worker que llega
+    después de `interval_seconds` desde la última. Así la reconciliación en
+    proceso corre una vez por intervalo y no una por worker.
+    """
+    with session_factory() as db:
+        claimed = db.execute(
+            _CLAIM_RUN_SQL, {"now": int(time.time()), "interval": interval_seconds}
+        ).first() is not None
+        db.commit()
+    if not claimed:
+        with _metrics_lock:
+            counters_metrics.skipped += 1
+    return claimed
+
+
+def _reconcile_if_claimed(interval_seconds: int) -> None:
+    if claim_reconcile_run(interval_seconds):
+        reconcile_counters()
+
+
+class CountersReconciler:
+    """
+    Tarea asyncio que cada `interval_seconds` reclama la corrida y, si le
+    toca, ejecuta reconcile_counters.
+    """
+
+    def __init__(self, interval_seconds: int):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await asyncio.to_thread(_reconcile_if_claimed, self.interval_seconds)
+            except Exception as e:
+                logger.error(f"[COUNTERS] Reconciliación fallida: {e}")
@@ -0,0 +1,58 @@
+# app/services/survey_versions.py
+"""
+Versiones por encuesta (tabla survey_versions, migraciones 0010 y 0017).
+
+  - assignments_version: se incrementa cuando cambia el conjunto de docentes
+    visibles en la cola de una encuesta (asignaciones, import de docentes).
+    Junto con el fingerprint de attempts del usuario forma el ETag de /queue
+    (ver services/queue.queue_etag).
+  - data_version: se incrementa con todo lo que cambia los reportes de la
+    encuesta (envíos y attempts enviados borrados, pesos, asignaciones,
+    reconstrucción del cubo o reconciliación de contadores). Es parte de la clave de la
+    caché de reportes (ver services/report_cache).
+"""
+from __future__ import annotations
+
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+def bump_assignments_version(db: Session, survey_id: Optional[UUID] = None) -> None:
+    """
+    +1 a la versión de asignaciones (y a la de datos) de una encuesta, o de
+    todas si survey_id es None. NO hace commit.
+    """
+    db.execute(text("""
+        INSERT INTO public.survey_versions (survey_id, assignments_version, data_version, updated_at)
+        SELECT s.id, 1, 1, now()
+        FROM public.surveys s
+        WHERE CAST(:sid AS uuid) IS NULL OR s.id = CAST(:sid AS uuid)
+        ORDER BY s.id
+        ON CONFLICT (survey_id) DO UPDATE
+          SET assignments_version = public.survey_versions.assignments_version + 1,
+              data_version = public.survey_versions.data_version + 1,
+              updated_at = now()
+    """), {"sid": str(survey_id) if survey_id else None})
+
+
+def bump_data_version(db: Session, survey_ids: Optional[Iterable[UUID]] = None) -> None:
+    """
+    +1 a la versión de datos de esas encuestas (o de todas si survey_ids es
+    None). Filas en orden de survey_id, igual que los contadores. NO hace commit.
+    """
+    sids = None if survey_ids is None else sorted({str(s) for s in survey_ids})
+    if sids == []:
+        return
+    db.execute(text("""
+        INSERT INTO public.survey_versions (survey_id, data_version, updated_at)
+        SELECT s.id, 1, now()
+        FROM public.surveys s
+        WHERE CAST(:sids AS uuid[]) IS NULL OR s.id = ANY(CAST(:sids AS uuid[]))
+        ORDER BY s.id
+        ON CONFLICT (survey_id) DO UPDATE
+          SET data_version = public.survey_versions.data_version + 1,
+              updated_at = now()
+    """), {"sids": sids})
@@ -0,0 +1,28 @@
+# app/services/surveys.py
+"""Consultas de encuestas compartidas por los catálogos y /me/bootstrap."""
+from __future__ import annotations
+
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+_ACTIVE_SQL = text("""
+    SELECT id, codigo, nombre, estado, fecha_inicio, fecha_fin
+    FROM public.surveys
+    WHERE estado = 'activa'
+      AND (
+        :hoy IS NULL
+        OR (
+          (fecha_inicio IS NULL OR fecha_inicio <= :hoy)
+          AND (fecha_fin IS NULL OR fecha_fin >= :hoy)
+        )
+      )
+    ORDER BY fecha_inicio NULLS FIRST, nombre
+""")
+
+
+def active_surveys(db: Session, hoy: Optional[date] = None):
+    """Encuestas activas (vigentes en `hoy` si se indica), como mappings."""
+    return db.execute(_ACTIVE_SQL, {"hoy": hoy}).mappings().all()
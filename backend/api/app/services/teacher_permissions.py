@@ -0,0 +1,94 @@
+# app/services/teacher_permissions.py
+"""
+Permisos usuario -> docente por encuesta (tabla user_teacher_permissions).
+
+Regla: si el usuario NO tiene filas de permiso en la encuesta, ve todos los
+docentes asignados (comportamiento previo); si tiene al menos una, solo ve y
+puede crear attempts para esos docentes (siempre dentro de las asignaciones).
+
+allowed_teacher_ids() cachea el conjunto por (encuesta, usuario) en el worker
+durante TEACHER_PERMISSIONS_CACHE_TTL_SECONDS; la cola, /surveys/{id}/teachers
+y create_attempts filtran con ese conjunto (`t.id = ANY(:allowed)`) en vez de
+recorrer todas las asignaciones. El import de permisos invalida la caché local;
+los demás workers ven el cambio al vencer el TTL.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.docente import UserTeacherPermission
+
+MAX_ENTRIES = 20000
+
+_lock = threading.Lock()
+# (survey_id, user_id) -> (loaded_at, frozenset | None)
+_cache: "OrderedDict[tuple[UUID, UUID], tuple[float, Optional[frozenset]]]" = OrderedDict()
+
+
+def _uuid(v) -> UUID:
+    return v if isinstance(v, UUID) else UUID(str(v))
+
+
+def _load(db: Session, survey_id: UUID, user_id: UUID) -> Optional[frozenset]:
+    ids = frozenset(
+        tid for (tid,) in (
+            db.query(UserTeacherPermission.teacher_id)
+            .filter(
+                UserTeacherPermission.survey_id == survey_id,
+                UserTeacherPermission.user_id == user_id,
+            )
+            .all()
+        )
+    )
+    return ids or None
+
+
+def allowed_teacher_ids(db: Session, survey_id, user_id) -> Optional[frozenset]:
+    """
+    Docentes permitidos al usuario en la encuesta, o None si no tiene
+    restricción (ve todas las asignaciones).
+    """
+    key = (_uuid(survey_id), _uuid(user_id))
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and now - hit[0] < settings.TEACHER_PERMISSIONS_CACHE_TTL_SECONDS:
+            _cache.move_to_end(key)
+            return hit[1]
+
+    allowed = _load(db, *key)
+    with _lock:
+        _cache[key] = (now, allowed)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return allowed
+
+
+def is_teacher_allowed(db: Session, survey_id, user_id, teacher_id) -> bool:
+    """True si el usuario puede crear attempts para el docente (validación de create_attempts)."""
+    allowed = allowed_teacher_ids(db, survey_id, user_id)
+    return allowed is None or _uuid(teacher_id) in allowed
+
+
+def allowed_param(allowed: Optional[frozenset]) -> Optional[list[str]]:
+    """Valor para el parámetro `CAST(:allowed AS uuid[])` de las consultas (None = sin filtro)."""
+    return None if allowed is None else [str(t) for t in allowed]
+
+
+def invalidate_teacher_permissions(survey_ids: Optional[Iterable] = None) -> None:
+    """Invalida la caché local de esas encuestas (o toda si survey_ids es None)."""
+    with _lock:
+        if survey_ids is None:
+            _cache.clear()
+            return
+        sids = {_uuid(s) for s in survey_ids}
+        for key in [k for k in _cache if k[0] in sids]:
+            del _cache[key]
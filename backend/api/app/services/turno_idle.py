@@ -0,0 +1,181 @@
+# app/services/turno_idle.py
+"""
+Cierre automático de turnos 'open' abandonados.
+
+Hasta ahora un turno solo se cerraba tras un submit sin más attempts vivos
+(_close_latest_open_turno_if_idle) o por /sessions/close y /sessions/turno/close;
+una pestaña abandonada lo dejaba abierto para siempre. Aquí un barrido periódico
+cierra los turnos abiertos hace más de TURNO_IDLE_MINUTES cuyo usuario no tiene
+attempts 'en_progreso' vigentes ni actividad en attempts dentro de esa ventana.
+
+Mismo esquema que services/attempt_expiry: lotes acotados con FOR UPDATE SKIP
+LOCKED (un commit por lote), en proceso (TurnoIdleCloser, arrancado desde
+main.py) o por CLI (scripts/close_idle_turnos.py). Apoyado en el índice parcial
+ix_turnos_user_open (migración 0013). Las métricas del proceso quedan en
+turno_idle_metrics (ver /healthz/jobs).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.services.turno_state import invalidate_turno_state
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+_CLOSE_IDLE_SQL = text("""
+    WITH idle AS (
+      SELECT t.id
+      FROM public.turnos t
+      WHERE t.status = 'open'
+        AND t.opened_at <= :cutoff
+        AND NOT EXISTS (
+          SELECT 1 FROM public.attempts a
+          WHERE a.user_id = t.user_id
+            AND (
+              (a.estado = 'en_progreso' AND (a.expires_at IS NULL OR a.expires_at > :now))
+              OR a.actualizado_en > :cutoff
+            )
+        )
+      ORDER BY t.opened_at ASC
+      LIMIT :batch_size
+      FOR UPDATE OF t SKIP LOCKED
+    )
+    UPDATE public.turnos t
+    SET status = 'closed', closed_at = now()
+    FROM idle
+    WHERE t.id = idle.id AND t.status = 'open'
+    RETURNING t.id, t.user_id
+""")
+
+
+@dataclass
+class TurnoIdleMetrics:
+    runs: int = 0
+    batches: int = 0
+    closed_total: int = 0
+    errors: int = 0
+    last_run_at: Optional[datetime] = None
+    last_closed: int = 0
+    last_duration_ms: float = 0.0
+    last_error: Optional[str] = None
+
+    def snapshot(self) -> dict:
+        with _metrics_lock:
+            return asdict(self)
+
+
+_metrics_lock = threading.Lock()
+turno_idle_metrics = TurnoIdleMetrics()
+
+
+def close_idle_batch(
+    db: Session,
+    idle_minutes: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    now: Optional[datetime] = None,
+) -> list[tuple]:
+    """
+    Cierra hasta `batch_size` turnos ociosos. Devuelve [(turno_id, user_id)].
+    SKIP LOCKED: no espera por turnos que otra request o worker tiene tomados.
+    NO hace commit.
+    """
+    now = now or datetime.now(timezone.utc)
+    rows = db.execute(_CLOSE_IDLE_SQL, {
+        "now": now,
+        "cutoff": now - timedelta(minutes=idle_minutes),
+        "batch_size": batch_size,
+    }).all()
+    return [(r.id, r.user_id) for r in rows]
+
+
+def sweep_idle_turnos(
+    idle_minutes: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batches: int = 0,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> int:
+    """
+    Barre en lotes (un commit por lote) hasta que no queden ociosos o se
+    alcance `max_batches` (0 = sin tope). Devuelve el total cerrado y
+    actualiza turno_idle_metrics.
+    """
+    started = time.perf_counter()
+    total = 0
+    batches = 0
+    try:
+        while True:
+            with session_factory() as db:
+                closed = close_idle_batch(db, idle_minutes, batch_size=batch_size)
+                db.commit()
+            # Solo limpia la foto de este worker; los demás rechazan el turno
+            # igual porque require_turno_open lo confirma en BD (turno_state)
+            for _, user_id in closed:
+                invalidate_turno_state(user_id)
+            total += len(closed)
+            batches += 1
+            if len(closed) < batch_size or (max_batches and batches >= max_batches):
+                break
+    except Exception as e:
+        with _metrics_lock:
+            turno_idle_metrics.errors += 1
+            # Solo la clase: el texto de un error de SQLAlchemy trae SQL y parámetros
+            turno_idle_metrics.last_error = type(e).__name__
+        raise
+    finally:
+        with _metrics_lock:
+            turno_idle_metrics.runs += 1
+            turno_idle_metrics.batches += batches
+            turno_idle_metrics.closed_total += total
+            turno_idle_metrics.last_closed = total
+            turno_idle_metrics.last_run_at = datetime.now(timezone.utc)
+            turno_idle_metrics.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    return total
+
+
+class TurnoIdleCloser:
+    """Tarea asyncio que ejecuta sweep_idle_turnos cada `interval_seconds`."""
+
+    def __init__(self, interval_seconds: int, idle_minutes: int, batch_size: int = DEFAULT_BATCH_SIZE, max_batches: int = 0):
+        self.interval_seconds = interval_seconds
+        self.idle_minutes = idle_minutes
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                n = await asyncio.to_thread(
+                    sweep_idle_turnos, self.idle_minutes, self.batch_size, self.max_batches
+                )
+                if n:
+                    logger.info(f"[TURNOS] {n} turnos ociosos cerrados")
+            except Exception as e:
+                logger.error(f"[TURNOS] Cierre de turnos ociosos fallido: {e}")
+            await asyncio.sleep(self.interval_seconds)
@@ -0,0 +1,178 @@
+# app/services/turno_state.py
+"""
+Estado de turnos por usuario: turno abierto, turnos usados y turnos cerrados.
+
+require_turno_open (cada create_attempts), /sessions/turno/*, /me/bootstrap y
+el login leen de aquí en vez de consultar y contar `turnos` en cada request.
+La foto sale de UNA consulta agregada apoyada en ix_turnos_user_status_opened
+(migración 0012, index-only) y se cachea por usuario en el worker durante
+TURNO_STATE_CACHE_TTL_SECONDS.
+
+Abrir o cerrar turnos pasa por open_turno / close_turno, que hacen commit y
+actualizan la caché (write-through). Los demás workers (y el cierre por
+inactividad de services/turno_idle) solo se ven al vencer el TTL, así que la
+foto sirve para respuestas de lectura (current, quota, bootstrap, login) y no
+para autorizar: require_turno_open confirma el X-Turno-Id con una consulta por
+PK (is_turno_open) y open_turno valida el cupo dentro del propio INSERT.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+MAX_ENTRIES = 20000
+
+_STATE_SQL = text("""
+    SELECT COUNT(*)                                    AS used,
+           COUNT(*) FILTER (WHERE t.status = 'closed') AS closed,
+           (array_agg(t.id ORDER BY t.opened_at DESC)
+              FILTER (WHERE t.status = 'open'))[1]     AS open_id
+    FROM public.turnos t
+    WHERE t.user_id = :uid
+""")
+
+# Último turno abierto del usuario (o el indicado), en una sentencia
+_CLOSE_SQL = text("""
+    UPDATE public.turnos
+    SET status = 'closed', closed_at = now()
+    WHERE id = (
+        SELECT t.id FROM public.turnos t
+        WHERE t.user_id = :uid
+          AND t.status = 'open'
+          AND (CAST(:tid AS uuid) IS NULL OR t.id = CAST(:tid AS uuid))
+        ORDER BY t.opened_at DESC
+        LIMIT 1
+    )
+    RETURNING id
+""")
+
+# Serializa las aperturas del mismo usuario (el conteo del INSERT no ve
+# las filas que otra transacción aún no confirma)
+_LOCK_USER_SQL = text("SELECT 1 FROM public.users WHERE id = :uid FOR UPDATE")
+
+# Inserta solo si queda cupo; sin fila en RETURNING = cupo agotado
+_OPEN_SQL = text("""
+    INSERT INTO public.turnos (id, user_id, status, opened_at)
+    SELECT gen_random_uuid(), :uid, 'open', now()
+    WHERE (SELECT COUNT(*) FROM public.turnos t WHERE t.user_id = :uid) < :max
+    RETURNING id
+""")
+
+_IS_OPEN_SQL = text("""
+    SELECT 1 FROM public.turnos
+    WHERE id = :tid AND user_id = :uid AND status = 'open'
+""")
+
+
+@dataclass(frozen=True)
+class TurnoState:
+    user_id: UUID
+    open_turno_id: Optional[UUID]
+    used: int       # turnos abiertos + cerrados (cupo consumido)
+    closed: int     # turnos cerrados (bloquean el login al llegar a MAX_TURNOS)
+    loaded_at: float
+
+    @property
+    def remaining(self) -> int:
+        return max(0, settings.MAX_TURNOS - self.used)
+
+    def current_payload(self) -> dict:
+        """{ turno_id, remaining } de /sessions/turno/current."""
+        return {
+            "turno_id": str(self.open_turno_id) if self.open_turno_id else None,
+            "remaining": self.remaining,
+        }
+
+
+_lock = threading.Lock()
+_cache: dict[UUID, TurnoState] = {}
+
+
+def _uuid(v) -> UUID:
+    return v if isinstance(v, UUID) else UUID(str(v))
+
+
+def _store(state: TurnoState) -> TurnoState:
+    with _lock:
+        if len(_cache) >= MAX_ENTRIES and state.user_id not in _cache:
+            _cache.clear()
+        _cache[state.user_id] = state
+    return state
+
+
+def load_turno_state(db: Session, user_id) -> TurnoState:
+    """Relee de BD (una consulta) y actualiza la caché."""
+    uid = _uuid(user_id)
+    row = db.execute(_STATE_SQL, {"uid": str(uid)}).one()
+    return _store(TurnoState(
+        user_id=uid,
+        open_turno_id=_uuid(row.open_id) if row.open_id else None,
+        used=int(row.used or 0),
+        closed=int(row.closed or 0),
+        loaded_at=time.monotonic(),
+    ))
+
+
+def get_turno_state(db: Session, user_id) -> TurnoState:
+    """Foto cacheada del usuario; recarga si no está o venció el TTL."""
+    uid = _uuid(user_id)
+    with _lock:
+        cached = _cache.get(uid)
+    if cached is not None and time.monotonic() - cached.loaded_at < settings.TURNO_STATE_CACHE_TTL_SECONDS:
+        return cached
+    return load_turno_state(db, uid)
+
+
+def is_turno_open(db: Session, user_id, turno_id) -> bool:
+    """True si `turno_id` es del usuario y sigue 'open' en BD (lectura por PK)."""
+    row = db.execute(_IS_OPEN_SQL, {"tid": str(turno_id), "uid": str(_uuid(user_id))}).first()
+    return row is not None
+
+
+def open_turno(db: Session, user_id) -> Optional[TurnoState]:
+    """
+    Inserta un turno 'open' si el usuario tiene cupo (MAX_TURNOS, validado en
+    el INSERT) y hace commit. Devuelve None si el cupo estaba agotado.
+    """
+    uid = _uuid(user_id)
+    db.execute(_LOCK_USER_SQL, {"uid": str(uid)})
+    tid = db.execute(_OPEN_SQL, {"uid": str(uid), "max": settings.MAX_TURNOS}).scalar_one_or_none()
+    if tid is None:
+        db.rollback()
+        return None
+    db.commit()
+    return load_turno_state(db, uid)
+
+
+def close_turno(db: Session, user_id, turno_id=None) -> bool:
+    """
+    Cierra el último turno abierto del usuario (o `turno_id` si viene) y hace
+    commit. Devuelve True si cerró alguno.
+    """
+    uid = _uuid(user_id)
+    closed_id = db.execute(
+        _CLOSE_SQL, {"uid": str(uid), "tid": str(turno_id) if turno_id else None}
+    ).scalar_one_or_none()
+    if closed_id is None:
+        return False
+    db.commit()
+    # Puede quedar otro turno 'open' más viejo: releer es una sola consulta
+    load_turno_state(db, uid)
+    return True
+
+
+def invalidate_turno_state(user_id=None) -> None:
+    """Olvida la foto de un usuario (o de todos si user_id es None)."""
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(_uuid(user_id), None)
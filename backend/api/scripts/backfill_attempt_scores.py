@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Recalcula attempt_scores / attempt_section_scores desde responses.
+La migración 0008 ya hace el backfill inicial; esto sirve para re-sincronizar
+(p. ej. tras un import histórico o un cambio de pesos hecho por SQL).
+Ejecutar desde: backend/api/
+Comando: python scripts/backfill_attempt_scores.py [--survey-id <uuid>]
+"""
+import argparse
+import os
+import sys
+from uuid import UUID
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db.session import SessionLocal
+from app.services.attempt_scores import recompute_attempt_scores
+from app.services.survey_versions import bump_data_version
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula puntajes persistidos por attempt")
+    parser.add_argument("--survey-id", type=UUID, default=None, help="Solo esta encuesta (por defecto todas)")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        n = recompute_attempt_scores(db, survey_id=args.survey_id)
+        bump_data_version(db, [args.survey_id] if args.survey_id else None)
+        db.commit()
+    print(f"[OK] {n} attempts con puntaje recalculado")
+
+if __name__ == "__main__":
+    main()
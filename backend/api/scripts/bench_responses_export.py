@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark del export crudo de respuestas (responses.csv).
+Compara el camino anterior (filas mapeadas + json.dumps del jsonb + csv.writer),
+el fila a fila actual (fechas y jsonb formateados en SQL) y COPY ... TO STDOUT
+(services/csv_export.copy_csv_chunks). Mide tiempo total y CPU del proceso
+Python por camino, y verifica que los tres den los mismos bytes.
+Requiere BD (DATABASE_URL) pero no datos: las filas salen de generate_series
+con las mismas columnas que el export.
+Ejecutar desde: backend/api/
+Comando: python scripts/bench_responses_export.py [--rows 1000000] [--repeat 3]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db.session import SessionLocal
+from app.services.csv_export import copy_csv_chunks, csv_chunks, py_timestamp_sql, stream_rows
+
+HEADERS = [
+    "attempt_id", "user_id", "teacher_id", "question_id",
+    "codigo", "section", "valor_likert", "texto_json", "enviado_en",
+]
+
+_ROWS_SQL = """
+    SELECT md5(g::text)::uuid AS attempt_id,
+           md5((g / 16)::text)::uuid AS user_id,
+           md5((g % 40)::text)::uuid AS teacher_id,
+           md5((g % 16)::text || 'q')::uuid AS question_id,
+           'Q' || (g % 16 + 1) AS codigo,
+           'Sección ' || (g % 4 + 1) AS section,
+           g % 5 + 1 AS valor_likert,
+           {texto} AS texto_json,
+           {enviado} AS enviado_en
+    FROM generate_series(1, :n) AS g
+"""
+_TEXTO = "CASE WHEN g % 16 = 15 THEN jsonb_build_object('comentarios', 'texto, con \"comillas\"') END"
+_FECHA = "(timestamptz '2025-03-01 10:00:00+00' + g * interval '1.5 second')"
+
+# Antes: jsonb y timestamptz crudos, serializados en Python
+LEGACY_SQL = _ROWS_SQL.format(texto=_TEXTO, enviado=_FECHA)
+# Ahora (ver endpoints/admin_reports.export_responses_csv)
+CURRENT_SQL = _ROWS_SQL.format(texto=f"CAST({_TEXTO} AS text)", enviado=py_timestamp_sql(_FECHA))
+
+def legacy(n):
+    def to_row(r):
+        texto = r["texto_json"]
+        return [*(r[h] for h in HEADERS[:7]), "" if texto is None else json.dumps(texto, ensure_ascii=False), r["enviado_en"]]
+    return csv_chunks(HEADERS, map(to_row, stream_rows(SessionLocal(), LEGACY_SQL, {"n": n})))
+
+def row_loop(n):
+    rows = stream_rows(SessionLocal(), CURRENT_SQL, {"n": n})
+    return csv_chunks(HEADERS, ([r[h] for h in HEADERS] for r in rows))
+
+def copy(n):
+    return copy_csv_chunks(SessionLocal(), CURRENT_SQL, {"n": n})
+
+def measure(make_chunks, n, repeat):
+    best = None
+    for _ in range(repeat):
+        digest = hashlib.sha256()
+        size = 0
+        wall, cpu = time.perf_counter(), time.process_time()
+        for chunk in make_chunks(n):
+            digest.update(chunk)
+            size += len(chunk)
+        result = (time.perf_counter() - wall, time.process_time() - cpu, size, digest.hexdigest())
+        if best is None or result[0] < best[0]:
+            best = result
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3, help="se reporta la mejor corrida")
+    args = parser.parse_args()
+
+    print(f"filas={args.rows} (mejor de {args.repeat})")
+    print(f"{'camino':>12} {'total (s)':>10} {'CPU py (s)':>11} {'MB':>8} {'MB/s':>8} {'x':>6}")
+    results = {}
+    for name, fn in (("anterior", legacy), ("fila a fila", row_loop), ("COPY", copy)):
+        results[name] = wall, cpu, size, _ = measure(fn, args.rows, args.repeat)
+        base = results["anterior"][0]
+        print(f"{name:>12} {wall:>10.2f} {cpu:>11.2f} {size / 1e6:>8.1f} {size / 1e6 / wall:>8.1f} {base / wall:>6.1f}")
+
+    same = len({r[3] for r in results.values()}) == 1
+    print(f"\nLos tres caminos {'dan los mismos bytes' if same else 'DIFIEREN'}")
+    if not same:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del cálculo de puntajes de submit_attempt.
+Compara el cálculo anterior (next(...) por pregunta por sección, O(secciones x preguntas x respuestas))
+contra services.scoring.compute_scores (una pasada sobre un dict de respuestas).
+No requiere BD.
+Ejecutar desde: backend/api/
+Comando: python scripts/bench_submit_scoring.py [--repeat 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.scoring import compute_scores
+
+def build(n_questions, n_sections):
+    sections = [SimpleNamespace(id=uuid4(), titulo=f"Sección {i + 1}") for i in range(n_sections)]
+    likert_qs = [
+        SimpleNamespace(id=uuid4(), section_id=sections[i % n_sections].id, peso=(i % 3) + 1)
+        for i in range(n_questions)
+    ]
+    answers = [SimpleNamespace(question_id=q.id, value=(i % 5) + 1) for i, q in enumerate(likert_qs)]
+    return likert_qs, sections, answers
+
+def legacy(likert_qs, sections, answers):
+    pesos = {q.id: (q.peso or 1) for q in likert_qs}
+    sum_w = sum(pesos.values())
+    sum_wx = sum(int(a.value) * pesos[a.question_id] for a in answers)
+    total = round(sum_wx / sum_w, 3) if sum_w else None
+    sec_scores = []
+    for sec in sections:
+        sec_q_ids = [q.id for q in likert_qs if q.section_id == sec.id]
+        if not sec_q_ids:
+            continue
+        sec_w = sum(pesos[qid] for qid in sec_q_ids)
+        sec_wx = sum(
+            next((int(a.value) * pesos[a.question_id] for a in answers if a.question_id == qid), 0)
+            for qid in sec_q_ids
+        )
+        sec_scores.append({"section_id": sec.id, "titulo": sec.titulo, "score": round(sec_wx / sec_w, 3)})
+    return total, sec_scores
+
+def current(likert_qs, sections, answers):
+    values = {a.question_id: int(a.value) for a in answers}
+    return compute_scores(
+        values,
+        pesos={q.id: (q.peso or 1) for q in likert_qs},
+        section_of={q.id: q.section_id for q in likert_qs},
+        sections=[(s.id, s.titulo) for s in sections],
+    )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'preguntas':>10} {'secciones':>10} {'anterior (us)':>14} {'actual (us)':>12} {'x':>6}")
+    for n_q, n_s in ((15, 3), (15, 5), (60, 6), (150, 10)):
+        data = build(n_q, n_s)
+        assert legacy(*data) == current(*data), "los puntajes no coinciden"
+        t_old = timeit.timeit(lambda: legacy(*data), number=args.repeat) / args.repeat * 1e6
+        t_new = timeit.timeit(lambda: current(*data), number=args.repeat) / args.repeat * 1e6
+        print(f"{n_q:>10} {n_s:>10} {t_old:>14.1f} {t_new:>12.1f} {t_old / t_new:>6.1f}")
+
+    print("\nEscritura: 15-16 INSERT vía unit-of-work del ORM -> 1 INSERT multi-fila (insert(Response), rows).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Cierre de turnos 'open' ociosos (sin attempts vigentes ni actividad reciente).
+Alternativa por CLI/cron al barrido en proceso (TURNO_IDLE_SWEEP_SECONDS=0).
+Ejecutar desde: backend/api/
+Comando: python scripts/close_idle_turnos.py [--idle-minutes 120] [--batch-size 500] [--max-batches 0]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.config import settings
+from app.services.turno_idle import sweep_idle_turnos, turno_idle_metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Cierra turnos ociosos en lotes")
+    parser.add_argument("--idle-minutes", type=int, default=settings.TURNO_IDLE_MINUTES)
+    parser.add_argument("--batch-size", type=int, default=settings.TURNO_IDLE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=0, help="0 = hasta vaciar")
+    args = parser.parse_args()
+
+    total = sweep_idle_turnos(args.idle_minutes, batch_size=args.batch_size, max_batches=args.max_batches)
+    m = turno_idle_metrics.snapshot()
+    print(f"[OK] {total} turnos cerrados en {m['batches']} lotes ({m['last_duration_ms']} ms)")
+
+if __name__ == "__main__":
+    main()
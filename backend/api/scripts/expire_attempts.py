@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Barrido de attempts 'en_progreso' vencidos -> 'expirado'.
+Alternativa por CLI/cron al sweeper en proceso (ATTEMPT_EXPIRY_SWEEP_SECONDS=0).
+Ejecutar desde: backend/api/
+Comando: python scripts/expire_attempts.py [--batch-size 500] [--max-batches 0]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.config import settings
+from app.services.attempt_expiry import sweep_expired_attempts
+
+def main():
+    parser = argparse.ArgumentParser(description="Expira attempts vencidos en lotes")
+    parser.add_argument("--batch-size", type=int, default=settings.ATTEMPT_EXPIRY_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=0, help="0 = hasta vaciar")
+    args = parser.parse_args()
+
+    total = sweep_expired_attempts(batch_size=args.batch_size, max_batches=args.max_batches)
+    print(f"[OK] {total} attempts marcados como expirado")
+
+if __name__ == "__main__":
+    main()
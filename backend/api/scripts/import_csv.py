@@ -103,6 +103,16 @@ def main():
         if s and t:
             cur.execute("INSERT INTO survey_teacher_assignments (survey_id, teacher_id) VALUES (%s, %s) ON CONFLICT DO NOTHING;", (s[0], t[0]))
 
+    # Versiones por encuesta (app/services/survey_versions): nuevo ETag de /queue y reportes cacheados vencidos
+    cur.execute("""
+        INSERT INTO survey_versions (survey_id, assignments_version, data_version, updated_at)
+        SELECT id, 1, 1, now() FROM surveys ORDER BY id
+        ON CONFLICT (survey_id) DO UPDATE
+          SET assignments_version = survey_versions.assignments_version + 1,
+              data_version = survey_versions.data_version + 1,
+              updated_at = now();
+    """)
+
     conn.commit()
     cur.close(); conn.close()
     print('[OK] Importación finalizada')
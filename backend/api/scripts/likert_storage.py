@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Convierte attempts enviados entre el formato de filas (responses) y el compacto
+(attempt_likert.valores smallint[]). Un commit por lote.
+Ejecutar desde: backend/api/
+Comando: python scripts/likert_storage.py {compact|expand} [--survey-id <uuid>] [--batch-size 1000]
+"""
+import argparse
+import os
+import sys
+from uuid import UUID
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db.session import SessionLocal
+from app.services.likert_storage import DEFAULT_BATCH_SIZE, compact_attempts, expand_attempts
+
+def main():
+    parser = argparse.ArgumentParser(description="Compacta/expande respuestas likert por attempt")
+    parser.add_argument("accion", choices=["compact", "expand"])
+    parser.add_argument("--survey-id", type=UUID, default=None, help="Solo esta encuesta (por defecto todas)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fn = compact_attempts if args.accion == "compact" else expand_attempts
+    total = 0
+    while True:
+        with SessionLocal() as db:
+            n = fn(db, survey_id=args.survey_id, batch_size=args.batch_size)
+            db.commit()
+        total += n
+        if n < args.batch_size:
+            break
+    print(f"[OK] {total} attempts procesados ({args.accion})")
+
+if __name__ == "__main__":
+    main()
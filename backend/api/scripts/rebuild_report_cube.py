@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Rehace report_cube (n, suma, suma de cuadrados y c1..c5 por encuesta/docente/pregunta)
+desde responses. La migración 0015 ya hace el backfill inicial; esto sirve para
+re-sincronizar (p. ej. tras un import histórico o cambios hechos por SQL).
+Ejecutar desde: backend/api/
+Comando: python scripts/rebuild_report_cube.py [--survey-id <uuid>]
+"""
+import argparse
+import os
+import sys
+from uuid import UUID
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db.session import SessionLocal
+from app.services.report_cube import rebuild_report_cube
+
+def main():
+    parser = argparse.ArgumentParser(description="Rehace el cubo de reportes")
+    parser.add_argument("--survey-id", type=UUID, default=None, help="Solo esta encuesta (por defecto todas)")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        n = rebuild_report_cube(db, survey_id=args.survey_id)
+        db.commit()
+    print(f"[OK] {n} filas en report_cube")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Reconcilia los contadores del dashboard (survey_counters / global_counters) con attempts.
+Alternativa por CLI/cron a la tarea en proceso (COUNTERS_RECONCILE_SECONDS=0); también
+sirve tras crear encuestas o usuarios por script.
+Ejecutar desde: backend/api/
+Comando: python scripts/reconcile_counters.py [--survey-id <uuid>]
+"""
+import argparse
+import os
+import sys
+from uuid import UUID
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.survey_counters import counters_metrics, reconcile_counters
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcilia contadores por encuesta y globales")
+    parser.add_argument("--survey-id", type=UUID, default=None, help="Solo esta encuesta (por defecto todas)")
+    args = parser.parse_args()
+
+    corrected = reconcile_counters(survey_id=args.survey_id)
+    m = counters_metrics.snapshot()
+    print(f"[OK] {m['surveys_checked']} encuestas revisadas, {corrected} con deriva corregida ({m['last_duration_ms']} ms)")
+
+if __name__ == "__main__":
+    main()
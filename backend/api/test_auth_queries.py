@@ -0,0 +1,195 @@
+"""
+Prueba de consultas de autenticación por request (contexto por request + caché de principal).
+Ejecutar desde: backend/api/
+Comando: python -m pytest -q test_auth_queries.py   (requiere DATABASE_URL con datos)
+
+Cuenta, por endpoint, las sentencias SQL que tocan users/user_roles y las
+verificaciones del JWT (jwt.decode). Con un token vigente (roles + authz_version):
+- caché fría: 1 consulta (authz_version) y 1 verificación
+- caché caliente: 0 consultas y 0 verificaciones (LRU de tokens verificados)
+Con un token desactualizado se recarga el usuario: versión + principal.
+En endpoints con require_turno_open (que también pide get_current_user) el
+principal se resuelve una sola vez y el turno se confirma con una lectura por
+PK de turnos.
+"""
+import os
+import re
+import sys
+import uuid
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+
+from app.core import security
+from app.core.principal import invalidate_principal
+from app.core.security import create_access_token, verified_tokens
+from app.db.session import SessionLocal, check_db_connection, engine
+from app.main import app
+from app.services.turno_state import _IS_OPEN_SQL, invalidate_turno_state
+
+pytestmark = pytest.mark.skipif(not check_db_connection(), reason="Sin base de datos disponible")
+
+AUTH_SQL = re.compile(r"\bpublic\.users\b|\buser_roles\b", re.IGNORECASE)
+TURNO_SQL = re.compile(r"\bturnos\b", re.IGNORECASE)
+
+# Encuesta inexistente: create_attempts responde 404 después de resolver
+# get_current_user y require_turno_open, sin crear nada
+_NO_SURVEY = {"survey_id": str(uuid.uuid4()), "teacher_ids": [str(uuid.uuid4())]}
+
+# (método, ruta, body, status) de endpoints con distintas cadenas de dependencias de auth
+ENDPOINTS = [
+    ("GET", "/api/v1/auth/me", None, 200),                    # get_current_user
+    ("GET", "/api/v1/sessions/turno/quota", None, 200),       # get_current_user
+    ("GET", "/api/v1/admin/roles/available", None, 200),      # get_admin_user -> get_current_user_with_claims
+    ("POST", "/api/v1/attempts", _NO_SURVEY, 404),            # get_current_user + require_turno_open
+]
+
+
+@pytest.fixture(scope="module")
+def admin():
+    """Un administrador activo con sus roles y authz_version (mismos claims que auth.login)."""
+    with SessionLocal() as db:
+        row = db.execute(text("""
+            SELECT u.id, u.email, u.nombre, u.authz_version,
+                   array_agg(r.nombre ORDER BY r.nombre) AS roles
+            FROM public.users u
+            JOIN public.user_roles ur ON ur.user_id = u.id
+            JOIN public.roles r ON r.id = ur.role_id
+            WHERE u.estado = 'activo'
+            GROUP BY u.id
+            HAVING bool_or(lower(r.nombre) = 'administrador')
+            LIMIT 1
+        """)).first()
+    if row is None:
+        pytest.skip("No hay administradores activos")
+    return row
+
+
+@pytest.fixture(scope="module")
+def turno(admin):
+    """Turno 'open' del administrador para X-Turno-Id (se borra al terminar)."""
+    with SessionLocal() as db:
+        tid = db.execute(text("""
+            INSERT INTO public.turnos (id, user_id, status, opened_at)
+            VALUES (gen_random_uuid(), :uid, 'open', now())
+            RETURNING id
+        """), {"uid": str(admin.id)}).scalar_one()
+        db.commit()
+    yield tid
+    with SessionLocal() as db:
+        db.execute(text("DELETE FROM public.turnos WHERE id = :tid"), {"tid": str(tid)})
+        db.commit()
+    invalidate_turno_state(admin.id)
+
+
+def _token(admin, authz_version=None):
+    return create_access_token({
+        "sub": str(admin.id),
+        "email": admin.email,
+        "nombre": admin.nombre,
+        "roles": sorted(admin.roles),
+        "authz_version": admin.authz_version if authz_version is None else authz_version,
+    })
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    counts = {"auth_sql": 0, "decode": 0}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if AUTH_SQL.search(statement):
+            counts["auth_sql"] += 1
+
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        counts["decode"] += 1
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(security.jwt, "decode", counting_decode)
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        yield counts
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+
+@pytest.fixture
+def turno_sql():
+    """Sentencias sobre turnos ejecutadas durante la prueba."""
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if TURNO_SQL.search(statement):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+
+def _call(client, method, path, body, status, token, turno, counts):
+    counts["auth_sql"] = counts["decode"] = 0
+    headers = {"Authorization": f"Bearer {token}", "X-Turno-Id": str(turno)}
+    r = client.request(method, path, headers=headers, json=body)
+    assert r.status_code == status, (path, r.status_code, r.text)
+    return dict(counts)
+
+
+@pytest.mark.parametrize("method,path,body,status", ENDPOINTS)
+def test_auth_queries_token_vigente(admin, turno, counters, method, path, body, status):
+    client = TestClient(app)
+    token = _token(admin)
+
+    invalidate_principal()
+    verified_tokens.clear()
+    cold = _call(client, method, path, body, status, token, turno, counters)
+    warm = _call(client, method, path, body, status, token, turno, counters)
+
+    assert cold == {"auth_sql": 1, "decode": 1}, cold
+    assert warm == {"auth_sql": 0, "decode": 0}, warm
+
+
+@pytest.mark.parametrize("method,path,body,status", ENDPOINTS)
+def test_auth_queries_token_desactualizado(admin, turno, counters, method, path, body, status):
+    client = TestClient(app)
+    token = _token(admin, authz_version=admin.authz_version - 1)
+
+    invalidate_principal()
+    verified_tokens.clear()
+    cold = _call(client, method, path, body, status, token, turno, counters)
+    warm = _call(client, method, path, body, status, token, turno, counters)
+
+    # versión (no coincide) + foto de BD; luego ambas desde caché
+    assert cold == {"auth_sql": 2, "decode": 1}, cold
+    assert warm == {"auth_sql": 0, "decode": 0}, warm
+
+
+def test_require_turno_open_confirma_por_pk(admin, turno, counters, turno_sql):
+    client = TestClient(app)
+    token = _token(admin)
+
+    invalidate_principal()
+    verified_tokens.clear()
+    invalidate_turno_state(admin.id)
+    _call(client, "POST", "/api/v1/attempts", _NO_SURVEY, 404, token, turno, counters)
+    turno_sql.clear()
+    warm = _call(client, "POST", "/api/v1/attempts", _NO_SURVEY, 404, token, turno, counters)
+
+    # Con la foto del turno en caché: solo la lectura por PK de is_turno_open
+    assert warm == {"auth_sql": 0, "decode": 0}, warm
+    assert len(turno_sql) == 1 and "SELECT 1 FROM public.turnos" in turno_sql[0], turno_sql
+
+    with SessionLocal() as db:
+        plan = db.execute(text("EXPLAIN (FORMAT JSON) " + _IS_OPEN_SQL.text),
+                          {"tid": str(turno), "uid": str(admin.id)}).scalar()
+    scan = plan[0]["Plan"]
+    assert scan["Node Type"] in ("Index Scan", "Index Only Scan"), scan
+    assert scan["Index Name"] == "turnos_pkey", scan
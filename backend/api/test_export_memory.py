@@ -0,0 +1,96 @@
+"""
+Prueba de memoria de los exports CSV en streaming (services/csv_export).
+Ejecutar desde: backend/api/
+Comando: python -m pytest -q test_export_memory.py   (la prueba con BD requiere DATABASE_URL)
+
+Exporta 1M filas y mide con tracemalloc el pico de memoria Python: debe
+quedar bajo un techo fijo (un lote del cursor + un chunk), no crecer con el
+número de filas. Sin BD se prueba solo la codificación en chunks.
+"""
+import os
+import sys
+import tracemalloc
+import uuid
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+from app.services.csv_export import csv_chunks, stream_rows
+
+N_ROWS = 1_000_000
+CHUNK = 64 * 1024
+PEAK_CEILING = 8 * 1024 * 1024   # bytes; materializar 1M filas ocupa cientos de MB
+
+HEADERS = [
+    "attempt_id", "user_id", "teacher_id", "question_id",
+    "codigo", "section", "valor_likert", "texto_json", "enviado_en",
+]
+
+
+def _db_available() -> bool:
+    try:
+        from app.db.session import check_db_connection
+    except ValueError:  # falta DATABASE_URL
+        return False
+    return check_db_connection()
+
+
+def _synthetic_rows(n):
+    """Filas con la forma de responses.csv, generadas una a una."""
+    ids = [str(uuid.uuid4()) for _ in range(4)]
+    for i in range(n):
+        yield [
+            ids[0], ids[1], ids[2], ids[3],
+            f"Q{i % 16 + 1}", "Sección de prueba", i % 5 + 1,
+            '{"comentarios": "texto, con comas y \\"comillas\\""}' if i % 16 == 15 else "",
+            "2025-03-01 10:00:00+00:00",
+        ]
+
+
+def _consume(chunks):
+    """Recorre el export como lo haría la respuesta HTTP; devuelve (bytes, chunk más grande, pico)."""
+    total = biggest = 0
+    tracemalloc.start()
+    try:
+        for chunk in chunks:
+            total += len(chunk)
+            biggest = max(biggest, len(chunk))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return total, biggest, peak
+
+
+def test_csv_chunks_1m_filas_memoria_acotada():
+    total, biggest, peak = _consume(csv_chunks(HEADERS, _synthetic_rows(N_ROWS), bom=True, chunk_size=CHUNK))
+
+    assert total > N_ROWS * 100          # se escribió todo el archivo (~170 MB)
+    assert biggest < 2 * CHUNK           # chunks acotados
+    assert peak < PEAK_CEILING, f"pico {peak / 1e6:.1f} MB"
+
+
+@pytest.mark.skipif(not _db_available(), reason="Sin base de datos disponible")
+def test_stream_rows_1m_filas_memoria_acotada():
+    from app.db.session import SessionLocal
+
+    sql = """
+        SELECT gen_random_uuid() AS attempt_id,
+               g AS n,
+               'Q' || (g % 16 + 1) AS codigo,
+               repeat('x', 40) AS texto,
+               now() AS enviado_en
+        FROM generate_series(1, :n) AS g
+    """
+    rows = stream_rows(SessionLocal(), sql, {"n": N_ROWS}, fetch_rows=2000)
+    chunks = csv_chunks(
+        ["attempt_id", "n", "codigo", "texto", "enviado_en"],
+        ([r["attempt_id"], r["n"], r["codigo"], r["texto"], r["enviado_en"]] for r in rows),
+        chunk_size=CHUNK,
+    )
+    total, biggest, peak = _consume(chunks)
+
+    assert total > N_ROWS * 80
+    assert biggest < 2 * CHUNK
+    assert peak < PEAK_CEILING, f"pico {peak / 1e6:.1f} MB"
@@ -0,0 +1,165 @@
+"""
+Pruebas del export crudo por COPY (services/csv_export.copy_csv_chunks).
+Ejecutar desde: backend/api/
+Comando: python -m pytest -q test_responses_copy.py   (las pruebas con BD requieren DATABASE_URL)
+
+El camino COPY y el fila a fila (stream_rows + csv_chunks) deben dar los
+mismos bytes sobre los mismos datos, y los mismos que el export anterior
+(jsonb y timestamptz serializados en Python, líneas CRLF). Se prueba además
+la conversión de binds :nombre, la reescritura a CRLF entre chunks, el BOM
+solo al inicio, que un error de la consulta salga antes del primer chunk y
+que cortar la descarga cancele el COPY en el servidor.
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+from app.services.csv_export import (
+    _BIND_RE, _CopySink, copy_csv_chunks, csv_chunks, csv_response, py_timestamp_sql, stream_rows,
+)
+
+CHUNK = 8 * 1024
+
+# Fecha con y sin fracción de segundo (filas pares / impares)
+_FECHA = "(timestamptz '2025-03-01 10:00:00+00' + g * interval '0.5 second')"
+_TEXTO = "CASE WHEN g % 16 = 15 THEN jsonb_build_object('comentarios', 'texto, \"citado\"\ny salto', 'n', g) END"
+
+# Mismas formas de columna que responses.csv (uuid, texto, smallint, jsonb, fecha)
+_SAMPLE_SQL = """
+    SELECT md5(g::text)::uuid AS attempt_id,
+           'Q' || (g % 16 + 1) AS codigo,
+           CASE WHEN g % 7 = 0 THEN 'Sección "uno", con comas' ELSE 'Sección
+dos' END AS section,
+           CASE WHEN g % 5 = 0 THEN NULL ELSE g % 5 + 1 END AS valor_likert,
+           {texto} AS texto_json,
+           {fecha} AS enviado_en
+    FROM generate_series(1, :n) AS g
+    WHERE 'a%' LIKE 'a%%' {extra}
+"""
+# Como el endpoint: jsonb y fecha formateados en SQL
+SAMPLE_SQL = _SAMPLE_SQL.format(texto=f"CAST({_TEXTO} AS text)", fecha=py_timestamp_sql(_FECHA), extra="")
+# Como antes: valores crudos serializados en Python
+LEGACY_SQL = _SAMPLE_SQL.format(texto=_TEXTO, fecha=_FECHA, extra="")
+HEADERS = ["attempt_id", "codigo", "section", "valor_likert", "texto_json", "enviado_en"]
+
+
+def _db_available() -> bool:
+    try:
+        from app.db.session import check_db_connection
+    except ValueError:  # falta DATABASE_URL
+        return False
+    return check_db_connection()
+
+
+needs_db = pytest.mark.skipif(not _db_available(), reason="Sin base de datos disponible")
+
+
+def _session(tz=None):
+    from app.db.session import SessionLocal
+    from sqlalchemy import text
+    db = SessionLocal()
+    if tz:
+        # Lo mismo que export_responses_csv con ?tz=
+        db.execute(text("SELECT set_config('TimeZone', :tz, true)"), {"tz": tz})
+    return db
+
+
+def _row_loop(sql, params, tz=None, bom=False):
+    rows = stream_rows(_session(tz), sql, params)
+    return csv_chunks(HEADERS, ([r[h] for h in HEADERS] for r in rows), bom=bom, chunk_size=CHUNK)
+
+
+def _legacy(params, tz=None):
+    def to_row(r):
+        texto = r["texto_json"]
+        return [*(r[h] for h in HEADERS[:4]), "" if texto is None else json.dumps(texto, ensure_ascii=False), r["enviado_en"]]
+    return csv_chunks(HEADERS, map(to_row, stream_rows(_session(tz), LEGACY_SQL, params)), chunk_size=CHUNK)
+
+
+def _sink_output(pieces):
+    q = queue.Queue()
+    sink = _CopySink(q, chunk_size=1 << 20, cancelled=threading.Event(), crlf=True)
+    for p in pieces:
+        sink.write(p)
+    return bytes(sink.buf)
+
+
+def test_bind_re_convierte_solo_parametros():
+    sub = lambda s: _BIND_RE.sub(r"%(\1)s", s)
+    assert sub("WHERE a.survey_id = :sid") == "WHERE a.survey_id = %(sid)s"
+    assert sub("CAST(:tz AS text)") == "CAST(%(tz)s AS text)"
+    assert sub("x::uuid, y::text[]") == "x::uuid, y::text[]"
+    assert sub("to_char(x, 'YYYY-MM-DD HH24:MI:SS')") == "to_char(x, 'YYYY-MM-DD HH24:MI:SS')"
+    assert sub(r"'\:literal'") == r"'\:literal'"
+    assert sub("(:a,:b)") == "(%(a)s,%(b)s)"
+
+
+def test_copy_sink_reescribe_fin_de_registro_a_crlf():
+    copy_out = b'a,"x\ny",1\nb,"dice ""hola""\n",2\nc,,3\n'
+    expected = b'a,"x\ny",1\r\nb,"dice ""hola""\n",2\r\nc,,3\r\n'
+    assert _sink_output([copy_out]) == expected
+    # Cortes en cualquier byte (dentro de comillas, entre "" escapadas, antes del \n)
+    for cut in range(1, len(copy_out)):
+        assert _sink_output([copy_out[:cut], copy_out[cut:]]) == expected, cut
+    assert _sink_output([bytes([b]) for b in copy_out]) == expected
+
+
+@needs_db
+@pytest.mark.parametrize("tz", [None, "America/Bogota", "Asia/Kolkata"])
+def test_copy_fila_a_fila_y_export_anterior_dan_los_mismos_bytes(tz):
+    params = {"n": 5000}
+    by_copy = b"".join(copy_csv_chunks(_session(tz), SAMPLE_SQL, params, chunk_size=CHUNK))
+    by_rows = b"".join(_row_loop(SAMPLE_SQL, params, tz))
+    by_legacy = b"".join(_legacy(params, tz))
+
+    assert by_copy.startswith(",".join(HEADERS).encode() + b"\r\n")
+    assert by_copy == by_rows
+    assert by_copy == by_legacy
+
+
+@needs_db
+def test_bom_solo_al_inicio_del_primer_chunk():
+    chunks = list(copy_csv_chunks(_session(), SAMPLE_SQL, {"n": 5000}, bom=True, chunk_size=CHUNK))
+    bom = "\ufeff".encode("utf-8")
+
+    assert len(chunks) > 1
+    assert chunks[0].startswith(bom + b"attempt_id,")
+    assert all(bom not in c for c in chunks[1:])
+    assert b"".join(chunks) == b"".join(_row_loop(SAMPLE_SQL, {"n": 5000}, bom=True))
+
+
+@needs_db
+def test_error_de_consulta_antes_del_primer_chunk():
+    # Falla en el servidor en la fila 3, antes de llenar el primer chunk
+    sql = _SAMPLE_SQL.format(texto="NULL", fecha="now()", extra="AND 1 / (g - 3) IS NOT NULL")
+    with pytest.raises(Exception, match="division by zero"):
+        csv_response("x.csv", copy_csv_chunks(_session(), sql, {"n": 10}))
+
+
+@needs_db
+def test_cortar_la_descarga_cancela_el_copy():
+    db = _session()
+    chunks = copy_csv_chunks(db, SAMPLE_SQL, {"n": 50_000_000}, chunk_size=CHUNK)
+    assert next(chunks)
+
+    started = time.perf_counter()
+    chunks.close()   # lo que hace Starlette cuando el cliente se desconecta
+    assert time.perf_counter() - started < 5   # generar 50M filas tarda mucho más
+
+    from app.db.session import engine
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        running = conn.execute(text("""
+            SELECT COUNT(*) FROM pg_stat_activity
+            WHERE state = 'active' AND query LIKE 'COPY (%generate_series%'
+              AND pid <> pg_backend_pid()
+        """)).scalar()
+    assert running == 0